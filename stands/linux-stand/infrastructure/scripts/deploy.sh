@@ -5,13 +5,41 @@ set -euo pipefail
 usage() {
   cat <<'USAGE'
 Использование:
-  ./deploy.sh [--skip-templates] [--skip-terraform] [--skip-ansible]
+  ./deploy.sh [--skip-templates] [--skip-terraform] [--skip-ansible] [--dynamic-inventory] [--strict-host-keys]
+              [--jobs N] [--sequential] [--pipelined] [--force-init] [--fresh]
 
 По умолчанию выполняет всё:
   1) Создание cloud-init templates (если vars-файлы подготовлены)
   2) Terraform apply (linux-ws + linux-server)
   3) Ansible (пользователи/группы + уязвимости)
 
+  --dynamic-inventory  плейбуки читают inventory через ansible/inventory.sh (--list с TTL-кэшем)
+  --strict-host-keys   собрать SSH host keys в ansible/known_hosts и включить их проверку
+  --jobs N             сколько шагов выполнять одновременно (по умолчанию 4, DEPLOY_JOBS)
+  --sequential         старый последовательный порядок шагов без deploy_engine.py
+  --pipelined          конвейер по машинам (deploy-graph.pipelined.json): inventory, ожидание SSH
+                       и плейбук машины запускаются сразу после её terraform apply, не дожидаясь остальных;
+                       плейбуки читают inventory своей машины, с --dynamic-inventory не сочетается
+  --force-init         terraform init для каждой конфигурации, даже если она уже инициализирована (TF_FORCE_INIT=1)
+  --fresh              начать заново, не продолжая с места прошлой ошибки
+
+  Шаги и зависимости между ними описаны в infrastructure/deploy-graph.json; deploy_engine.py
+  запускает независимые шаги параллельно, вывод каждого шага помечается [имя-шага], полные логи
+  пишутся в infrastructure/.deploy-logs/. После первой ошибки новые шаги не запускаются.
+  Выполненные шаги отмечаются в infrastructure/.deploy-state.json вместе с хешем входных файлов
+  (tfvars, плейбуки, group_vars, роли). Повторный запуск продолжает с первого невыполненного шага
+  или шага, входы которого изменились; шаги после него выполняются снова.
+
+  INVENTORY_CONNECTION_PROFILE=1  inventory с настройками SSH для групп
+                                  (ControlPersist/ControlPath стенда, pipelining для Linux)
+  INVENTORY_METRICS_JSON=PATH     JSON с временем фаз генерации inventory по компонентам
+                                  (subprocess/parse/probe, попадания в кэш, общее время)
+
+  Если есть infrastructure/terraform/terraform.rc (создаётся tools/create_stand.py),
+  terraform использует общий кэш провайдеров через TF_CLI_CONFIG_FILE.
+  terraform init пропускается, если .terraform.lock.hcl, backend, источники модулей и CLI-конфиг
+  не менялись с последнего успешного init (отпечаток в .terraform/.init-fingerprint).
+
 Требования:
   - terraform, ansible-playbook
   - для templates: bash (linux/macOS) или PowerShell-скрипт запускается вручную
@@ -21,17 +49,35 @@ USAGE
 DO_TEMPLATES=1
 DO_TERRAFORM=1
 DO_ANSIBLE=1
+DYNAMIC_INVENTORY="${DYNAMIC_INVENTORY:-0}"
+STRICT_HOST_KEYS="${STRICT_HOST_KEYS:-0}"
+DEPLOY_JOBS="${DEPLOY_JOBS:-4}"
+SEQUENTIAL=0
+PIPELINED=0
+FORCE_INIT="${TF_FORCE_INIT:-0}"
+FRESH=0
 
 while [[ $# -gt 0 ]]; do
   case "$1" in
     --skip-templates) DO_TEMPLATES=0; shift ;;
     --skip-terraform) DO_TERRAFORM=0; shift ;;
     --skip-ansible) DO_ANSIBLE=0; shift ;;
+    --dynamic-inventory) DYNAMIC_INVENTORY=1; shift ;;
+    --strict-host-keys) STRICT_HOST_KEYS=1; shift ;;
+    --jobs) DEPLOY_JOBS="${2:?--jobs requires a value}"; shift 2 ;;
+    --sequential) SEQUENTIAL=1; shift ;;
+    --pipelined) PIPELINED=1; shift ;;
+    --force-init) FORCE_INIT=1; shift ;;
+    --fresh) FRESH=1; shift ;;
     -h|--help) usage; exit 0 ;;
     *) echo "Unknown arg: $1" >&2; usage; exit 2 ;;
   esac
 done
 
+if [[ $PIPELINED -eq 1 && $DYNAMIC_INVENTORY -eq 1 ]]; then
+  echo "--pipelined не сочетается с --dynamic-inventory (DYNAMIC_INVENTORY=1)" >&2; usage; exit 2
+fi
+
 need() { command -v "$1" >/dev/null 2>&1 || { echo "Missing dependency: $1" >&2; exit 1; }; }
 need_file() { [[ -f "$1" ]] || { echo "Missing file: $1" >&2; exit 1; }; }
 warn() { echo "WARN: $1" >&2; }
@@ -41,35 +87,30 @@ SCENARIO_ROOT="$(cd "$SCRIPT_DIR/../.." && pwd)"
 ANS_DIR="$SCENARIO_ROOT/infrastructure/ansible"
 TF_DIR="$SCENARIO_ROOT/infrastructure/terraform"
 INV_SCRIPT="$SCRIPT_DIR/generate_inventory.py"
+INVENTORY="$ANS_DIR/inventory.yml"
+if [[ $DYNAMIC_INVENTORY -eq 1 ]]; then INVENTORY="$ANS_DIR/inventory.sh"; fi
 
 echo "=========================================="
 echo "Деплой Linux стенда"
 echo "  root: $SCENARIO_ROOT"
 echo "=========================================="
 
-if [[ $DO_TERRAFORM -eq 1 ]]; then need terraform; fi
-if [[ $DO_ANSIBLE -eq 1 ]]; then need ansible-playbook; need python3; fi
+if [[ $SEQUENTIAL -eq 0 && -f "$SCENARIO_ROOT/infrastructure/deploy-graph.json" ]]; then
+  need python3
+  ENGINE_ARGS=(--stand-root "$SCENARIO_ROOT" --jobs "$DEPLOY_JOBS")
+  if [[ $DO_TEMPLATES -eq 0 ]]; then ENGINE_ARGS+=(--skip-templates); fi
+  if [[ $DO_TERRAFORM -eq 0 ]]; then ENGINE_ARGS+=(--skip-terraform); fi
+  if [[ $DO_ANSIBLE -eq 0 ]]; then ENGINE_ARGS+=(--skip-ansible); fi
+  if [[ $DYNAMIC_INVENTORY -eq 1 ]]; then ENGINE_ARGS+=(--dynamic-inventory); fi
+  if [[ $STRICT_HOST_KEYS -eq 1 ]]; then ENGINE_ARGS+=(--strict-host-keys); fi
+  if [[ $PIPELINED -eq 1 ]]; then ENGINE_ARGS+=(--pipelined); fi
+  if [[ $FORCE_INIT -eq 1 ]]; then ENGINE_ARGS+=(--force-init); fi
+  if [[ $FRESH -eq 1 ]]; then ENGINE_ARGS+=(--fresh); fi
+  exec python3 "$SCRIPT_DIR/deploy_engine.py" "${ENGINE_ARGS[@]}"
+fi
 
-wait_for_ssh() {
-  local host="$1" port="${2:-22}" timeout="${3:-300}"
-  local start
-  start="$(date +%s 2>/dev/null || echo 0)"
-  while true; do
-    if command -v nc >/dev/null 2>&1; then
-      nc -z "$host" "$port" >/dev/null 2>&1 && return 0
-    else
-      (echo >/dev/tcp/"$host"/"$port") >/dev/null 2>&1 && return 0 || true
-    fi
-    sleep 3
-    if [[ "$start" != "0" ]]; then
-      local now; now="$(date +%s)"
-      if (( now - start > timeout )); then
-        echo "Timeout waiting for $host:$port" >&2
-        return 1
-      fi
-    fi
-  done
-}
+if [[ $DO_TERRAFORM -eq 1 ]]; then need terraform; need python3; fi
+if [[ $DO_ANSIBLE -eq 1 ]]; then need ansible-playbook; need python3; fi
 
 # IP адреса можно переопределять через окружение (для переносимости стенда)
 LINUX_WS_IP="${LINUX_WS_IP:-192.168.102.10}"
@@ -99,12 +140,20 @@ fi
 if [[ $DO_TERRAFORM -eq 1 ]]; then
   echo ""
   echo "== Terraform =="
+  if [[ -z "${TF_CLI_CONFIG_FILE:-}" && -f "$TF_DIR/terraform.rc" ]]; then
+    # общий кэш/зеркало провайдеров, настроенные tools/create_stand.py
+    export TF_CLI_CONFIG_FILE="$TF_DIR/terraform.rc"
+    echo "-- terraform CLI config: $TF_CLI_CONFIG_FILE"
+  fi
   need_file "$TF_DIR/linux-ws/terraform.tfvars"
   need_file "$TF_DIR/linux-server/terraform.tfvars"
   for comp in linux-ws linux-server; do
     if [[ -d "$TF_DIR/$comp" ]]; then
       echo "-- terraform apply: $comp"
-      (cd "$TF_DIR/$comp" && terraform init -input=false && terraform apply -input=false -auto-approve)
+      INIT_ARGS=(--terraform-init "$TF_DIR/$comp")
+      if [[ $FORCE_INIT -eq 1 ]]; then INIT_ARGS+=(--force-init); fi
+      python3 "$SCRIPT_DIR/deploy_engine.py" "${INIT_ARGS[@]}"
+      (cd "$TF_DIR/$comp" && terraform apply -input=false -auto-approve)
     fi
   done
 fi
@@ -124,15 +173,22 @@ if [[ $DO_ANSIBLE -eq 1 ]]; then
     --inventory-path "$ANS_DIR/inventory.yml" \
     --print-env)"
 
-  # Ждём SSH (если IP дефолтные) — иначе Ansible сразу упадёт.
+  # Ждём SSH на всех хостах параллельно (по SSH-баннеру) — иначе Ansible сразу упадёт.
   echo "Waiting for SSH..."
-  wait_for_ssh "$LINUX_WS_IP" 22 300 || true
-  wait_for_ssh "$LINUX_SERVER_IP" 22 300 || true
+  python3 "$SCRIPT_DIR/wait_for_ssh.py" --timeout 300 \
+    --host "linux-ws=$LINUX_WS_IP" \
+    --host "linux-server=$LINUX_SERVER_IP" || true
+
+  if [[ $STRICT_HOST_KEYS -eq 1 ]]; then
+    echo "Collecting SSH host keys..."
+    export INVENTORY_KNOWN_HOSTS="$ANS_DIR/known_hosts"
+    python3 "$INV_SCRIPT" --inventory-path "$ANS_DIR/inventory.yml" --scan-host-keys
+  fi
 
   echo "-- linux-ws playbook"
-  (cd "$ANS_DIR" && ansible-playbook linux-ws/playbook.yml)
+  (cd "$ANS_DIR" && ansible-playbook -i "$INVENTORY" linux-ws/playbook.yml)
   echo "-- linux-server playbook"
-  (cd "$ANS_DIR" && ansible-playbook linux-server/playbook.yml)
+  (cd "$ANS_DIR" && ansible-playbook -i "$INVENTORY" linux-server/playbook.yml)
 fi
 
 echo ""
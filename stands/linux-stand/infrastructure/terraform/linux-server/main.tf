@@ -38,6 +38,7 @@ resource "proxmox_vm_qemu" "linux_server" {
   description = "Linux сервер для обучения защите ОС"
   target_node = var.proxmox_node
   pool        = var.proxmox_pool != "" ? var.proxmox_pool : null
+  vmid        = var.vmid
   
   # Клонирование из шаблона
   clone = var.template_name
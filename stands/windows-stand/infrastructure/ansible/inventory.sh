@@ -0,0 +1,4 @@
+#!/usr/bin/env bash
+# Dynamic inventory для Ansible (--list/--host) поверх generate_inventory.py.
+# Лежит рядом с group_vars, чтобы Ansible подхватывал их и при `-i inventory.sh`.
+exec python3 "$(dirname "$0")/../scripts/generate_inventory.py" "$@"
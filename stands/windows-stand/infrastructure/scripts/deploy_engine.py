@@ -0,0 +1,684 @@
+#!/usr/bin/env python3
+import argparse
+import configparser
+import contextlib
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# abspath, not realpath: in an overlay stand this file is a symlink into the base stand
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STAND_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, "..", ".."))
+GRAPH_NAME = os.path.join("infrastructure", "deploy-graph.json")
+PIPELINED_GRAPH_NAME = os.path.join("infrastructure", "deploy-graph.pipelined.json")
+LOG_DIR_NAME = os.path.join("infrastructure", ".deploy-logs")
+STATE_NAME = os.path.join("infrastructure", ".deploy-state.json")
+STATE_VERSION = 1
+KINDS = ("terraform", "inventory", "wait", "playbook", "command")
+PHASES = ("templates", "terraform", "ansible")
+DEFAULT_JOBS = 4
+DEFAULT_WAIT_TIMEOUT = 300
+EXPORT_LINE = re.compile(r"^([A-Z][A-Z0-9_]*)=(.*)$")
+VARIABLE = re.compile(r"\$\{(\w+)(?::-([^}]*))?\}")
+TOOLS = {"terraform": "terraform", "playbook": "ansible-playbook"}
+INIT_COMMAND = ["terraform", "init", "-input=false"]
+INIT_FINGERPRINT = ".init-fingerprint"
+# statuses that let dependent nodes start
+SATISFIED = ("ok", "skipped", "resumed")
+# generated or bulky files that never count as node inputs
+INPUT_EXCLUDES = ("*.log", "*.iso", "*.tfstate", "*.tfstate.*", ".terraform", "__pycache__", ".deploy-logs", ".inventory-cache")
+# environment generate_inventory.py reads: a change regenerates the inventory
+INVENTORY_ENV = (
+    "ANSIBLE_CONNECTION",
+    "ANSIBLE_KEY",
+    "ANSIBLE_PASSWORD",
+    "ANSIBLE_PORT",
+    "ANSIBLE_PYTHON",
+    "ANSIBLE_SHELL_TYPE",
+    "ANSIBLE_USER",
+    "INVENTORY_CONNECTION_PROFILE",
+    "INVENTORY_KNOWN_HOSTS",
+    "INVENTORY_SELECT_FASTEST",
+    "INVENTORY_SOURCE",
+)
+INIT_BLOCK = re.compile(r'^(?:terraform|module\s+"[^"]*")\s*\{', re.MULTILINE)
+
+
+def expand(value, env: dict[str, str]):
+    """Substitute ${NAME} and ${NAME:-default} in strings, lists and dicts."""
+    if isinstance(value, list):
+        return [expand(item, env) for item in value]
+    if isinstance(value, dict):
+        return {key: expand(item, env) for key, item in value.items()}
+    if not isinstance(value, str):
+        return value
+    return VARIABLE.sub(lambda match: env.get(match.group(1)) or (match.group(2) or ""), value)
+
+
+def init_blocks(text: str) -> list[str]:
+    """Top-level terraform {} and module {} blocks: backend, required providers and module sources."""
+    blocks = []
+    for match in INIT_BLOCK.finditer(text):
+        depth = 0
+        for end in range(match.end() - 1, len(text)):
+            if text[end] == "{":
+                depth += 1
+            elif text[end] == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+        blocks.append(text[match.start() : end + 1])
+    return blocks
+
+
+def init_fingerprint(tf_dir: str, env: dict[str, str]) -> str:
+    """Hash of everything `terraform init` depends on; resources and variables do not take part."""
+    digest = hashlib.sha256()
+
+    def add(label: str, data: bytes) -> None:
+        digest.update(label.encode("utf-8") + b"\0" + data + b"\0")
+
+    for name in sorted(os.listdir(tf_dir)):
+        path = os.path.join(tf_dir, name)
+        if name == ".terraform.lock.hcl" or name.endswith(".tfbackend"):
+            with open(path, "rb") as fh:
+                add(name, fh.read())
+        elif name.endswith(".tf"):
+            with open(path, encoding="utf-8", errors="replace") as fh:
+                blocks = init_blocks(fh.read())
+            # a new variables.tf or outputs.tf does not need an init
+            if blocks:
+                add(name, "\n".join(blocks).encode("utf-8"))
+    cli_config = env.get("TF_CLI_CONFIG_FILE")
+    if cli_config:
+        try:
+            with open(os.path.join(tf_dir, cli_config), "rb") as fh:
+                add("cli-config " + os.path.abspath(os.path.join(tf_dir, cli_config)), fh.read())
+        except OSError:
+            add("cli-config " + cli_config, b"missing")
+    terraform = shutil.which("terraform", path=env.get("PATH"))
+    if terraform:
+        st = os.stat(terraform)
+        add("terraform", f"{os.path.realpath(terraform)} {st.st_size} {st.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def fingerprint_path(tf_dir: str, env: dict[str, str]) -> str:
+    return os.path.join(tf_dir, env.get("TF_DATA_DIR") or ".terraform", INIT_FINGERPRINT)
+
+
+def init_current(tf_dir: str, env: dict[str, str]) -> bool:
+    """True when the root was initialized successfully with the same lock file, backend, modules and CLI config."""
+    try:
+        with open(fingerprint_path(tf_dir, env), encoding="utf-8") as fh:
+            recorded = fh.read().strip()
+    except OSError:
+        return False
+    return recorded == init_fingerprint(tf_dir, env)
+
+
+def record_init(tf_dir: str, env: dict[str, str]) -> None:
+    # taken after init: init itself adds provider hashes to .terraform.lock.hcl
+    path = fingerprint_path(tf_dir, env)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        fh.write(init_fingerprint(tf_dir, env) + "\n")
+    os.replace(tmp_path, path)
+
+
+def forget_init(tf_dir: str, env: dict[str, str]) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(fingerprint_path(tf_dir, env))
+
+
+def terraform_init(tf_dir: str, force: bool = False) -> int:
+    """`terraform init` of one root unless it is current (used by the sequential deploy.sh)."""
+    env = dict(os.environ)
+    if not force and init_current(tf_dir, env):
+        print(f"terraform init skipped: {os.path.basename(tf_dir)} is initialized (fingerprint unchanged)", flush=True)
+        return 0
+    forget_init(tf_dir, env)
+    code = subprocess.run(INIT_COMMAND, cwd=tf_dir, env=env).returncode
+    if code == 0:
+        record_init(tf_dir, env)
+    return code
+
+
+def hash_inputs(root: str, patterns: list[str]) -> str:
+    """Hash of the files matched by glob patterns (relative to root, ** allowed), in a stable order."""
+    digest = hashlib.sha256()
+    for pattern in patterns:
+        matches = sorted(glob.glob(os.path.join(root, pattern), recursive=True))
+        if not matches:
+            digest.update(f"{pattern} missing\0".encode("utf-8"))
+        for path in matches:
+            parts = os.path.relpath(path, root).split(os.sep)
+            if not os.path.isfile(path) or any(fnmatch.fnmatch(part, exclude) for part in parts for exclude in INPUT_EXCLUDES):
+                continue
+            with open(path, "rb") as fh:
+                digest.update("/".join(parts).encode("utf-8") + b"\0" + hashlib.sha256(fh.read()).digest())
+    return digest.hexdigest()
+
+
+def roles_paths(ans_dir: str) -> list[str]:
+    """roles_path entries of ansible.cfg, relative to the ansible directory."""
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(os.path.join(ans_dir, "ansible.cfg"), encoding="utf-8")
+    value = config.get("defaults", "roles_path", fallback="")
+    return [os.path.join(ans_dir, path) for path in value.split(os.pathsep) if path.strip()]
+
+
+def load_graph(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            graph = json.load(fh)
+    except (OSError, json.JSONDecodeError) as exc:
+        raise RuntimeError(f"failed to read deploy graph {path}: {exc}")
+    nodes = graph.get("nodes")
+    if not isinstance(nodes, dict) or not nodes:
+        raise RuntimeError(f"{path}: 'nodes' must be a non-empty object")
+    for node_id, node in nodes.items():
+        if node.get("kind") not in KINDS:
+            raise RuntimeError(f"{path}: node {node_id}: kind must be one of {', '.join(KINDS)}")
+        if node.get("phase") not in PHASES:
+            raise RuntimeError(f"{path}: node {node_id}: phase must be one of {', '.join(PHASES)}")
+        unknown = [need for need in node.get("needs", []) if need not in nodes]
+        if unknown:
+            raise RuntimeError(f"{path}: node {node_id} needs unknown node(s): {', '.join(unknown)}")
+    graph["order"] = topological_order(nodes)
+    return graph
+
+
+def topological_order(nodes: dict[str, dict]) -> list[str]:
+    """Node ids with every node after its dependencies; file order is kept among independent nodes."""
+    order: list[str] = []
+    state: dict[str, str] = {}
+
+    def visit(node_id: str, chain: list[str]) -> None:
+        if state.get(node_id) == "done":
+            return
+        if state.get(node_id) == "visiting":
+            raise RuntimeError("deploy graph has a cycle: " + " -> ".join(chain + [node_id]))
+        state[node_id] = "visiting"
+        for need in nodes[node_id].get("needs", []):
+            visit(need, chain + [node_id])
+        state[node_id] = "done"
+        order.append(node_id)
+
+    for node_id in nodes:
+        visit(node_id, [])
+    return order
+
+
+def waves(graph: dict, nodes: set[str]) -> list[list[str]]:
+    """Nodes grouped by the earliest step they can start in (for --plan)."""
+    level: dict[str, int] = {}
+    for node_id in graph["order"]:
+        needs = [need for need in graph["nodes"][node_id].get("needs", []) if need in nodes]
+        level[node_id] = max((level[need] + 1 for need in needs), default=0)
+    result: list[list[str]] = []
+    for node_id in graph["order"]:
+        if node_id in nodes:
+            while len(result) <= level[node_id]:
+                result.append([])
+            result[level[node_id]].append(node_id)
+    return result
+
+
+class Deploy:
+    """Runs the nodes of a deploy graph concurrently, each as soon as its dependencies succeeded."""
+
+    def __init__(self, graph: dict, args: argparse.Namespace):
+        self.graph = graph
+        self.nodes = graph["nodes"]
+        self.args = args
+        self.stand_root = args.stand_root
+        self.log_dir = args.log_dir
+        self.env = self.initial_env()
+        self.output_lock = threading.Lock()
+        self.env_lock = threading.Lock()
+        # nodes naming the same "lock" never run at the same time (e.g. writers of one known_hosts);
+        # terraform's plugin cache directory is not safe for concurrent `terraform init`
+        self.locks = {node["lock"]: threading.Lock() for node in self.nodes.values() if node.get("lock")}
+        self.init_lock = threading.Lock()
+        self.width = max(len(node_id) for node_id in self.nodes)
+        self.results: dict[str, dict] = {}
+        self.state_path = os.path.join(self.stand_root, STATE_NAME)
+        self.state_lock = threading.Lock()
+        self.state = {} if self.args.fresh else self.load_state()
+        self.keys: dict[str, str] = {}
+        self.key_lock = threading.RLock()
+
+    def initial_env(self) -> dict[str, str]:
+        ans_dir = os.path.join(self.stand_root, "infrastructure", "ansible")
+        tf_dir = os.path.join(self.stand_root, "infrastructure", "terraform")
+        builtin = {
+            "STAND_ROOT": self.stand_root,
+            "SCRIPT_DIR": os.path.join(self.stand_root, "infrastructure", "scripts"),
+            "ANS_DIR": ans_dir,
+            "TF_DIR": tf_dir,
+            "INVENTORY": os.path.join(ans_dir, "inventory.sh" if self.args.dynamic_inventory else "inventory.yml"),
+        }
+        env = dict(builtin)
+        for key, value in self.graph.get("env", {}).items():
+            env[key] = expand(value, {**os.environ, **env})
+        env.update(os.environ)
+        env.update(builtin)
+        tf_rc = os.path.join(tf_dir, "terraform.rc")
+        if not env.get("TF_CLI_CONFIG_FILE") and os.path.isfile(tf_rc):
+            # shared provider cache/mirror written by tools/create_stand.py
+            env["TF_CLI_CONFIG_FILE"] = tf_rc
+        if self.args.strict_host_keys:
+            env["STRICT_HOST_KEYS"] = "1"
+            env["INVENTORY_KNOWN_HOSTS"] = os.path.join(ans_dir, "known_hosts")
+        return env
+
+    def selected(self) -> set[str]:
+        return {node_id for node_id, node in self.nodes.items() if node["phase"] not in self.args.skip}
+
+    def say(self, node_id: str, line: str) -> None:
+        if self.args.quiet:
+            return
+        with self.output_lock:
+            print(f"[{node_id:<{self.width}}] {line}", flush=True)
+
+    # -- checkpoints -------------------------------------------------------------
+
+    def load_state(self) -> dict[str, dict]:
+        try:
+            with open(self.state_path, encoding="utf-8") as fh:
+                state = json.load(fh)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+            return {}
+        return state.get("nodes", {})
+
+    def save_state(self) -> None:
+        # called with state_lock held
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({"version": STATE_VERSION, "nodes": self.state}, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        os.replace(tmp_path, self.state_path)
+
+    def forget_state(self) -> None:
+        with self.state_lock:
+            self.state = {}
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.state_path)
+
+    def inputs(self, node: dict) -> list[str]:
+        """Files a node depends on: its "inputs" patterns, or the defaults of its kind."""
+        env = self.env
+        if "inputs" in node:
+            return expand(node["inputs"], env)
+        kind = node["kind"]
+        if kind == "terraform":
+            tf_dir = expand(node["dir"], env)
+            return [os.path.join(tf_dir, name) for name in ("*.tf", "terraform.tfvars", ".terraform.lock.hcl")]
+        if kind == "playbook":
+            ans_dir = env["ANS_DIR"]
+            playbook_dir = os.path.dirname(expand(node["playbook"], env))
+            patterns = [
+                os.path.join(ans_dir, playbook_dir, "**"),
+                os.path.join(ans_dir, "group_vars", "**"),
+                os.path.join(ans_dir, "ansible.cfg"),
+            ]
+            return patterns + [os.path.join(path, "**") for path in roles_paths(ans_dir)]
+        if kind == "inventory":
+            # the generated file: deleting or editing it must regenerate it
+            args = node.get("args", [])
+            path = args[args.index("--inventory-path") + 1] if "--inventory-path" in args else "${ANS_DIR}/inventory.yml"
+            return [expand(path, env)]
+        if kind == "command" and node.get("cwd", ".") != ".":
+            return [os.path.join(expand(node["cwd"], env), "**")]
+        return []
+
+    def node_key(self, node_id: str) -> str:
+        """Hash of the node definition, its input files (and environment) and the keys of the nodes it needs."""
+        with self.key_lock:
+            if node_id not in self.keys:
+                node = self.nodes[node_id]
+                digest = hashlib.sha256(json.dumps(node, sort_keys=True).encode("utf-8"))
+                digest.update(hash_inputs(self.stand_root, self.inputs(node)).encode("utf-8"))
+                if node["kind"] == "inventory":
+                    digest.update(json.dumps([self.env.get(name) for name in INVENTORY_ENV]).encode("utf-8"))
+                for need in sorted(node.get("needs", [])):
+                    digest.update(self.node_key(need).encode("utf-8"))
+                self.keys[node_id] = digest.hexdigest()
+            return self.keys[node_id]
+
+    def resumable(self, node_id: str, statuses: dict[str, str]) -> bool:
+        """Completed earlier with the same inputs, and nothing it needs has run again since."""
+        entry = self.state.get(node_id)
+        if not entry or entry.get("key") != self.node_key(node_id):
+            return False
+        return all(statuses.get(need) in ("skipped", "resumed") for need in self.nodes[node_id].get("needs", []))
+
+    def checkpoint(self, node_id: str, result: dict, exports: dict[str, str]) -> None:
+        with self.state_lock:
+            if result["status"] == "ok":
+                self.state[node_id] = {
+                    "key": self.node_key(node_id),
+                    "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "exports": exports,
+                }
+            elif result["status"] == "failed":
+                self.state.pop(node_id, None)
+            else:
+                return
+            self.save_state()
+
+    # -- commands per node kind ------------------------------------------------
+
+    def steps(self, node_id: str, node: dict, env: dict[str, str]) -> tuple[list[list[str]], str]:
+        """Command lines of a node and their working directory."""
+        kind = node["kind"]
+        if kind == "terraform":
+            tf_dir = os.path.join(self.stand_root, expand(node["dir"], env))
+            commands = [["terraform", "apply", "-input=false", "-auto-approve"]]
+            if self.args.force_init or not init_current(tf_dir, env):
+                commands.insert(0, INIT_COMMAND)
+            else:
+                self.say(node_id, "terraform init skipped: initialized with the same lock file, backend and modules")
+            return commands, tf_dir
+        if kind == "inventory":
+            script = os.path.join(env["SCRIPT_DIR"], "generate_inventory.py")
+            return [[sys.executable, script, *expand(node.get("args", []), env), "--print-env"]], self.stand_root
+        if kind == "wait":
+            command = [
+                sys.executable,
+                os.path.join(env["SCRIPT_DIR"], "wait_for_ssh.py"),
+                "--timeout",
+                str(node.get("timeout", DEFAULT_WAIT_TIMEOUT)),
+            ]
+            for name, address in expand(node["hosts"], env).items():
+                command += ["--host", f"{name}={address}"]
+            return [command], self.stand_root
+        if kind == "playbook":
+            inventory = expand(node.get("inventory", "${INVENTORY}"), env)
+            return [["ansible-playbook", "-i", inventory, expand(node["playbook"], env)]], env["ANS_DIR"]
+        return [expand(node["command"], env)], os.path.join(self.stand_root, expand(node.get("cwd", "."), env))
+
+    def skip_reason(self, node: dict, env: dict[str, str]) -> str | None:
+        when_env = node.get("when_env")
+        if when_env and env.get(when_env) != "1":
+            return f"{when_env} is not set"
+        missing = [path for path in expand(node.get("skip_unless_files", []), env) if not self.exists(path)]
+        if missing:
+            return node.get("skip_message") or f"missing {', '.join(missing)}"
+        return None
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(os.path.join(self.stand_root, path))
+
+    # -- running ---------------------------------------------------------------
+
+    def run_node(self, node_id: str) -> dict:
+        node = self.nodes[node_id]
+        statuses = {need: self.results.get(need, {}).get("status") for need in node.get("needs", [])}
+        if self.resumable(node_id, statuses):
+            exports = self.state[node_id].get("exports") or {}
+            if exports:
+                with self.env_lock:
+                    self.env.update(exports)
+            self.say(node_id, f"resumed: completed at {self.state[node_id].get('finished_at')} with the same inputs")
+            return {"status": "resumed", "seconds": 0.0}
+        result = self.execute(node_id)
+        with self.key_lock:
+            # the steps may rewrite inputs (terraform init updates .terraform.lock.hcl): record the key
+            # of what the next run will see; nothing that needs this node has computed its key yet
+            self.keys.pop(node_id, None)
+        self.checkpoint(node_id, result, result.pop("exports", {}))
+        return result
+
+    def execute(self, node_id: str) -> dict:
+        node = self.nodes[node_id]
+        with self.env_lock:
+            env = dict(self.env)
+            env.update(expand(node.get("env", {}), env))
+        start = time.monotonic()
+        result = {"status": "ok", "seconds": 0.0}
+
+        reason = self.skip_reason(node, env)
+        if reason is not None:
+            self.say(node_id, f"skipped: {reason}")
+            return {"status": "skipped", "seconds": 0.0}
+        missing = [path for path in expand(node.get("requires", []), env) if not self.exists(path)]
+        if missing:
+            error = f"missing file(s): {', '.join(missing)}"
+            self.say(node_id, error)
+            return {"status": "failed", "seconds": 0.0, "error": error}
+
+        commands, cwd = self.steps(node_id, node, env)
+        os.makedirs(self.log_dir, exist_ok=True)
+        exports: dict[str, str] = {}
+        node_lock = self.locks[node["lock"]] if node.get("lock") else contextlib.nullcontext()
+        log_path = os.path.join(self.log_dir, f"{node_id}.log")
+        with node_lock, open(log_path, "w", encoding="utf-8") as log:
+            for command in commands:
+                self.say(node_id, "$ " + " ".join(command))
+                log.write("$ " + " ".join(command) + "\n")
+                init = command == INIT_COMMAND
+                if init:
+                    forget_init(cwd, env)
+                with self.init_lock if init else contextlib.nullcontext():
+                    code = self.stream(node_id, command, cwd, env, log, exports if node["kind"] == "inventory" else None)
+                if init and code == 0:
+                    record_init(cwd, env)
+                if code != 0:
+                    if node.get("allow_failure"):
+                        self.say(node_id, f"exit code {code} (ignored)")
+                        break
+                    self.say(node_id, f"failed with exit code {code}")
+                    result["status"] = "failed"
+                    break
+        if exports:
+            with self.env_lock:
+                self.env.update(exports)
+        result["seconds"] = round(time.monotonic() - start, 3)
+        result["exports"] = exports
+        return result
+
+    def stream(
+        self,
+        node_id: str,
+        command: list[str],
+        cwd: str,
+        env: dict[str, str],
+        log,
+        exports: dict[str, str] | None,
+    ) -> int:
+        try:
+            proc = subprocess.Popen(
+                command,
+                cwd=cwd,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                text=True,
+                errors="replace",
+                bufsize=1,
+            )
+        except OSError as exc:
+            self.say(node_id, f"cannot start {command[0]}: {exc}")
+            return 127
+        for line in proc.stdout:
+            line = line.rstrip("\n")
+            log.write(line + "\n")
+            if exports is not None:
+                match = EXPORT_LINE.match(line)
+                if match:
+                    exports[match.group(1)] = match.group(2)
+            self.say(node_id, line)
+        return proc.wait()
+
+    def run(self) -> int:
+        selected = self.selected()
+        for node_id in self.graph["order"]:
+            if node_id not in selected:
+                self.results[node_id] = {"status": "skipped", "seconds": 0.0}
+        missing_tools = sorted(
+            {TOOLS[node["kind"]] for node_id, node in self.nodes.items() if node_id in selected and node["kind"] in TOOLS}
+            - {tool for tool in TOOLS.values() if shutil.which(tool)}
+        )
+        if missing_tools:
+            raise RuntimeError(f"Missing dependency: {', '.join(missing_tools)}")
+
+        started = time.monotonic()
+        failed = False
+        running = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.args.jobs)) as executor:
+            try:
+                while True:
+                    if not failed:
+                        for node_id in self.graph["order"]:
+                            if len(running) >= self.args.jobs:
+                                break
+                            if node_id in self.results or node_id in running.values():
+                                continue
+                            needs = self.nodes[node_id].get("needs", [])
+                            if all(self.results.get(need, {}).get("status") in SATISFIED for need in needs):
+                                running[executor.submit(self.run_node, node_id)] = node_id
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        node_id = running.pop(future)
+                        try:
+                            self.results[node_id] = future.result()
+                        except Exception as exc:
+                            self.say(node_id, f"ERROR: {exc}")
+                            self.results[node_id] = {"status": "failed", "seconds": 0.0}
+                        if self.results[node_id]["status"] == "failed" and not failed:
+                            failed = True
+                            if running:
+                                self.say(node_id, "stopping: waiting for running nodes, no new nodes are started")
+            except KeyboardInterrupt:
+                # children got the same SIGINT from the terminal; let them stop gracefully
+                failed = True
+                wait(running)
+                for future, node_id in running.items():
+                    self.results[node_id] = {"status": "failed", "seconds": 0.0}
+        self.summary(time.monotonic() - started)
+        return 1 if failed else 0
+
+    def summary(self, wall: float) -> None:
+        print("", flush=True)
+        print("== Deploy summary ==")
+        busy = 0.0
+        for node_id in self.graph["order"]:
+            result = self.results.get(node_id, {"status": "not started", "seconds": 0.0})
+            busy += result["seconds"]
+            print(f"  {node_id:<{self.width}}  {result['status']:<11}  {result['seconds']:8.1f}s")
+        print(f"  wall time {wall:.1f}s, sum of node times {busy:.1f}s, logs: {self.log_dir}")
+        env = self.env
+        for line in self.graph.get("summary", []):
+            print(expand(line, env))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Deploy a stand by running its component graph concurrently.")
+    parser.add_argument("--stand-root", default=STAND_ROOT, help="Stand directory (default: the stand of this script)")
+    parser.add_argument("--graph", default=None, help=f"Deploy graph JSON (default: <stand-root>/{GRAPH_NAME})")
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help=(
+            f"Per-component pipeline: playbook of a VM starts right after its own apply ({PIPELINED_GRAPH_NAME}); "
+            "playbooks read per-component inventory files, not --dynamic-inventory"
+        ),
+    )
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help=f"Nodes running at once (default: {DEFAULT_JOBS})")
+    parser.add_argument("--skip-templates", dest="skip", action="append_const", const="templates")
+    parser.add_argument("--skip-terraform", dest="skip", action="append_const", const="terraform")
+    parser.add_argument("--skip-ansible", dest="skip", action="append_const", const="ansible")
+    parser.add_argument("--dynamic-inventory", action="store_true", help="Playbooks read ansible/inventory.sh")
+    parser.add_argument("--strict-host-keys", action="store_true", help="Collect and verify SSH host keys")
+    parser.add_argument(
+        "--force-init",
+        action="store_true",
+        help="Run terraform init even when the root fingerprint matches the last successful init",
+    )
+    parser.add_argument(
+        "--terraform-init",
+        default=None,
+        metavar="TF_DIR",
+        help="Only initialize this terraform root if its fingerprint changed, then exit",
+    )
+    parser.add_argument("--log-dir", default=None, help=f"Per-node logs (default: <stand-root>/{LOG_DIR_NAME})")
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help=f"Ignore the checkpoints of previous runs ({STATE_NAME}) and run every node",
+    )
+    parser.add_argument("--quiet", action="store_true", help="Do not echo node output (it still goes to the logs)")
+    parser.add_argument("--plan", action="store_true", help="Print the nodes in the order they can start and exit")
+    args = parser.parse_args()
+    args.stand_root = os.path.abspath(args.stand_root)
+    args.graph = args.graph or os.path.join(args.stand_root, PIPELINED_GRAPH_NAME if args.pipelined else GRAPH_NAME)
+    args.log_dir = args.log_dir or os.path.join(args.stand_root, LOG_DIR_NAME)
+    args.skip = set(args.skip or [])
+    args.dynamic_inventory = args.dynamic_inventory or os.getenv("DYNAMIC_INVENTORY") == "1"
+    args.strict_host_keys = args.strict_host_keys or os.getenv("STRICT_HOST_KEYS") == "1"
+    args.force_init = args.force_init or os.getenv("TF_FORCE_INIT") == "1"
+    if args.jobs < 1:
+        parser.error("--jobs must be positive")
+    if args.pipelined and args.dynamic_inventory:
+        # the pipelined graph gives every playbook the inventory fragment of its own component
+        parser.error("--dynamic-inventory (DYNAMIC_INVENTORY=1) cannot be combined with --pipelined")
+    return args
+
+
+def main() -> int:
+    args = parse_args()
+    if args.terraform_init:
+        return terraform_init(os.path.abspath(args.terraform_init), args.force_init)
+    graph = load_graph(args.graph)
+    deploy = Deploy(graph, args)
+    if args.plan:
+        selected = deploy.selected()
+        # what a run would resume, assuming every node it starts succeeds
+        statuses = {node_id: "skipped" for node_id in graph["order"] if node_id not in selected}
+        for node_id in graph["order"]:
+            if node_id not in selected:
+                continue
+            if deploy.skip_reason(graph["nodes"][node_id], deploy.env) is not None:
+                statuses[node_id] = "skipped"
+            else:
+                statuses[node_id] = "resumed" if deploy.resumable(node_id, statuses) else "ok"
+        for step, node_ids in enumerate(waves(graph, selected), 1):
+            marked = [f"{node_id}(resume)" if statuses[node_id] == "resumed" else node_id for node_id in node_ids]
+            print(f"{step}: {' '.join(marked)}")
+        return 0
+    if args.fresh:
+        deploy.forget_state()
+    for check in graph.get("warnings", []):
+        if check.get("phase") in args.skip:
+            continue
+        if "unless_env" in check and not deploy.env.get(check["unless_env"]):
+            print(f"WARN: {check['message']}", file=sys.stderr)
+        if "unless_file" in check and not os.path.isfile(os.path.expanduser(expand(check["unless_file"], deploy.env))):
+            print(f"WARN: {expand(check['message'], deploy.env)}", file=sys.stderr)
+    return deploy.run()
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except RuntimeError as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(2)
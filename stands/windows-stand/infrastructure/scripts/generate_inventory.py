@@ -1,31 +1,323 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
+import hashlib
 import json
 import os
+import re
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
-def run_terraform_output(tf_dir: str) -> dict:
+COMPONENTS = ("windows-10", "windows-server", "domain-controller")
+# component -> (inventory group, host name, terraform output with its address, --print-env variable)
+COMPONENT_HOSTS = {
+    "windows-10": ("windows_workstation", "windows-10", "windows_ws_ip", "WINDOWS_WS_IP"),
+    "windows-server": ("windows_server", "windows-server", "windows_server_ip", "WINDOWS_SERVER_IP"),
+    "domain-controller": ("domain_controller", "dc", "dc_ip", "DC_IP"),
+}
+INVENTORY_ENV = ("ANSIBLE_USER", "ANSIBLE_PASSWORD", "ANSIBLE_PORT", "ANSIBLE_SHELL_TYPE", "ANSIBLE_CONNECTION")
+DEFAULT_JOBS = 4
+DEFAULT_TIMEOUT = 120.0
+SUPPORTED_STATE_VERSIONS = (4,)
+SOURCES = ("auto", "state", "terraform")
+CACHE_FORMAT = 1
+# abspath, not realpath: in an overlay stand this file is a symlink into the base stand
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STAND_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, "..", ".."))
+DEFAULT_CACHE_PATH = os.path.join(SCRIPT_DIR, ".inventory-cache", "terraform-outputs.json")
+DEFAULT_LIST_CACHE_PATH = os.path.join(SCRIPT_DIR, ".inventory-cache", "inventory-list.json")
+DEFAULT_LIST_TTL = 300.0
+DEFAULT_KNOWN_HOSTS = os.path.join(STAND_ROOT, "infrastructure", "ansible", "known_hosts")
+DEFAULT_HOST_KEY_TYPE = "ed25519"
+HOST_KEY_TIMEOUT = 5
+CONNECTION_PROFILES = {
+    "posix": {
+        "ansible_ssh_args": "-C -o ControlMaster=auto -o ControlPersist=600s -o ServerAliveInterval=30",
+        "ansible_ssh_pipelining": True,
+    },
+    # No persistent PowerShell: Ansible starts a new PowerShell for every task over
+    # ssh, winrm and psrp alike, and has no setting to keep one. Reusing the
+    # multiplexed SSH master is what saves the per-task connection setup.
+    "windows": {
+        "ansible_ssh_args": "-o ControlMaster=auto -o ControlPersist=1800s -o ServerAliveInterval=30",
+    },
+}
+POSIX_ONLY_VARS = ("ansible_ssh_pipelining", "ansible_python_interpreter", "ansible_become_method")
+PLAIN_SCALAR = re.compile(r"[A-Za-z0-9_./~:+-]+")
+YAML_SPECIAL = re.compile(
+    r"[-+]?(\d[\d_]*(\.\d*)?([eE][-+]?\d+)?|0[xob][0-9a-fA-F_]+|\.inf|\.nan)"
+    r"|true|false|yes|no|on|off|y|n|null|~",
+    re.IGNORECASE,
+)
+
+
+@contextlib.contextmanager
+def phase_timer(stats: dict | None, phase: str):
+    start = time.perf_counter()
     try:
-        result = subprocess.run(
-            ["terraform", "output", "-json"],
-            cwd=tf_dir,
-            check=True,
-            capture_output=True,
-            text=True,
-        )
+        yield
+    finally:
+        if stats is not None:
+            phases = stats.setdefault("phases", {})
+            phases[phase] = round(phases.get(phase, 0.0) + time.perf_counter() - start, 6)
+
+
+class Metrics:
+    def __init__(self, stand: str):
+        self._start = time.perf_counter()
+        self.data: dict = {
+            "generator": os.path.basename(__file__),
+            "stand": stand,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "phases": {},
+            "components": {},
+            "probes": {},
+        }
+
+    def component(self, name: str) -> dict:
+        return self.data["components"].setdefault(name, {})
+
+    def probe(self, endpoint: str) -> dict:
+        return self.data["probes"].setdefault(endpoint, {})
+
+    def write(self, path: str, status: str) -> None:
+        self.data["status"] = status
+        self.data["total_seconds"] = round(time.perf_counter() - self._start, 6)
+        write_private_json(path, self.data)
+
+
+def run_terraform_output(tf_dir: str, timeout: float | None = None, stats: dict | None = None) -> dict:
+    if not os.path.isdir(tf_dir):
+        raise RuntimeError(f"terraform dir not found: {tf_dir}")
+    try:
+        with phase_timer(stats, "subprocess"):
+            result = subprocess.run(
+                ["terraform", "output", "-json"],
+                cwd=tf_dir,
+                check=True,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+            )
     except FileNotFoundError:
         raise RuntimeError("terraform not found in PATH")
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"terraform output timed out after {timeout:g}s in {tf_dir}")
     except subprocess.CalledProcessError as exc:
         stderr = (exc.stderr or "").strip()
         raise RuntimeError(f"terraform output failed in {tf_dir}: {stderr}")
     try:
-        return json.loads(result.stdout or "{}")
+        with phase_timer(stats, "parse"):
+            return json.loads(result.stdout or "{}")
     except json.JSONDecodeError as exc:
         raise RuntimeError(f"failed to parse terraform output JSON in {tf_dir}: {exc}")
 
 
+def local_state_path(tf_dir: str) -> str | None:
+    backend_path = os.path.join(tf_dir, ".terraform", "terraform.tfstate")
+    state_path = os.path.join(tf_dir, "terraform.tfstate")
+    if os.path.isfile(backend_path):
+        try:
+            with open(backend_path, encoding="utf-8") as fh:
+                backend = json.load(fh).get("backend") or {}
+        except (OSError, json.JSONDecodeError):
+            return None
+        if backend.get("type", "local") != "local":
+            return None
+        custom_path = (backend.get("config") or {}).get("path")
+        if custom_path:
+            state_path = os.path.join(tf_dir, custom_path)
+
+    workspace_file = os.path.join(tf_dir, ".terraform", "environment")
+    if os.path.isfile(workspace_file):
+        with open(workspace_file, encoding="utf-8") as fh:
+            workspace = fh.read().strip()
+        if workspace and workspace != "default":
+            state_path = os.path.join(tf_dir, "terraform.tfstate.d", workspace, "terraform.tfstate")
+    return state_path
+
+
+def read_local_state(tf_dir: str) -> dict | None:
+    state_path = local_state_path(tf_dir)
+    if not state_path or not os.path.isfile(state_path):
+        return None
+    try:
+        with open(state_path, encoding="utf-8") as fh:
+            state = json.load(fh)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(state, dict) or state.get("version") not in SUPPORTED_STATE_VERSIONS:
+        return None
+    return state
+
+
+def state_outputs(state: dict) -> dict:
+    outputs = {}
+    for name, output in (state.get("outputs") or {}).items():
+        outputs[name] = {
+            "value": output.get("value"),
+            "type": output.get("type"),
+            "sensitive": bool(output.get("sensitive", False)),
+        }
+    return outputs
+
+
+def state_stat(tf_dir: str) -> dict | None:
+    state_path = local_state_path(tf_dir)
+    if not state_path or not os.path.isfile(state_path):
+        return None
+    st = os.stat(state_path)
+    return {"path": os.path.abspath(state_path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def state_identity(state_path: str) -> dict:
+    with open(state_path, "rb") as fh:
+        data = fh.read()
+    identity = {"sha256": hashlib.sha256(data).hexdigest(), "serial": None, "lineage": None}
+    try:
+        state = json.loads(data)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return identity
+    if isinstance(state, dict):
+        identity["serial"] = state.get("serial")
+        identity["lineage"] = state.get("lineage")
+    return identity
+
+
+def write_private_json(path: str, payload: dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh)
+    os.replace(tmp_path, path)
+
+
+class OutputsCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries: dict[str, dict] = {}
+        try:
+            with open(path, encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, json.JSONDecodeError):
+            return
+        if isinstance(data, dict) and data.get("format") == CACHE_FORMAT:
+            self._entries = data.get("entries") or {}
+
+    def lookup(self, tf_dir: str) -> tuple[dict | None, dict | None]:
+        """Return (outputs, key): outputs on a hit, key to store after a miss (None = not cacheable)."""
+        stat = state_stat(tf_dir)
+        if stat is None:
+            return None, None
+        name = os.path.abspath(tf_dir)
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is not None:
+            old = entry["key"]
+            if all(old.get(field) == stat[field] for field in ("path", "mtime_ns", "size")):
+                return entry["outputs"], old
+
+        key = {**stat, **state_identity(stat["path"])}
+        if entry is not None:
+            old = entry["key"]
+            same_serial = key["lineage"] and key["serial"] is not None and (
+                (old.get("lineage"), old.get("serial")) == (key["lineage"], key["serial"])
+            )
+            if old.get("path") == key["path"] and (old.get("sha256") == key["sha256"] or same_serial):
+                self.store(tf_dir, key, entry["outputs"])
+                return entry["outputs"], key
+        return None, key
+
+    def store(self, tf_dir: str, key: dict, outputs: dict) -> None:
+        with self._lock:
+            self._entries[os.path.abspath(tf_dir)] = {"key": key, "outputs": outputs}
+            self._dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {"format": CACHE_FORMAT, "entries": self._entries}
+            self._dirty = False
+        write_private_json(self.path, payload)
+
+
+def load_outputs(
+    tf_dir: str,
+    source: str = "auto",
+    timeout: float | None = None,
+    cache: OutputsCache | None = None,
+    stats: dict | None = None,
+) -> dict:
+    key = None
+    cache_status = "disabled"
+    if cache is not None:
+        with phase_timer(stats, "cache"):
+            cached, key = cache.lookup(tf_dir)
+        if cached is not None:
+            if stats is not None:
+                stats.update(cache="hit", source="cache")
+            return cached
+        cache_status = "miss" if key is not None else "uncacheable"
+
+    outputs = None
+    used_source = "terraform"
+    if source != "terraform":
+        with phase_timer(stats, "parse"):
+            state = read_local_state(tf_dir)
+            if state is not None:
+                outputs = state_outputs(state)
+                used_source = "state"
+        if state is None and source == "state":
+            raise RuntimeError(f"no readable local terraform state (v{SUPPORTED_STATE_VERSIONS[-1]}) in {tf_dir}")
+    if outputs is None:
+        outputs = run_terraform_output(tf_dir, timeout, stats)
+
+    if cache is not None and key is not None:
+        cache.store(tf_dir, key, outputs)
+    if stats is not None:
+        stats.update(cache=cache_status, source=used_source)
+    return outputs
+
+
+def collect_outputs(
+    tf_dirs: dict[str, str],
+    jobs: int = DEFAULT_JOBS,
+    timeout: float | None = DEFAULT_TIMEOUT,
+    source: str = "auto",
+    cache: OutputsCache | None = None,
+    metrics: Metrics | None = None,
+) -> dict[str, dict]:
+    outputs: dict[str, dict] = {}
+    errors: list[str] = []
+    workers = max(1, min(jobs, len(tf_dirs)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                load_outputs, tf_dir, source, timeout, cache, metrics.component(name) if metrics else None
+            ): name
+            for name, tf_dir in tf_dirs.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                outputs[name] = future.result()
+            except RuntimeError as exc:
+                errors.append(f"{name}: {exc}")
+    if cache is not None:
+        cache.save()
+    if errors:
+        raise RuntimeError("failed to collect terraform outputs:\n  " + "\n  ".join(sorted(errors)))
+    return outputs
+
+
 def get_output(outputs: dict, key: str) -> str:
     if key not in outputs:
         raise RuntimeError(f"missing terraform output: {key}")
@@ -35,83 +327,412 @@ def get_output(outputs: dict, key: str) -> str:
     return str(value)
 
 
-def main() -> int:
-    parser = argparse.ArgumentParser(description="Generate Ansible inventory from Terraform outputs.")
-    parser.add_argument("--windows-10-dir", required=True)
-    parser.add_argument("--windows-server-dir", required=True)
-    parser.add_argument("--domain-controller-dir", required=True)
-    parser.add_argument("--inventory-path", required=True)
-    parser.add_argument("--print-env", action="store_true", help="Print KEY=VALUE lines for shell eval.")
-    args = parser.parse_args()
+def yaml_scalar(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    text = "" if value is None else str(value)
+    if PLAIN_SCALAR.fullmatch(text) and not YAML_SPECIAL.fullmatch(text):
+        return text
+    return json.dumps(text, ensure_ascii=False)
 
-    ansible_user = os.getenv("ANSIBLE_USER", "ansible")
-    ansible_password = os.getenv("ANSIBLE_PASSWORD", "").strip()
-    ansible_port = os.getenv("ANSIBLE_PORT", "22")
-    ansible_shell_type = os.getenv("ANSIBLE_SHELL_TYPE", "powershell")
-    ansible_connection = os.getenv("ANSIBLE_CONNECTION", "ssh")
-
-    ws_outputs = run_terraform_output(args.windows_10_dir)
-    srv_outputs = run_terraform_output(args.windows_server_dir)
-    dc_outputs = run_terraform_output(args.domain_controller_dir)
-
-    windows_ws_ip = get_output(ws_outputs, "windows_ws_ip")
-    windows_server_ip = get_output(srv_outputs, "windows_server_ip")
-    dc_ip = get_output(dc_outputs, "dc_ip")
-
-    password_value = ansible_password if ansible_password else "PUT-YOUR-PASSWORD-HERE"
 
+def render_inventory(groups: dict[str, dict[str, dict]], group_vars: dict[str, dict] | None = None) -> str:
     lines = [
         "---",
         "# Auto-generated by generate_inventory.py. Do not edit manually.",
         "",
         "all:",
         "  children:",
-        "    windows_workstation:",
-        "      hosts:",
-        "        windows-10:",
-        f"          ansible_host: {windows_ws_ip}",
-        f"          ansible_connection: {ansible_connection}",
-        f"          ansible_user: {ansible_user}",
-        f"          ansible_password: \"{password_value}\"",
-        f"          ansible_shell_type: {ansible_shell_type}",
-        f"          ansible_port: {ansible_port}",
-        "",
-        "    windows_server:",
-        "      hosts:",
-        "        windows-server:",
-        f"          ansible_host: {windows_server_ip}",
-        f"          ansible_connection: {ansible_connection}",
-        f"          ansible_user: {ansible_user}",
-        f"          ansible_password: \"{password_value}\"",
-        f"          ansible_shell_type: {ansible_shell_type}",
-        f"          ansible_port: {ansible_port}",
-        "",
-        "    domain_controller:",
-        "      hosts:",
-        "        dc:",
-        f"          ansible_host: {dc_ip}",
-        f"          ansible_connection: {ansible_connection}",
-        f"          ansible_user: {ansible_user}",
-        f"          ansible_password: \"{password_value}\"",
-        f"          ansible_shell_type: {ansible_shell_type}",
-        f"          ansible_port: {ansible_port}",
     ]
+    for index, (group, hosts) in enumerate(groups.items()):
+        if index:
+            lines.append("")
+        lines.append(f"    {group}:")
+        if group_vars and group_vars.get(group):
+            lines.append("      vars:")
+            lines += [f"        {key}: {yaml_scalar(value)}" for key, value in group_vars[group].items()]
+        lines.append("      hosts:")
+        for host, host_vars in hosts.items():
+            lines.append(f"        {host}:")
+            lines += [f"          {key}: {yaml_scalar(value)}" for key, value in host_vars.items()]
+    return "\n".join(lines) + "\n"
 
-    inventory_dir = os.path.dirname(os.path.abspath(args.inventory_path))
+
+def write_inventory(path: str, content: str) -> None:
+    inventory_dir = os.path.dirname(os.path.abspath(path))
     if inventory_dir and not os.path.isdir(inventory_dir):
         os.makedirs(inventory_dir, exist_ok=True)
 
-    with open(args.inventory_path, "w", encoding="utf-8") as fh:
-        fh.write("\n".join(lines) + "\n")
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(content)
+
+
+def scan_host_key(host: str, port: int, key_type: str = DEFAULT_HOST_KEY_TYPE, timeout: int = HOST_KEY_TIMEOUT) -> list[str]:
+    # A single key type means ssh-keyscan opens exactly one connection to the host.
+    cmd = ["ssh-keyscan", "-T", str(timeout), "-t", key_type, "-p", str(port), host]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout + 5)
+    except FileNotFoundError:
+        raise RuntimeError("ssh-keyscan not found in PATH")
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"ssh-keyscan timed out for {host}:{port}")
+    lines = [line for line in result.stdout.splitlines() if line.strip() and not line.startswith("#")]
+    if not lines:
+        raise RuntimeError(f"no {key_type} host key from {host}:{port}: {result.stderr.strip()}")
+    return lines
+
+
+def known_hosts_name(host: str, port: int) -> str:
+    return host if port == 22 else f"[{host}]:{port}"
+
+
+def host_endpoints(groups: dict[str, dict[str, dict]]) -> list[tuple[str, int]]:
+    endpoints = []
+    for hosts in groups.values():
+        for host_vars in hosts.values():
+            endpoint = (str(host_vars["ansible_host"]), int(host_vars.get("ansible_port", 22)))
+            if endpoint not in endpoints:
+                endpoints.append(endpoint)
+    return endpoints
+
+
+def harvest_host_keys(
+    groups: dict[str, dict[str, dict]],
+    known_hosts_path: str,
+    key_type: str = DEFAULT_HOST_KEY_TYPE,
+    jobs: int = DEFAULT_JOBS,
+    metrics: Metrics | None = None,
+) -> None:
+    endpoints = host_endpoints(groups)
+    keys: dict[str, list[str]] = {}
+    errors: list[str] = []
+
+    def scan(host: str, port: int, stats: dict | None) -> list[str]:
+        with phase_timer(stats, "host_key"):
+            return scan_host_key(host, port, key_type)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(endpoints)))) as pool:
+        futures = {
+            pool.submit(scan, host, port, metrics.probe(f"{host}:{port}") if metrics else None): (host, port)
+            for host, port in endpoints
+        }
+        for future in as_completed(futures):
+            host, port = futures[future]
+            try:
+                keys[known_hosts_name(host, port)] = future.result()
+            except RuntimeError as exc:
+                errors.append(str(exc))
+
+    existing: list[str] = []
+    if os.path.isfile(known_hosts_path):
+        with open(known_hosts_path, encoding="utf-8") as fh:
+            existing = [line.rstrip("\n") for line in fh if line.split(" ", 1)[0] not in keys]
+    lines = existing + [line for name in sorted(keys) for line in keys[name]]
+    os.makedirs(os.path.dirname(os.path.abspath(known_hosts_path)), exist_ok=True)
+    tmp_path = f"{known_hosts_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        fh.write("\n".join(lines) + "\n" if lines else "")
+    os.replace(tmp_path, known_hosts_path)
+
+    if errors:
+        raise RuntimeError("failed to fetch SSH host keys:\n  " + "\n  ".join(sorted(errors)))
+
+
+def pin_host_keys(groups: dict[str, dict[str, dict]], known_hosts_path: str) -> None:
+    ssh_args = f"-o UserKnownHostsFile={os.path.abspath(known_hosts_path)} -o StrictHostKeyChecking=yes"
+    for hosts in groups.values():
+        for host_vars in hosts.values():
+            host_vars["ansible_host_key_checking"] = True
+            host_vars["ansible_ssh_common_args"] = ssh_args
+
+
+def host_os_family(host_vars: dict) -> str:
+    return "windows" if host_vars.get("ansible_shell_type") in ("powershell", "cmd") else "posix"
+
+
+def connection_profile(groups: dict[str, dict[str, dict]], stand_id: str) -> dict[str, dict]:
+    group_vars = {}
+    for group, hosts in groups.items():
+        families = {host_os_family(host_vars) for host_vars in hosts.values()}
+        if len(families) != 1:
+            raise RuntimeError(f"group {group} mixes OS families {sorted(families)}; cannot apply one connection profile")
+        family = families.pop()
+        for host, host_vars in hosts.items():
+            connection = host_vars.get("ansible_connection", "ssh")
+            if connection != "ssh":
+                raise RuntimeError(f"connection profile needs ansible_connection=ssh, {host} uses {connection}")
+            if family == "windows":
+                invalid = [key for key in POSIX_ONLY_VARS if key in host_vars]
+                if invalid:
+                    raise RuntimeError(f"{host} is a {family} host but sets {', '.join(invalid)}")
+        profile = dict(CONNECTION_PROFILES[family])
+        profile["ansible_control_path_dir"] = f"~/.ansible/cp/{stand_id}"
+        group_vars[group] = profile
+    return group_vars
+
+
+def inventory_json(groups: dict[str, dict[str, dict]], group_vars: dict[str, dict] | None = None) -> dict:
+    data = {"_meta": {"hostvars": {}}, "all": {"children": list(groups)}}
+    for group, hosts in groups.items():
+        data[group] = {"hosts": list(hosts)}
+        if group_vars and group_vars.get(group):
+            data[group]["vars"] = group_vars[group]
+        for host, host_vars in hosts.items():
+            data["_meta"]["hostvars"][host] = host_vars
+    return data
+
+
+def list_cache_key(tf_dirs: dict[str, str], args: argparse.Namespace) -> dict:
+    env = json.dumps([os.getenv(name) for name in INVENTORY_ENV])
+    return {
+        "states": {name: state_stat(tf_dir) for name, tf_dir in sorted(tf_dirs.items())},
+        "env": hashlib.sha256(env.encode("utf-8")).hexdigest(),
+        "known_hosts": args.known_hosts,
+        "connection_profile": args.connection_profile,
+    }
+
+
+def load_cached_list(path: str, key: dict, ttl: float) -> dict | None:
+    if ttl <= 0:
+        return None
+    try:
+        with open(path, encoding="utf-8") as fh:
+            cached = json.load(fh)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(cached, dict) or cached.get("key") != key:
+        return None
+    if time.time() - cached.get("created", 0) > ttl:
+        return None
+    return cached.get("inventory")
+
+
+def add_collect_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.getenv("INVENTORY_JOBS", DEFAULT_JOBS)),
+        help="Max parallel terraform output calls.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=float(os.getenv("INVENTORY_TF_TIMEOUT", DEFAULT_TIMEOUT)),
+        help="Per-component terraform output timeout in seconds (0 = no timeout).",
+    )
+    parser.add_argument(
+        "--source",
+        choices=SOURCES,
+        default=os.getenv("INVENTORY_SOURCE", "auto"),
+        help="Where to read outputs from: local terraform.tfstate, terraform binary, or state with fallback (auto).",
+    )
+    parser.add_argument(
+        "--cache-path",
+        default=os.getenv("INVENTORY_CACHE_PATH", DEFAULT_CACHE_PATH),
+        help="Outputs cache file, invalidated by terraform state changes.",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or update the outputs cache.")
+
+
+def add_host_key_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--known-hosts",
+        default=os.getenv("INVENTORY_KNOWN_HOSTS") or None,
+        help=f"Pin hosts to this known_hosts file and enable strict host key checking (e.g. {DEFAULT_KNOWN_HOSTS}).",
+    )
+    parser.add_argument(
+        "--scan-host-keys",
+        action="store_true",
+        help="Fetch every host's SSH key in parallel into --known-hosts before writing the inventory.",
+    )
+    parser.add_argument("--host-key-type", default=DEFAULT_HOST_KEY_TYPE, help="Key type requested from each host.")
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--connection-profile",
+        action="store_true",
+        default=os.getenv("INVENTORY_CONNECTION_PROFILE", "") == "1",
+        help="Emit tuned per-group SSH settings (ControlPersist, pipelining) scoped to this stand.",
+    )
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--metrics-json",
+        default=os.getenv("INVENTORY_METRICS_JSON") or None,
+        help="Write per-phase timings and cache status as JSON to this path.",
+    )
+
+
+def add_component_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--components",
+        type=parse_components,
+        default=COMPONENTS,
+        help=f"Comma-separated subset of {','.join(COMPONENTS)}: inventory fragment with only these hosts.",
+    )
+
+
+def parse_components(value: str) -> tuple[str, ...]:
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in names if name not in COMPONENTS]
+    if unknown or not names:
+        raise argparse.ArgumentTypeError(f"expected a subset of {','.join(COMPONENTS)}, got {value!r}")
+    return names
+
+
+def add_dynamic_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--list", action="store_true", help="Print dynamic inventory JSON for Ansible.")
+    parser.add_argument("--host", default=None, help="Print hostvars JSON for one host.")
+    parser.add_argument(
+        "--list-cache-path",
+        default=os.getenv("INVENTORY_LIST_CACHE_PATH", DEFAULT_LIST_CACHE_PATH),
+        help="Cache for --list/--host results.",
+    )
+    parser.add_argument(
+        "--ttl",
+        type=float,
+        default=float(os.getenv("INVENTORY_LIST_TTL", DEFAULT_LIST_TTL)),
+        help="Seconds a cached --list result stays valid (0 = always resolve).",
+    )
+
+
+def default_tf_dirs(stand_root: str = STAND_ROOT) -> dict[str, str]:
+    return {name: os.path.join(stand_root, "infrastructure", "terraform", name) for name in COMPONENTS}
+
+
+def default_inventory_path(stand_root: str = STAND_ROOT) -> str:
+    return os.path.join(stand_root, "infrastructure", "ansible", "inventory.yml")
+
+
+def build_inventory(outputs: dict[str, dict]) -> tuple[dict[str, dict[str, dict]], dict[str, str]]:
+    ansible_user = os.getenv("ANSIBLE_USER", "ansible")
+    ansible_password = os.getenv("ANSIBLE_PASSWORD", "").strip()
+    ansible_port = os.getenv("ANSIBLE_PORT", "22")
+    ansible_shell_type = os.getenv("ANSIBLE_SHELL_TYPE", "powershell")
+    ansible_connection = os.getenv("ANSIBLE_CONNECTION", "ssh")
+
+    password_value = ansible_password if ansible_password else "PUT-YOUR-PASSWORD-HERE"
+
+    host_vars = {
+        "ansible_connection": ansible_connection,
+        "ansible_user": ansible_user,
+        "ansible_password": password_value,
+        "ansible_shell_type": ansible_shell_type,
+        "ansible_port": int(ansible_port) if ansible_port.isdigit() else ansible_port,
+    }
+    # only the components that were collected (--components builds a per-component fragment)
+    groups = {}
+    env = {}
+    for component, (group, host, output, env_key) in COMPONENT_HOSTS.items():
+        if component in outputs:
+            address = get_output(outputs[component], output)
+            groups[group] = {host: {"ansible_host": address, **host_vars}}
+            env[env_key] = address
+    return groups, env
+
+
+def resolve_dynamic_inventory(tf_dirs: dict[str, str], args: argparse.Namespace, metrics: Metrics | None = None) -> dict:
+    stats = metrics.data if metrics else None
+    with phase_timer(stats, "list_cache"):
+        key = list_cache_key(tf_dirs, args)
+        data = load_cached_list(args.list_cache_path, key, args.ttl)
+    if stats is not None:
+        stats["list_cache"] = "disabled" if args.ttl <= 0 else ("hit" if data is not None else "miss")
+    if data is not None:
+        return data
+    with phase_timer(stats, "collect"):
+        outputs = collect_outputs(
+            tf_dirs,
+            jobs=args.jobs,
+            timeout=args.timeout or None,
+            source=args.source,
+            cache=None if args.no_cache else OutputsCache(args.cache_path),
+            metrics=metrics,
+        )
+    groups = build_inventory(outputs)[0]
+    if args.known_hosts:
+        pin_host_keys(groups, args.known_hosts)
+    group_vars = connection_profile(groups, os.path.basename(STAND_ROOT)) if args.connection_profile else None
+    data = inventory_json(groups, group_vars)
+    if args.ttl > 0:
+        write_private_json(args.list_cache_path, {"created": time.time(), "key": key, "inventory": data})
+    return data
+
+
+def generate(tf_dirs: dict[str, str], args: argparse.Namespace, metrics: Metrics | None = None) -> int:
+    stats = metrics.data if metrics else None
+    if args.list or args.host:
+        data = resolve_dynamic_inventory(tf_dirs, args, metrics)
+        if args.host:
+            data = data["_meta"]["hostvars"].get(args.host, {})
+        print(json.dumps(data, indent=2))
+        return 0
+
+    with phase_timer(stats, "collect"):
+        outputs = collect_outputs(
+            tf_dirs,
+            jobs=args.jobs,
+            timeout=args.timeout or None,
+            source=args.source,
+            cache=None if args.no_cache else OutputsCache(args.cache_path),
+            metrics=metrics,
+        )
+    groups, env = build_inventory(outputs)
+    if args.scan_host_keys:
+        with phase_timer(stats, "host_keys"):
+            harvest_host_keys(groups, args.known_hosts, args.host_key_type, args.jobs, metrics)
+    if args.known_hosts:
+        pin_host_keys(groups, args.known_hosts)
+    group_vars = connection_profile(groups, os.path.basename(STAND_ROOT)) if args.connection_profile else None
+    with phase_timer(stats, "write"):
+        write_inventory(args.inventory_path, render_inventory(groups, group_vars))
 
     if args.print_env:
-        print(f"WINDOWS_WS_IP={windows_ws_ip}")
-        print(f"WINDOWS_SERVER_IP={windows_server_ip}")
-        print(f"DC_IP={dc_ip}")
+        for key, value in env.items():
+            print(f"{key}={value}")
 
     return 0
 
 
+def main() -> int:
+    tf_dirs = default_tf_dirs()
+    parser = argparse.ArgumentParser(description="Generate Ansible inventory from Terraform outputs.")
+    parser.add_argument("--windows-10-dir", default=tf_dirs["windows-10"])
+    parser.add_argument("--windows-server-dir", default=tf_dirs["windows-server"])
+    parser.add_argument("--domain-controller-dir", default=tf_dirs["domain-controller"])
+    parser.add_argument("--inventory-path", default=default_inventory_path())
+    parser.add_argument("--print-env", action="store_true", help="Print KEY=VALUE lines for shell eval.")
+    add_component_arguments(parser)
+    add_collect_arguments(parser)
+    add_host_key_arguments(parser)
+    add_profile_arguments(parser)
+    add_dynamic_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    if args.scan_host_keys and not args.known_hosts:
+        args.known_hosts = DEFAULT_KNOWN_HOSTS
+
+    tf_dirs = {
+        "windows-10": args.windows_10_dir,
+        "windows-server": args.windows_server_dir,
+        "domain-controller": args.domain_controller_dir,
+    }
+    tf_dirs = {name: tf_dir for name, tf_dir in tf_dirs.items() if name in args.components}
+    metrics = Metrics(os.path.basename(STAND_ROOT)) if args.metrics_json else None
+    status = "error"
+    try:
+        result = generate(tf_dirs, args, metrics)
+        status = "ok"
+        return result
+    finally:
+        if metrics is not None:
+            metrics.write(args.metrics_json, status)
+
+
 if __name__ == "__main__":
     try:
         sys.exit(main())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+DEFAULT_TIMEOUT = 300.0
+CONNECT_TIMEOUT = 5.0
+BANNER_TIMEOUT = 10.0
+MIN_DELAY = 0.5
+MAX_DELAY = 10.0
+MAX_PRE_BANNER_LINES = 20
+
+
+async def read_banner(host: str, port: int, connect_timeout: float, banner_timeout: float) -> str:
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), connect_timeout)
+    try:
+        # RFC 4253 allows other lines before the "SSH-" version line
+        for _ in range(MAX_PRE_BANNER_LINES):
+            line = await asyncio.wait_for(reader.readline(), banner_timeout)
+            if not line:
+                return ""
+            text = line.decode("ascii", "replace").strip()
+            if text.startswith("SSH-"):
+                return text
+        return ""
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+
+async def wait_for_host(
+    name: str,
+    host: str,
+    port: int,
+    timeout: float,
+    connect_timeout: float = CONNECT_TIMEOUT,
+    banner_timeout: float = BANNER_TIMEOUT,
+    min_delay: float = MIN_DELAY,
+    max_delay: float = MAX_DELAY,
+) -> dict:
+    start = time.monotonic()
+    deadline = start + timeout
+    delay = min_delay
+    attempts = 0
+    error = ""
+    while True:
+        attempts += 1
+        # a single attempt must not outlast the per-host timeout either
+        remaining = max(deadline - time.monotonic(), 0.0)
+        try:
+            banner = await read_banner(host, port, min(connect_timeout, remaining), min(banner_timeout, remaining))
+        except ConnectionRefusedError as exc:
+            # host is up but sshd is not listening yet: keep polling fast
+            error = str(exc) or "connection refused"
+            delay = min_delay
+        except (OSError, asyncio.TimeoutError) as exc:
+            # host still booting or unreachable: back off
+            error = str(exc) or exc.__class__.__name__
+            delay = min(delay * 2, max_delay)
+        else:
+            if banner:
+                return {
+                    "name": name,
+                    "host": host,
+                    "port": port,
+                    "ready": True,
+                    "banner": banner,
+                    "attempts": attempts,
+                    "elapsed": round(time.monotonic() - start, 3),
+                }
+            error = "no SSH banner"
+            delay = min_delay
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return {
+                "name": name,
+                "host": host,
+                "port": port,
+                "ready": False,
+                "error": error,
+                "attempts": attempts,
+                "elapsed": round(time.monotonic() - start, 3),
+            }
+        await asyncio.sleep(min(delay * random.uniform(0.8, 1.2), remaining))
+
+
+async def probe_hosts(hosts: list[tuple[str, str, int]], timeout: float, **kwargs):
+    """Probe all hosts concurrently and yield results in the order hosts become ready."""
+    tasks = [asyncio.ensure_future(wait_for_host(name, host, port, timeout, **kwargs)) for name, host, port in hosts]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def parse_host(spec: str, default_port: int) -> tuple[str, str, int]:
+    name, sep, address = spec.partition("=")
+    if not sep:
+        name, address = spec, spec
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit():
+        host, port = address, str(default_port)
+    if not name or not host:
+        raise RuntimeError(f"invalid host spec: {spec}")
+    return name, host, int(port)
+
+
+def hosts_from_inventory(path: str, default_port: int) -> list[tuple[str, str, int]]:
+    try:
+        if path == "-":
+            data = json.load(sys.stdin)
+        else:
+            with open(path, encoding="utf-8") as fh:
+                data = json.load(fh)
+    except (OSError, json.JSONDecodeError) as exc:
+        raise RuntimeError(f"failed to read inventory JSON {path}: {exc}")
+    hosts = []
+    for name, host_vars in (data.get("_meta") or {}).get("hostvars", {}).items():
+        host = host_vars.get("ansible_host") or name
+        port = int(host_vars.get("ansible_port") or default_port)
+        hosts.append((name, str(host), port))
+    return hosts
+
+
+async def run(args: argparse.Namespace) -> int:
+    hosts = [parse_host(spec, args.port) for spec in args.host]
+    if args.inventory:
+        hosts += hosts_from_inventory(args.inventory, args.port)
+    if not hosts:
+        raise RuntimeError("no hosts to probe (use --host or --inventory)")
+
+    failed = 0
+    async for result in probe_hosts(
+        hosts,
+        args.timeout,
+        connect_timeout=args.connect_timeout,
+        max_delay=args.max_delay,
+    ):
+        if not result["ready"]:
+            failed += 1
+        if args.json:
+            print(json.dumps(result), flush=True)
+        elif result["ready"]:
+            print(
+                f"READY {result['name']} {result['host']}:{result['port']} "
+                f"{result['elapsed']:.1f}s ({result['banner']})",
+                flush=True,
+            )
+        else:
+            print(
+                f"TIMEOUT {result['name']} {result['host']}:{result['port']} "
+                f"{result['elapsed']:.1f}s: {result['error']}",
+                flush=True,
+            )
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Wait until SSH answers with a banner on every host, concurrently.")
+    parser.add_argument("--host", action="append", default=[], help="NAME=ADDR[:PORT] (repeatable)")
+    parser.add_argument("--inventory", default=None, help="Dynamic inventory JSON file (generate_inventory.py --list), '-' = stdin")
+    parser.add_argument("--port", type=int, default=22, help="Default SSH port")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-host timeout in seconds")
+    parser.add_argument("--connect-timeout", type=float, default=CONNECT_TIMEOUT)
+    parser.add_argument("--max-delay", type=float, default=MAX_DELAY, help="Upper bound for the poll backoff")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per host as it finishes")
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except RuntimeError as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(2)
@@ -27,6 +27,7 @@ resource "proxmox_vm_qemu" "windows_ws" {
   description = "Рабочая станция Windows для обучения защите ОС"
   target_node = var.proxmox_node
   pool        = var.proxmox_pool != "" ? var.proxmox_pool : null
+  vmid        = var.vmid
   
   # Клонирование из шаблона или создание из ISO
   clone = var.template_name != "" ? var.template_name : null
@@ -28,6 +28,12 @@ variable "proxmox_pool" {
   default     = ""
 }
 
+variable "vmid" {
+  description = "Опционально: VMID машины (0 = следующий свободный ID в Proxmox)"
+  type        = number
+  default     = 0
+}
+
 variable "proxmox_bridge" {
   description = "Bridge в Proxmox (например vmbr0)"
   type        = string
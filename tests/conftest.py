@@ -0,0 +1,104 @@
+import importlib.util
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+# the tools import each other as top-level modules, as when they are run as scripts
+sys.path.insert(0, str(REPO_DIR / "tools"))
+
+# terraform init rewrites the lock file from the configuration, as the real one does for new providers
+FAKE_TERRAFORM = """#!/bin/bash
+echo "terraform $1 $(basename "$PWD")" >> "$CALLS"
+case "$1" in
+  init)
+    [[ -z "$TF_INIT_FAIL" ]] || exit 1
+    mkdir -p .terraform && cat *.tf | sha256sum > .terraform.lock.hcl ;;
+  output)
+    case "$(basename "$PWD")" in
+      linux-ws) echo '{"linux_ws_ip":{"value":"127.0.0.1"}}' ;;
+      linux-server) echo '{"linux_server_ip":{"value":"127.0.0.1"}}' ;;
+    esac ;;
+esac
+"""
+FAKE_ANSIBLE = """#!/bin/bash
+echo "ansible-playbook $3" >> "$CALLS"
+"""
+
+
+def copy_stand(stands_dir: Path, name: str) -> Path:
+    stand = stands_dir / name
+    shutil.copytree(
+        REPO_DIR / "stands" / "linux-stand",
+        stand,
+        symlinks=True,
+        ignore=shutil.ignore_patterns(".terraform", "*.tfstate*", "*.log", "__pycache__", ".inventory-cache", ".deploy-*"),
+    )
+    for example in (stand / "infrastructure" / "terraform").glob("*/terraform.tfvars.example"):
+        shutil.copy(example, example.with_name("terraform.tfvars"))
+    for graph_name in ("deploy-graph.json", "deploy-graph.pipelined.json"):
+        graph_path = stand / "infrastructure" / graph_name
+        graph = json.loads(graph_path.read_text(encoding="utf-8"))
+        for node in graph["nodes"].values():
+            if node["kind"] == "wait":
+                node["timeout"] = 1
+        graph_path.write_text(json.dumps(graph), encoding="utf-8")
+    return stand
+
+
+@pytest.fixture
+def repo_dir() -> Path:
+    return REPO_DIR
+
+
+@pytest.fixture
+def make_stand(tmp_path):
+    """Factory: copy of the linux stand with tfvars from the examples and 1 s SSH waits."""
+
+    def make(name: str = "lin-a", stands_dir: Path | None = None) -> Path:
+        return copy_stand(stands_dir or tmp_path, name)
+
+    return make
+
+
+@pytest.fixture
+def fake_env(tmp_path):
+    """Environment with fake terraform and ansible-playbook that log their calls to $CALLS."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name, script in (("terraform", FAKE_TERRAFORM), ("ansible-playbook", FAKE_ANSIBLE)):
+        (bin_dir / name).write_text(script, encoding="utf-8")
+        (bin_dir / name).chmod(0o755)
+    (tmp_path / "calls").write_text("", encoding="utf-8")
+    return {**os.environ, "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}", "CALLS": str(tmp_path / "calls")}
+
+
+@pytest.fixture
+def read_calls(fake_env):
+    """Calls logged by the fakes since the last read."""
+
+    def read() -> list[str]:
+        calls = Path(fake_env["CALLS"])
+        lines = calls.read_text(encoding="utf-8").splitlines()
+        calls.write_text("", encoding="utf-8")
+        return lines
+
+    return read
+
+
+@pytest.fixture
+def stand_script():
+    """Factory: import a script of infrastructure/scripts/ of a stand in the repository as a module."""
+
+    def load(name: str, stand: str = "linux-stand"):
+        path = REPO_DIR / "stands" / stand / "infrastructure" / "scripts" / f"{name}.py"
+        spec = importlib.util.spec_from_file_location(f"{stand.replace('-', '_')}_{name}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    return load
@@ -0,0 +1,33 @@
+import pytest
+
+
+@pytest.fixture(params=["linux-stand", "windows-stand"])
+def inventory(request, stand_script):
+    return stand_script("generate_inventory", request.param)
+
+
+def test_profile_per_os_family(inventory):
+    groups = {
+        "linux": {"ws": {"ansible_host": "10.0.0.10"}},
+        "windows": {"dc": {"ansible_host": "10.0.0.30", "ansible_shell_type": "powershell"}},
+    }
+    profile = inventory.connection_profile(groups, "stand-07")
+    assert profile["linux"]["ansible_ssh_pipelining"] is True
+    assert "ansible_ssh_pipelining" not in profile["windows"]
+    assert {group["ansible_control_path_dir"] for group in profile.values()} == {"~/.ansible/cp/stand-07"}
+
+
+@pytest.mark.parametrize(
+    "hosts, error",
+    [
+        (
+            {"dc": {"ansible_shell_type": "powershell", "ansible_python_interpreter": "/usr/bin/python3"}},
+            "dc is a windows host but sets ansible_python_interpreter",
+        ),
+        ({"ws": {}, "dc": {"ansible_shell_type": "cmd"}}, "mixes OS families"),
+        ({"dc": {"ansible_shell_type": "powershell", "ansible_connection": "winrm"}}, "dc uses winrm"),
+    ],
+)
+def test_profile_rejects_invalid_host_vars(inventory, hosts, error):
+    with pytest.raises(RuntimeError, match=error):
+        inventory.connection_profile({"group": hosts}, "stand-07")
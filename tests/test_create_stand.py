@@ -0,0 +1,101 @@
+import ipaddress
+
+import pytest
+
+from create_stand import STAND_SPECS, plan_rewrites, render_spec, rewrite_content, stand_params
+
+TFVARS = """proxmox_node = "pve"
+vmid         = 0
+linux_ws_name = "linux-ws"   # comment stays
+linux_ws_ip  = "192.168.102.10"
+gateway      = "192.168.102.1"
+cidr_prefix  = 24
+mgmt_cidr_prefix = 24
+"""
+
+AD_YML = """ad_stand_id: "stand-01"
+ad_stand_ou: Stand-01
+ad_dc_ip: 192.168.101.30
+ad_stand_computers:
+  - "stand-01-windows-10"
+  - stand-01-windows-server
+ad_domain: lab.local
+"""
+
+
+def test_tfvars_keep_quoted_and_bare_values():
+    values = {"vmid": "10000", "linux_ws_name": "stand-07-linux-ws", "linux_ws_ip": "10.20.7.10", "cidr_prefix": "25"}
+    content, missing = rewrite_content(TFVARS, "tfvars", values)
+    assert missing == []
+    assert content == (
+        'proxmox_node = "pve"\n'
+        "vmid         = 10000\n"
+        'linux_ws_name = "stand-07-linux-ws"   # comment stays\n'
+        'linux_ws_ip  = "10.20.7.10"\n'
+        'gateway      = "192.168.102.1"\n'
+        "cidr_prefix  = 25\n"
+        # a key is matched whole: mgmt_cidr_prefix is not cidr_prefix
+        "mgmt_cidr_prefix = 24\n"
+    )
+
+
+def test_tfvars_quoted_number_stays_quoted_and_text_gets_quoted():
+    content, _ = rewrite_content('vmid = "0"\nname = 5\n', "tfvars", {"vmid": "10001", "name": "stand-01"})
+    assert content == 'vmid = "10001"\nname = "stand-01"\n'
+
+
+def test_yaml_scalars_and_list_items():
+    values = {
+        "ad_stand_id": "stand-07",
+        "ad_stand_ou": "Stand-07",
+        "ad_dc_ip": "10.20.7.30",
+        "ad_stand_computers": ["stand-07-windows-10", "stand-07-windows-server"],
+    }
+    content, missing = rewrite_content(AD_YML, "yaml", values)
+    assert missing == []
+    assert content == (
+        'ad_stand_id: "stand-07"\n'
+        'ad_stand_ou: "Stand-07"\n'
+        'ad_dc_ip: "10.20.7.30"\n'
+        "ad_stand_computers:\n"
+        '  - "stand-07-windows-10"\n'
+        '  - "stand-07-windows-server"\n'
+        "ad_domain: lab.local\n"
+    )
+
+
+def test_missing_keys_of_all_files_reported_together(tmp_path):
+    params = stand_params("linux", "stand-07", ipaddress.ip_network("10.20.7.0/24"))
+    files = render_spec("linux", params)
+    for rel_path in STAND_SPECS["linux"]["files"]:
+        (tmp_path / rel_path).parent.mkdir(parents=True)
+        (tmp_path / rel_path).write_text(TFVARS, encoding="utf-8")
+    ws, server = (tmp_path / rel_path for rel_path in STAND_SPECS["linux"]["files"])
+    ws.write_text(TFVARS.replace("gateway", "gw"), encoding="utf-8")
+
+    with pytest.raises(RuntimeError) as error:
+        plan_rewrites(tmp_path, files)
+    lines = str(error.value).splitlines()
+    assert lines[0] == "Keys not found:"
+    assert sorted(line.strip() for line in lines[1:]) == [
+        f"{server}: linux_server_ip",
+        f"{server}: linux_server_name",
+        f"{ws}: gateway",
+    ]
+    # nothing was written
+    assert ws.read_text(encoding="utf-8") == TFVARS.replace("gateway", "gw")
+
+
+def test_missing_optional_key_and_file_are_not_errors(tmp_path):
+    params = stand_params("windows", "stand-07", ipaddress.ip_network("10.20.7.0/24"), 10000)
+    files = render_spec("windows", params)
+    for rel_path, values in files.items():
+        if rel_path.endswith(".yml.example"):
+            continue
+        (tmp_path / rel_path).parent.mkdir(parents=True)
+        (tmp_path / rel_path).write_text("".join(f'{key} = "x"\n' for key in values if key != "vmid"), encoding="utf-8")
+
+    changes = plan_rewrites(tmp_path, files, STAND_SPECS["windows"]["optional"])
+    assert len(changes) == 3
+    dc = tmp_path / "infrastructure/terraform/domain-controller/terraform.tfvars.example"
+    assert changes[dc] == 'dc_name = "stand-07-dc"\ndc_ip = "10.20.7.30"\n'
@@ -0,0 +1,74 @@
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def run_engine(fake_env, read_calls):
+    """Run the stand's deploy_engine.py with the fakes and return the calls they logged."""
+
+    def run(stand: Path, *extra: str, env: dict | None = None) -> list[str]:
+        engine = stand / "infrastructure" / "scripts" / "deploy_engine.py"
+        result = subprocess.run(
+            [sys.executable, str(engine), "--quiet", *extra],
+            env=env or fake_env,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        assert result.returncode == 0, result.stdout + result.stderr
+        return read_calls()
+
+    return run
+
+
+def applies(calls: list[str]) -> list[str]:
+    return [call for call in calls if call.startswith(("terraform apply", "ansible-playbook"))]
+
+
+def test_resume_after_init_rewrites_lock_file(make_stand, run_engine):
+    stand = make_stand()
+    tf_dir = stand / "infrastructure" / "terraform" / "linux-ws"
+    assert len(applies(run_engine(stand))) == 4
+
+    # a changed configuration: the node runs again and init writes a new lock file
+    with open(tf_dir / "main.tf", "a", encoding="utf-8") as fh:
+        fh.write("# changed\n")
+    shutil.rmtree(tf_dir / ".terraform")
+    lock = (tf_dir / ".terraform.lock.hcl").read_text(encoding="utf-8")
+    second = run_engine(stand)
+    assert "terraform apply linux-ws" in second
+    assert (tf_dir / ".terraform.lock.hcl").read_text(encoding="utf-8") != lock
+
+    assert applies(run_engine(stand)) == []
+
+
+def test_inventory_regenerated_when_missing_or_env_changes(make_stand, run_engine, fake_env):
+    stand = make_stand()
+    inventory = stand / "infrastructure" / "ansible" / "inventory.yml"
+    assert len(applies(run_engine(stand))) == 4
+
+    # regenerated with the same content: the playbooks stay resumed
+    inventory.unlink()
+    assert applies(run_engine(stand)) == []
+    assert inventory.is_file()
+
+    assert len(applies(run_engine(stand, env={**fake_env, "ANSIBLE_USER": "student"}))) == 2
+    assert "ansible_user: student" in inventory.read_text(encoding="utf-8")
+
+
+def test_engine_skips_init_of_unchanged_roots(make_stand, run_engine):
+    stand = make_stand()
+    first = run_engine(stand)
+    assert sorted(call for call in first if call.startswith("terraform init")) == [
+        "terraform init linux-server",
+        "terraform init linux-ws",
+    ]
+
+    # every node runs again, but the roots are initialized already
+    again = run_engine(stand, "--fresh")
+    assert len(applies(again)) == 4
+    assert not [call for call in again if call.startswith("terraform init")]
@@ -0,0 +1,89 @@
+import json
+import sys
+import threading
+
+import fleet_deploy
+
+LIMITS = {"clone:s1": 2, "clone:s2": 2, "apply:pve": 3, "forks": 3}
+
+
+def test_simulated_fleet_keeps_claims_within_limits(tmp_path, make_stand, monkeypatch):
+    stands_dir = tmp_path / "stands"
+    for number in range(1, 6):
+        stand = make_stand(f"stand-0{number}", stands_dir)
+        storage = "s1" if number <= 3 else "s2"
+        for tfvars in (stand / "infrastructure" / "terraform").glob("*/terraform.tfvars"):
+            tfvars.write_text(
+                tfvars.read_text(encoding="utf-8").replace('"local-lvm"', f'"{storage}"'), encoding="utf-8"
+            )
+
+    # count the claims of the nodes that are actually running, not the scheduler's own bookkeeping
+    lock = threading.Lock()
+    active: dict[str, int] = {}
+    peak: dict[str, int] = {}
+    run_node = fleet_deploy.Fleet.run_node
+
+    def tracked(self, stand, node_id, sharing):
+        claims = stand.claims[node_id]
+        with lock:
+            for resource, count in claims.items():
+                active[resource] = active.get(resource, 0) + count
+                peak[resource] = max(peak.get(resource, 0), active[resource])
+        try:
+            return run_node(self, stand, node_id, sharing)
+        finally:
+            with lock:
+                for resource, count in claims.items():
+                    active[resource] -= count
+
+    monkeypatch.setattr(fleet_deploy.Fleet, "run_node", tracked)
+    metrics = tmp_path / "fleet.json"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "fleet_deploy.py",
+            "--stands-dir",
+            str(stands_dir),
+            "--simulate",
+            "--clones-per-storage",
+            "2",
+            "--applies-per-node",
+            "3",
+            "--ansible-forks",
+            "3",
+            "--forks-per-playbook",
+            "2",
+            "--status-interval",
+            "0",
+            "--metrics-json",
+            str(metrics),
+            "--sim-clone-seconds",
+            "0.2",
+            "--sim-boot-seconds",
+            "0.05",
+            "--sim-playbook-seconds",
+            "0.1",
+            "--sim-step-seconds",
+            "0.01",
+        ],
+    )
+
+    assert fleet_deploy.main() == 0
+    for resource, limit in LIMITS.items():
+        assert peak[resource] <= limit, resource
+    # the limits were reached, so they did hold something back
+    assert peak["clone:s1"] == 2
+    assert peak["apply:pve"] == 3
+    # one playbook of 2 forks fits into 3 forks at a time
+    assert peak["forks"] == 2
+
+    report = json.loads(metrics.read_text(encoding="utf-8"))
+    assert report["simulate"] is True
+    assert report["limits"] == {"clone": 2, "apply": 3, "forks": 3}
+    assert report["status"]["done"] == 5 and report["status"]["failed"] == 0
+    assert {name: stand["status"] for name, stand in report["stands"].items()} == {
+        f"stand-0{number}": "ok" for number in range(1, 6)
+    }
+    for stand in report["stands"].values():
+        assert stand["nodes"]["playbook-linux-ws"]["status"] == "ok"
@@ -0,0 +1,42 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def run_fleet(repo_dir, fake_env, read_calls):
+    """Run tools/fleet_deploy.py with the fakes and return the calls they logged."""
+
+    def run(stands_dir: Path, *extra: str) -> list[str]:
+        command = [sys.executable, str(repo_dir / "tools" / "fleet_deploy.py"), "--stands-dir", str(stands_dir)]
+        result = subprocess.run(
+            [*command, "--status-interval", "0", *extra],
+            env=fake_env,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        assert result.returncode == 0, result.stdout + result.stderr
+        return read_calls()
+
+    return run
+
+
+def test_fleet_resumes_completed_stand(tmp_path, make_stand, run_fleet):
+    stands_dir = tmp_path / "stands"
+    stand = make_stand(stands_dir=stands_dir)
+
+    first = run_fleet(stands_dir)
+    assert sum(call.startswith("terraform apply") for call in first) == 2
+    assert sum(call.startswith("ansible-playbook") for call in first) == 2
+    state = json.loads((stand / "infrastructure" / ".deploy-state.json").read_text(encoding="utf-8"))
+    assert "playbook-linux-ws" in state["nodes"]
+
+    second = run_fleet(stands_dir)
+    assert not [call for call in second if call.startswith(("terraform apply", "ansible-playbook"))]
+
+    fresh = run_fleet(stands_dir, "--fresh")
+    assert sum(call.startswith("terraform apply") for call in fresh) == 2
@@ -0,0 +1,51 @@
+import ipaddress
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from create_stand import ACL_SCRIPT, proxmox_acl_script
+from stand_registry import StandRegistry, default_registry_path
+
+
+@pytest.fixture
+def run_fleet_inventory(repo_dir, fake_env):
+    """Run tools/generate_fleet_inventory.py with the fake terraform and return the fleet inventory."""
+
+    def run(stands_dir: Path, *extra: str) -> subprocess.CompletedProcess:
+        command = [sys.executable, str(repo_dir / "tools" / "generate_fleet_inventory.py"), "--stands-dir", str(stands_dir)]
+        return subprocess.run([*command, "--no-cache", *extra], env=fake_env, capture_output=True, text=True, timeout=120)
+
+    return run
+
+
+def test_groups_are_named_after_stand_ids(tmp_path, make_stand, run_fleet_inventory):
+    stands_dir = tmp_path / "stands"
+    acl_stand = make_stand("dir-a", stands_dir)
+    (acl_stand / ACL_SCRIPT).write_text(proxmox_acl_script("stand-07", "ansible@pve", "StandUser"), encoding="utf-8")
+    make_stand("dir-b", stands_dir)
+    registry = StandRegistry(default_registry_path(stands_dir))
+    registry.register("dir-b", "stand-08", ipaddress.ip_network("10.20.8.0/24"), {})
+    registry.close()
+    make_stand("dir-c", stands_dir)
+
+    result = run_fleet_inventory(stands_dir)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    inventory = (stands_dir / ".fleet" / "inventory.yml").read_text(encoding="utf-8")
+    groups = [line.strip().rstrip(":") for line in inventory.splitlines() if line.startswith("    ") and line[4] != " "]
+    assert groups == ["stand_07", "stand_08", "dir_c", "linux_workstation", "linux_server"]
+    assert "        stand-07-linux-ws:\n          ansible_host: 127.0.0.1\n" in inventory
+    assert (stands_dir / ".fleet" / "group_vars" / "stand_08").is_dir()
+
+
+def test_duplicate_stand_ids_are_rejected(tmp_path, make_stand, run_fleet_inventory):
+    stands_dir = tmp_path / "stands"
+    for name in ("dir-a", "dir-b"):
+        stand = make_stand(name, stands_dir)
+        (stand / ACL_SCRIPT).write_text(proxmox_acl_script("stand-07", "ansible@pve", "StandUser"), encoding="utf-8")
+
+    result = run_fleet_inventory(stands_dir)
+    assert result.returncode == 2
+    assert "dir-b and dir-a share stand ID stand-07" in result.stderr
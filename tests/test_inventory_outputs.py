@@ -0,0 +1,136 @@
+import json
+import os
+
+import pytest
+
+OUTPUTS = {"linux_ws_ip": {"value": "10.20.7.10", "type": "string"}}
+
+
+@pytest.fixture(params=["linux-stand", "windows-stand"])
+def inventory(request, stand_script):
+    return stand_script("generate_inventory", request.param)
+
+
+@pytest.fixture
+def tf_dir(tmp_path, fake_env, monkeypatch):
+    """A linux-ws root; terraform on PATH is the fake that logs to $CALLS."""
+    monkeypatch.setenv("PATH", fake_env["PATH"])
+    monkeypatch.setenv("CALLS", fake_env["CALLS"])
+    path = tmp_path / "linux-ws"
+    path.mkdir()
+    return path
+
+
+def write_state(path, serial: int = 1, lineage: str = "lineage-a", ip: str = "10.20.7.10", indent=None) -> None:
+    state = {
+        "version": 4,
+        "serial": serial,
+        "lineage": lineage,
+        "outputs": {"linux_ws_ip": {"value": ip, "type": "string"}},
+        "resources": [],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(state, indent=indent), encoding="utf-8")
+
+
+def write_backend(tf_dir, backend: dict) -> None:
+    (tf_dir / ".terraform").mkdir(exist_ok=True)
+    backend_state = {"version": 3, "backend": backend}
+    (tf_dir / ".terraform" / "terraform.tfstate").write_text(json.dumps(backend_state), encoding="utf-8")
+
+
+def load(inventory, tf_dir, source: str = "auto", cache=None) -> tuple[dict, dict]:
+    stats: dict = {}
+    outputs = inventory.load_outputs(str(tf_dir), source, 10.0, cache, stats)
+    return outputs, stats
+
+
+def test_local_state_is_read_without_terraform(inventory, tf_dir, read_calls):
+    write_state(tf_dir / "terraform.tfstate")
+    outputs, stats = load(inventory, tf_dir)
+    assert outputs["linux_ws_ip"]["value"] == "10.20.7.10"
+    assert stats["source"] == "state"
+    assert read_calls() == []
+
+
+@pytest.mark.parametrize("state", ["remote backend", "invalid json", "unsupported version", "no state"])
+def test_falls_back_to_terraform_output(inventory, tf_dir, read_calls, state):
+    if state == "remote backend":
+        # a stale local file must not be used once the state lives elsewhere
+        write_state(tf_dir / "terraform.tfstate", ip="192.0.2.1")
+        write_backend(tf_dir, {"type": "s3", "config": {"bucket": "states"}})
+        assert inventory.local_state_path(str(tf_dir)) is None
+    elif state == "invalid json":
+        (tf_dir / "terraform.tfstate").write_text("{not json", encoding="utf-8")
+    elif state == "unsupported version":
+        (tf_dir / "terraform.tfstate").write_text(json.dumps({"version": 3, "outputs": {}}), encoding="utf-8")
+
+    outputs, stats = load(inventory, tf_dir)
+    assert outputs["linux_ws_ip"]["value"] == "127.0.0.1"
+    assert stats["source"] == "terraform"
+    assert read_calls() == ["terraform output linux-ws"]
+
+    if state != "remote backend":
+        with pytest.raises(RuntimeError, match="no readable local terraform state"):
+            load(inventory, tf_dir, source="state")
+
+
+def test_workspace_and_custom_local_path(inventory, tf_dir, read_calls):
+    write_state(tf_dir / "terraform.tfstate", ip="192.0.2.1")
+    write_state(tf_dir / "terraform.tfstate.d" / "stand-07" / "terraform.tfstate", ip="10.20.7.10")
+    (tf_dir / ".terraform").mkdir()
+    (tf_dir / ".terraform" / "environment").write_text("stand-07\n", encoding="utf-8")
+    workspace_state = tf_dir / "terraform.tfstate.d" / "stand-07" / "terraform.tfstate"
+    assert inventory.local_state_path(str(tf_dir)) == str(workspace_state)
+    assert load(inventory, tf_dir)[0]["linux_ws_ip"]["value"] == "10.20.7.10"
+
+    (tf_dir / ".terraform" / "environment").write_text("default\n", encoding="utf-8")
+    write_backend(tf_dir, {"type": "local", "config": {"path": "states/ws.tfstate"}})
+    write_state(tf_dir / "states" / "ws.tfstate", ip="10.20.7.11")
+    assert load(inventory, tf_dir)[0]["linux_ws_ip"]["value"] == "10.20.7.11"
+    assert read_calls() == []
+
+
+def test_cache_invalidation(inventory, tf_dir, tmp_path):
+    state = tf_dir / "terraform.tfstate"
+    cache_path = str(tmp_path / "cache.json")
+    write_state(state)
+
+    def lookup():
+        cache = inventory.OutputsCache(cache_path)
+        outputs, stats = load(inventory, tf_dir, cache=cache)
+        cache.save()
+        return stats["cache"], outputs["linux_ws_ip"]["value"]
+
+    def touch():
+        st = os.stat(state)
+        os.utime(state, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    assert lookup() == ("miss", "10.20.7.10")
+    assert lookup() == ("hit", "10.20.7.10")
+
+    # mtime only: the content hash still matches
+    touch()
+    assert lookup() == ("hit", "10.20.7.10")
+
+    # terraform rewrote the same serial and lineage with other formatting
+    write_state(state, indent=2)
+    touch()
+    assert lookup() == ("hit", "10.20.7.10")
+
+    write_state(state, serial=2, ip="10.20.7.12")
+    touch()
+    assert lookup() == ("miss", "10.20.7.12")
+
+    # a new lineage with the same serial (state recreated) is a different state
+    write_state(state, serial=2, lineage="lineage-b", ip="10.20.7.13")
+    touch()
+    assert lookup() == ("miss", "10.20.7.13")
+
+
+def test_remote_state_is_not_cached(inventory, tf_dir, tmp_path, read_calls):
+    write_backend(tf_dir, {"type": "remote", "config": {}})
+    cache = inventory.OutputsCache(str(tmp_path / "cache.json"))
+    for _ in range(2):
+        assert load(inventory, tf_dir, cache=cache)[1]["cache"] == "uncacheable"
+    assert read_calls() == ["terraform output linux-ws"] * 2
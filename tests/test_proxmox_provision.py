@@ -0,0 +1,195 @@
+import json
+import subprocess
+import sys
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from create_stand import ACL_SCRIPT, proxmox_acl_script
+from proxmox_provision import ProxmoxAPI
+
+PRIVS = "VM.Audit,VM.Console,VM.PowerMgmt"
+
+
+class FakeProxmox(ThreadingHTTPServer):
+    """Proxmox API stand-in: roles, users, pools and ACL in memory, every request logged."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.log: list[tuple[str, str, dict]] = []
+        # methods whose next request is applied but never answered, one entry per request
+        self.drop: list[str] = []
+        self.roles = {"StudentVM": "VM.Audit"}
+        self.users = {"student01@pve"}
+        self.pools = {"stand-01"}
+        self.acl = {("/pool/stand-01", "student01@pve", "StudentVM")}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api2/json"
+
+    def writes(self) -> list[tuple[str, str, dict]]:
+        return [entry for entry in self.log if entry[0] != "GET"]
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def handle(self) -> None:
+        with self.server.lock:
+            self.server.connections += 1
+        super().handle()
+
+    def do_GET(self) -> None:
+        self.serve("GET")
+
+    def do_POST(self) -> None:
+        self.serve("POST")
+
+    def do_PUT(self) -> None:
+        self.serve("PUT")
+
+    def serve(self, method: str) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+        params = dict(urllib.parse.parse_qsl(body or url.query))
+        path = url.path.removeprefix("/api2/json")
+        server = self.server
+        with server.lock:
+            server.log.append((method, path, params))
+            if method in server.drop:
+                # the server applies the request but the connection breaks before the response
+                server.drop.remove(method)
+                self.apply(method, path, params)
+                self.close_connection = True
+                return
+            data = self.apply(method, path, params)
+        payload = json.dumps({"data": data}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def apply(self, method: str, path: str, params: dict):
+        server = self.server
+        if method == "GET":
+            return {
+                "/access/roles": [{"roleid": role, "privs": privs} for role, privs in server.roles.items()],
+                "/access/users": [{"userid": user} for user in server.users],
+                "/pools": [{"poolid": pool} for pool in server.pools],
+                "/access/acl": [
+                    {"path": acl_path, "ugid": user, "roleid": role, "type": "user"}
+                    for acl_path, user, role in server.acl
+                ],
+            }[path]
+        if path == "/access/roles":
+            server.roles[params["roleid"]] = params["privs"]
+        elif path.startswith("/access/roles/"):
+            role = urllib.parse.unquote(path.rsplit("/", 1)[1])
+            server.roles[role] = ",".join(sorted(set(server.roles[role].split(",")) | set(params["privs"].split(","))))
+        elif path == "/access/users":
+            server.users.add(params["userid"])
+        elif path == "/pools":
+            server.pools.add(params["poolid"])
+        elif path == "/access/acl":
+            for user in params["users"].split(","):
+                server.acl.add((params["path"], user, params["roles"]))
+        return None
+
+
+@pytest.fixture
+def proxmox():
+    server = FakeProxmox()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def provision(repo_dir, stands_dir, server: FakeProxmox) -> str:
+    result = subprocess.run(
+        [
+            sys.executable,
+            str(repo_dir / "tools" / "proxmox_provision.py"),
+            "--stands-dir",
+            str(stands_dir),
+            "--api-url",
+            server.url,
+            "--token-id",
+            "root@pam!test",
+            "--token-secret",
+            "secret",
+        ],
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+def test_provision_writes_only_differences_over_one_connection(tmp_path, repo_dir, proxmox):
+    stands_dir = tmp_path / "stands"
+    for number, user in ((1, "student01@pve"), (2, "student02@pve"), (3, "student02@pve")):
+        script = stands_dir / f"stand-0{number}" / ACL_SCRIPT
+        script.parent.mkdir(parents=True)
+        script.write_text(proxmox_acl_script(f"stand-0{number}", user, "StudentVM"), encoding="utf-8")
+
+    output = provision(repo_dir, stands_dir, proxmox)
+    assert proxmox.connections == 1
+    assert sorted(path for method, path, _ in proxmox.log if method == "GET") == [
+        "/access/acl",
+        "/access/roles",
+        "/access/users",
+        "/pools",
+    ]
+    assert proxmox.writes() == [
+        ("PUT", "/access/roles/StudentVM", {"privs": "VM.Console,VM.PowerMgmt", "append": "1"}),
+        ("POST", "/access/users", {"userid": "student02@pve"}),
+        ("POST", "/pools", {"poolid": "stand-02"}),
+        ("POST", "/pools", {"poolid": "stand-03"}),
+        ("PUT", "/access/acl", {"path": "/pool/stand-02", "roles": "StudentVM", "users": "student02@pve"}),
+        ("PUT", "/access/acl", {"path": "/pool/stand-03", "roles": "StudentVM", "users": "student02@pve"}),
+    ]
+    assert proxmox.roles["StudentVM"] == PRIVS
+    assert "6 change(s) applied, 10 API request(s)" in output
+
+    proxmox.log.clear()
+    proxmox.connections = 0
+    output = provision(repo_dir, stands_dir, proxmox)
+    assert proxmox.connections == 1
+    assert proxmox.writes() == []
+    assert "0 change(s) applied, 4 API request(s)" in output
+
+
+def test_dropped_connection_retries_only_idempotent_methods(proxmox):
+    api = ProxmoxAPI(proxmox.url, "root@pam!test", "secret")
+    try:
+        proxmox.drop.append("GET")
+        assert api.request("GET", "/pools") == [{"poolid": "stand-01"}]
+        assert [entry[0] for entry in proxmox.log] == ["GET", "GET"]
+
+        # the POST reached the server: sending it again would create the pool twice
+        proxmox.drop.append("POST")
+        with pytest.raises(RuntimeError, match="POST /pools failed"):
+            api.request("POST", "/pools", {"poolid": "stand-02"})
+        assert [entry[0] for entry in proxmox.log].count("POST") == 1
+        assert "stand-02" in proxmox.pools
+
+        # a reset on the retry too is reported like every other transport error
+        proxmox.drop.extend(["GET", "GET"])
+        with pytest.raises(RuntimeError, match="GET /pools failed"):
+            api.request("GET", "/pools")
+    finally:
+        api.close()
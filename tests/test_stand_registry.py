@@ -0,0 +1,116 @@
+import ipaddress
+
+import pytest
+
+from stand_registry import StandRegistry
+
+POOL = ipaddress.ip_network("10.20.0.0/22")
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = StandRegistry(tmp_path / "registry.sqlite3")
+    yield registry
+    registry.close()
+
+
+def free_blocks(registry: StandRegistry, pool: ipaddress.IPv4Network = POOL) -> list[str]:
+    rows = registry.db.execute("SELECT start, prefixlen FROM free_blocks WHERE pool = ? ORDER BY start", (str(pool),))
+    return [str(ipaddress.IPv4Network((row["start"], row["prefixlen"]))) for row in rows]
+
+
+def take(registry: StandRegistry, name: str, prefixlen: int) -> ipaddress.IPv4Network:
+    subnet = registry.allocate(POOL, prefixlen)
+    registry.register(name, name, subnet, {})
+    return subnet
+
+
+def test_allocate_splits_the_smallest_block_that_fits(registry):
+    assert take(registry, "stand-01", 24) == ipaddress.ip_network("10.20.0.0/24")
+    assert free_blocks(registry) == ["10.20.1.0/24", "10.20.2.0/23"]
+
+    # the free /24 is split rather than the /23
+    assert take(registry, "stand-02", 26) == ipaddress.ip_network("10.20.1.0/26")
+    assert free_blocks(registry) == ["10.20.1.64/26", "10.20.1.128/25", "10.20.2.0/23"]
+    assert take(registry, "stand-03", 23) == ipaddress.ip_network("10.20.2.0/23")
+
+    with pytest.raises(RuntimeError, match="has no free /24 block"):
+        registry.allocate(POOL, 24)
+
+
+def test_release_merges_buddies(registry):
+    for number in range(1, 5):
+        take(registry, f"stand-0{number}", 24)
+    assert free_blocks(registry) == []
+
+    registry.release("stand-02")
+    registry.release("stand-04")
+    # 10.20.1.0/24 and 10.20.3.0/24 are not buddies of each other
+    assert free_blocks(registry) == ["10.20.1.0/24", "10.20.3.0/24"]
+    registry.release("stand-01")
+    assert free_blocks(registry) == ["10.20.0.0/23", "10.20.3.0/24"]
+    registry.release("stand-03")
+    assert free_blocks(registry) == ["10.20.0.0/22"]
+
+
+def test_pool_is_carved_around_existing_stands(registry, tmp_path, make_stand):
+    registry.register("manual", "manual", ipaddress.ip_network("10.20.2.0/24"), {"linux-ws": "10.20.2.10"})
+    # the pool is created on first use and skips the stand registered before it
+    assert take(registry, "stand-01", 24) == ipaddress.ip_network("10.20.3.0/24")
+    assert free_blocks(registry) == ["10.20.0.0/23"]
+
+    # stands already on disk are registered by seed() and carved out of the pools that contain them
+    stands_dir = tmp_path / "stands"
+    make_stand("linux-stand", stands_dir)
+    assert registry.seed(stands_dir) == []
+    assert registry.get("linux-stand")["subnet"] == "192.168.102.0/24"
+    assert registry.get("linux-stand")["hosts"] == {"linux-server": "192.168.102.20", "linux-ws": "192.168.102.10"}
+    pool = ipaddress.ip_network("192.168.100.0/22")
+    assert registry.allocate(pool, 24) == ipaddress.ip_network("192.168.103.0/24")
+    assert free_blocks(registry, pool) == ["192.168.100.0/23", "192.168.103.0/24"]
+
+
+def test_register_rejects_overlapping_subnets(registry):
+    take(registry, "stand-01", 24)
+    for subnet in ("10.20.0.0/23", "10.20.0.128/25", "10.20.0.0/24"):
+        with pytest.raises(RuntimeError, match="overlaps stand stand-01"):
+            registry.register("other", "other", ipaddress.ip_network(subnet), {})
+    assert registry.get("other") is None
+    registry.register("other", "other", ipaddress.ip_network("10.20.1.0/24"), {})
+
+
+def register_stands(registry: StandRegistry, count: int) -> list[str]:
+    names = [f"stand-0{number}" for number in range(1, count + 1)]
+    for number, name in enumerate(names):
+        registry.register(name, name, ipaddress.ip_network(f"10.30.{number}.0/24"), {})
+    return names
+
+
+def test_reserve_vmids_aligned_blocks(registry):
+    names = register_stands(registry, 3)
+    assert registry.reserve_vmids(names, size=10, base=10005) == {"stand-01": 10010, "stand-02": 10020, "stand-03": 10030}
+    assert registry.vmids("stand-02") == (10020, 10)
+    # stands that own a large enough block keep it
+    assert registry.reserve_vmids(["stand-02"], size=10, base=10005) == {"stand-02": 10020}
+
+
+def test_reserve_vmids_skips_taken_ids_and_blocks(registry):
+    names = register_stands(registry, 3)
+    registry.assign_vmids("stand-01", 10000, 10)
+    # 10013 is used on the cluster: the block 10010-10019 is skipped as a whole
+    reserved = registry.reserve_vmids(["stand-02", "stand-03"], size=10, base=10000, taken={10013, 99})
+    assert reserved == {"stand-02": 10020, "stand-03": 10030}
+    assert registry.reserve_vmids(names, size=10) == {"stand-01": 10000, "stand-02": 10020, "stand-03": 10030}
+
+    with pytest.raises(RuntimeError, match="overlap the block of stand stand-02"):
+        registry.assign_vmids("stand-01", 10025, 3)
+
+
+def test_release_frees_the_vmid_block(registry):
+    names = register_stands(registry, 2)
+    registry.reserve_vmids(names, size=10)
+    registry.release("stand-01")
+    assert registry.vmids("stand-01") is None
+
+    registry.register("stand-03", "stand-03", ipaddress.ip_network("10.30.9.0/24"), {})
+    assert registry.reserve_vmids(["stand-03"], size=10) == {"stand-03": 10000}
@@ -0,0 +1,111 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+MAIN_TF = """terraform {
+  required_providers {
+    proxmox = {
+      source  = "bpg/proxmox"
+      version = "0.66.1"
+    }
+  }
+  backend "local" {
+    path = "terraform.tfstate"
+  }
+}
+
+module "vm" {
+  source = "../modules/vm"
+}
+
+resource "null_resource" "marker" {
+  triggers = {
+    value = "1"
+  }
+}
+"""
+
+
+@pytest.fixture
+def tf_root(tmp_path):
+    root = tmp_path / "terraform" / "linux-ws"
+    root.mkdir(parents=True)
+    (root / "main.tf").write_text(MAIN_TF, encoding="utf-8")
+    return root
+
+
+@pytest.fixture
+def run_init(repo_dir, fake_env, read_calls):
+    """deploy_engine.py --terraform-init, the entry point of deploy.sh --sequential; True when init ran."""
+    engine = repo_dir / "stands" / "linux-stand" / "infrastructure" / "scripts" / "deploy_engine.py"
+
+    def run(tf_dir: Path, *extra: str, env: dict | None = None, code: int = 0) -> bool:
+        result = subprocess.run(
+            [sys.executable, str(engine), "--terraform-init", str(tf_dir), *extra],
+            env=env or fake_env,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        assert result.returncode == code, result.stdout + result.stderr
+        calls = read_calls()
+        assert ("skipped" in result.stdout) == (not calls)
+        return calls == [f"terraform init {tf_dir.name}"]
+
+    return run
+
+
+def edit(path: Path, old: str, new: str) -> None:
+    text = path.read_text(encoding="utf-8")
+    assert old in text
+    path.write_text(text.replace(old, new), encoding="utf-8")
+
+
+def test_unchanged_root_skips_init(tf_root, run_init):
+    assert run_init(tf_root) is True
+    assert (tf_root / ".terraform" / ".init-fingerprint").is_file()
+    assert run_init(tf_root) is False
+
+
+def test_resource_changes_skip_init(tf_root, run_init):
+    run_init(tf_root)
+    edit(tf_root / "main.tf", 'value = "1"', 'value = "2"')
+    (tf_root / "variables.tf").write_text('variable "name" {\n  type = string\n}\n', encoding="utf-8")
+    (tf_root / "terraform.tfvars").write_text('name = "stand-02"\n', encoding="utf-8")
+    assert run_init(tf_root) is False
+
+
+@pytest.mark.parametrize(
+    "change",
+    ["lock file", "backend", "backend file", "module source", "cli config"],
+)
+def test_init_inputs_force_init(tf_root, run_init, fake_env, change):
+    env = {**fake_env, "TF_CLI_CONFIG_FILE": str(tf_root / "terraform.rc")}
+    (tf_root / "terraform.rc").write_text('plugin_cache_dir = "/tmp/a"\n', encoding="utf-8")
+    run_init(tf_root, env=env)
+    if change == "lock file":
+        (tf_root / ".terraform.lock.hcl").write_text('provider "registry.terraform.io/bpg/proxmox" {}\n', encoding="utf-8")
+    elif change == "backend":
+        edit(tf_root / "main.tf", 'path = "terraform.tfstate"', 'path = "state/terraform.tfstate"')
+    elif change == "backend file":
+        (tf_root / "prod.tfbackend").write_text('path = "prod.tfstate"\n', encoding="utf-8")
+    elif change == "module source":
+        edit(tf_root / "main.tf", 'source = "../modules/vm"', 'source = "../modules/vm-v2"')
+    else:
+        (tf_root / "terraform.rc").write_text('plugin_cache_dir = "/tmp/b"\n', encoding="utf-8")
+    assert run_init(tf_root, env=env) is True
+    assert run_init(tf_root, env=env) is False
+
+
+def test_force_init_and_failed_init(tf_root, run_init, fake_env):
+    run_init(tf_root)
+    assert run_init(tf_root, "--force-init") is True
+    assert run_init(tf_root, env={**fake_env, "TF_FORCE_INIT": "1"}) is True
+
+    # a failed init forgets the fingerprint, so the next run initializes again
+    run_init(tf_root, "--force-init", env={**fake_env, "TF_INIT_FAIL": "1"}, code=1)
+    assert not (tf_root / ".terraform" / ".init-fingerprint").exists()
+    assert run_init(tf_root) is True
+    assert run_init(tf_root) is False
@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import json
+import socket
+import time
+
+import pytest
+
+BANNER = b"SSH-2.0-OpenSSH_9.6\r\n"
+# short poll intervals and attempt timeouts so that the stand-ins answer within a second
+FAST = {"connect_timeout": 0.5, "banner_timeout": 0.3, "min_delay": 0.05, "max_delay": 0.2}
+
+
+@pytest.fixture(params=["linux-stand", "windows-stand"])
+def wait_for_ssh(request, stand_script):
+    return stand_script("wait_for_ssh", request.param)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def ssh_stand_in(port: int = 0, delay: float = 0.0, banner: bytes | None = BANNER) -> asyncio.AbstractServer:
+    """TCP server that sends the banner after a delay, or never answers when banner is None."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            if banner is None:
+                await reader.read()
+                return
+            await asyncio.sleep(delay)
+            writer.write(b"pre-banner line\r\n" + banner)
+            await writer.drain()
+            await reader.read()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", port)
+
+
+def server_port(server: asyncio.AbstractServer) -> int:
+    return server.sockets[0].getsockname()[1]
+
+
+def test_delayed_banner(wait_for_ssh):
+    async def scenario():
+        async with await ssh_stand_in(delay=0.2) as server:
+            return await wait_for_ssh.wait_for_host("slow", "127.0.0.1", server_port(server), 5.0, **FAST)
+
+    result = asyncio.run(scenario())
+    assert result["ready"] is True
+    assert result["banner"] == BANNER.decode().strip()
+    assert result["attempts"] == 1
+    assert 0.2 <= result["elapsed"] < 1.0
+
+
+def test_refused_then_accepted(wait_for_ssh):
+    port = free_port()
+
+    async def scenario():
+        probe = asyncio.ensure_future(wait_for_ssh.wait_for_host("late", "127.0.0.1", port, 5.0, **FAST))
+        await asyncio.sleep(0.4)
+        async with await ssh_stand_in(port):
+            return await probe
+
+    result = asyncio.run(scenario())
+    assert result["ready"] is True
+    assert result["attempts"] > 2
+    assert 0.4 <= result["elapsed"] < 2.0
+
+
+def test_silent_socket_times_out_per_host(wait_for_ssh):
+    async def scenario():
+        async with await ssh_stand_in(banner=None) as server:
+            timeouts = dict(FAST, banner_timeout=10.0)
+            return await wait_for_ssh.wait_for_host("mute", "127.0.0.1", server_port(server), 0.6, **timeouts)
+
+    start = time.monotonic()
+    result = asyncio.run(scenario())
+    assert result["ready"] is False
+    assert result["error"] == "TimeoutError"
+    assert result["attempts"] >= 1
+    # the banner timeout of a single attempt does not stretch the per-host timeout
+    assert 0.6 <= result["elapsed"] < 1.2
+    assert time.monotonic() - start < 2.0
+
+
+def test_results_stream_in_completion_order(wait_for_ssh):
+    async def scenario():
+        async with await ssh_stand_in(delay=0.2) as slow, await ssh_stand_in() as fast:
+            hosts = [("slow", "127.0.0.1", server_port(slow)), ("fast", "127.0.0.1", server_port(fast))]
+            return [result["name"] async for result in wait_for_ssh.probe_hosts(hosts, 5.0, **FAST)]
+
+    assert asyncio.run(scenario()) == ["fast", "slow"]
+
+
+def test_exit_code_1_when_any_host_fails(wait_for_ssh, capsys):
+    async def scenario():
+        async with await ssh_stand_in() as good:
+            args = argparse.Namespace(
+                host=[f"good=127.0.0.1:{server_port(good)}", f"down=127.0.0.1:{free_port()}"],
+                inventory=None,
+                port=22,
+                timeout=0.5,
+                connect_timeout=0.5,
+                max_delay=0.2,
+                json=True,
+            )
+            return await wait_for_ssh.run(args)
+
+    assert asyncio.run(scenario()) == 1
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(result["name"], result["ready"]) for result in results] == [("good", True), ("down", False)]
+    assert results[1]["attempts"] > 1
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parent
+REPO_DIR = TOOLS_DIR.parent
+CREATE_STAND = TOOLS_DIR / "create_stand.py"
+DEFAULT_COUNTS = "1,10,100,1000"
+DEFAULT_POOL = "10.0.0.0/8"
+CHUNK = b"\0" * (1 << 20)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark tools/create_stand.py: time bulk creation of N stands from a synthetic base stand."
+    )
+    parser.add_argument("--kind", choices=("linux", "windows"), default="linux", help="Base stand type (default: linux)")
+    parser.add_argument("--counts", default=DEFAULT_COUNTS, help=f"Comma-separated stand counts (default: {DEFAULT_COUNTS})")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per count; the fastest one is reported")
+    parser.add_argument("--jobs", type=int, default=None, help="create_stand.py --jobs (default: its own default)")
+    parser.add_argument("--link-mode", default=None, help="create_stand.py --link-mode")
+    parser.add_argument("--overlay", action="store_true", help="Benchmark thin (overlay) stands")
+    parser.add_argument("--provider-mb", type=int, default=20, help="Size of the fake provider binary per terraform root")
+    parser.add_argument("--log-mb", type=int, default=2, help="Size of every fake log file")
+    parser.add_argument("--extra-files", type=int, default=0, help="Additional small ansible files in the base stand")
+    parser.add_argument("--work-dir", default=None, help="Scratch directory (default: a new temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="Do not delete the scratch directory")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file as well as stdout")
+    parser.add_argument("--compare", default=None, help="Previous JSON report: print the change per count")
+    args = parser.parse_args()
+    try:
+        args.counts = [int(count) for count in args.counts.split(",") if count.strip()]
+    except ValueError:
+        parser.error("--counts must be a comma-separated list of integers")
+    if not args.counts or min(args.counts) < 1:
+        parser.error("--counts must contain positive integers")
+    if args.repeat < 1:
+        parser.error("--repeat must be positive")
+    return args
+
+
+def write_filler(path: Path, size_mb: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as fh:
+        for _ in range(size_mb):
+            fh.write(CHUNK)
+
+
+def build_base_stand(args: argparse.Namespace, base_parent: Path) -> Path:
+    """Copy of the repo base stand plus the clutter a used stand accumulates (.terraform, state, logs)."""
+    name = f"{args.kind}-stand"
+    base_dir = base_parent / name
+    shutil.copytree(
+        REPO_DIR / "stands" / name,
+        base_dir,
+        symlinks=True,
+        ignore=shutil.ignore_patterns(".terraform", "*.tfstate*", "*.log", "__pycache__", ".inventory-cache"),
+    )
+    for root in sorted(path for path in (base_dir / "infrastructure/terraform").iterdir() if path.is_dir()):
+        provider = root / ".terraform/providers/registry.terraform.io/telmate/proxmox/3.0.2-rc06/linux_amd64"
+        write_filler(provider / "terraform-provider-proxmox_v3.0.2-rc06", args.provider_mb)
+        (root / ".terraform/terraform.tfstate").write_text("{}\n", encoding="utf-8")
+        state = {"version": 4, "resources": [{"type": "proxmox_vm_qemu", "name": root.name}]}
+        (root / "terraform.tfstate").write_text(json.dumps(state) + "\n", encoding="utf-8")
+        (root / "terraform.tfstate.backup").write_text(json.dumps(state) + "\n", encoding="utf-8")
+        write_filler(root / "terraform-apply.log", args.log_mb)
+    write_filler(base_dir / "infrastructure/scripts/deploy.log", args.log_mb)
+    extra_dir = base_dir / "infrastructure/ansible/roles/bench/tasks"
+    for number in range(args.extra_files):
+        extra_dir.mkdir(parents=True, exist_ok=True)
+        (extra_dir / f"task-{number:04d}.yml").write_text(
+            f"- name: bench task {number}\n  ansible.builtin.debug:\n    msg: {number}\n", encoding="utf-8"
+        )
+    return base_dir
+
+
+def tree_usage(path: Path) -> dict:
+    """Disk usage of a tree with hardlinked inodes counted once."""
+    seen = set()
+    usage = {"inodes": 0, "files": 0, "symlinks": 0, "dirs": 0, "disk_bytes": 0, "apparent_bytes": 0}
+    for directory, dirnames, filenames in os.walk(path):
+        for name in dirnames + filenames:
+            st = os.lstat(os.path.join(directory, name))
+            if os.path.islink(os.path.join(directory, name)):
+                usage["symlinks"] += 1
+            elif name in dirnames:
+                usage["dirs"] += 1
+            else:
+                usage["files"] += 1
+            key = (st.st_dev, st.st_ino)
+            if key in seen:
+                continue
+            seen.add(key)
+            usage["inodes"] += 1
+            usage["disk_bytes"] += st.st_blocks * 512
+            usage["apparent_bytes"] += st.st_size
+    return usage
+
+
+def run_create(args: argparse.Namespace, base_dir: Path, out_dir: Path, count: int) -> dict:
+    command = [
+        sys.executable,
+        str(CREATE_STAND),
+        "--base",
+        str(base_dir),
+        "--out-dir",
+        str(out_dir),
+        "--count",
+        str(count),
+        "--subnet-pool",
+        DEFAULT_POOL,
+        "--no-provider-cache",
+    ]
+    if args.jobs:
+        command += ["--jobs", str(args.jobs)]
+    if args.link_mode:
+        command += ["--link-mode", args.link_mode]
+    if args.overlay:
+        command.append("--overlay")
+
+    log_path = out_dir.parent / f"{out_dir.name}.log"
+    with open(log_path, "wb") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 instead of wait(): the rusage of the child includes the workers it has reaped
+        _, status, rusage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"create_stand.py failed for {count} stand(s), see {log_path}")
+    return {
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(rusage.ru_utime + rusage.ru_stime, 4),
+        # ru_maxrss is the peak of the largest single process in the tree (the parent or one
+        # worker), not the sum across the pool; KiB on Linux, bytes on macOS
+        "max_process_rss_kb": rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss,
+        "blocks_written": rusage.ru_oublock,
+    }
+
+
+def bench_count(args: argparse.Namespace, base_dir: Path, work_dir: Path, count: int) -> dict:
+    best = None
+    for attempt in range(args.repeat):
+        out_dir = work_dir / f"run-{count}-{attempt}"
+        out_dir.mkdir()
+        try:
+            result = run_create(args, base_dir, out_dir, count)
+            result.update(tree_usage(out_dir))
+        finally:
+            if not args.keep:
+                shutil.rmtree(out_dir, ignore_errors=True)
+        if best is None or result["wall_seconds"] < best["wall_seconds"]:
+            best = result
+    best["count"] = count
+    best["per_stand_ms"] = round(best["wall_seconds"] * 1000 / count, 3)
+    best["bytes_per_stand"] = best["disk_bytes"] // count
+    best["inodes_per_stand"] = round(best["inodes"] / count, 1)
+    return best
+
+
+def git_commit() -> dict:
+    def git(*command: str) -> str:
+        try:
+            result = subprocess.run(["git", *command], cwd=REPO_DIR, capture_output=True, text=True, timeout=30)
+        except (OSError, subprocess.TimeoutExpired):
+            return ""
+        return result.stdout.strip() if result.returncode == 0 else ""
+
+    return {
+        "commit": git("rev-parse", "HEAD") or None,
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def compare(previous_path: str, report: dict) -> None:
+    try:
+        previous = json.loads(Path(previous_path).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        raise RuntimeError(f"failed to read {previous_path}: {exc}")
+    before = {run["count"]: run for run in previous.get("runs", [])}
+    print(f"compare with {previous.get('git', {}).get('commit') or previous_path}:", file=sys.stderr)
+    for run in report["runs"]:
+        old = before.get(run["count"])
+        if old is None:
+            continue
+        changes = []
+        for key in ("wall_seconds", "disk_bytes", "inodes", "max_process_rss_kb"):
+            if old.get(key):
+                changes.append(f"{key} {run[key] / old[key]:.2f}x")
+        print(f"  {run['count']:>5} stand(s): " + ", ".join(changes), file=sys.stderr)
+
+
+def main() -> int:
+    args = parse_args()
+    work_dir = Path(args.work_dir).resolve() if args.work_dir else Path(tempfile.mkdtemp(prefix="bench-create-stand-"))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        base_dir = build_base_stand(args, work_dir / "base")
+        report = {
+            "tool": "tools/create_stand.py",
+            "git": git_commit(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+            "options": {
+                "kind": args.kind,
+                "jobs": args.jobs,
+                "link_mode": "symlink" if args.overlay else args.link_mode or "auto",
+                "repeat": args.repeat,
+            },
+            "base": tree_usage(base_dir),
+            "runs": [],
+        }
+        for count in args.counts:
+            result = bench_count(args, base_dir, work_dir, count)
+            report["runs"].append(result)
+            print(
+                f"{count:>5} stand(s): {result['wall_seconds']:.2f}s ({result['per_stand_ms']:.1f} ms/stand), "
+                f"{result['disk_bytes']} bytes, {result['inodes']} inodes, max process RSS {result['max_process_rss_kb']} KiB",
+                file=sys.stderr,
+            )
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2) + "\n"
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text, encoding="utf-8")
+    sys.stdout.write(text)
+    if args.compare:
+        compare(args.compare, report)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(2)
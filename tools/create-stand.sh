@@ -14,6 +14,13 @@ usage() {
     --pve-user student01@pve \
     --pve-role StudentVM
 
+Массовое создание (подсети выделяются из пула без пересечений):
+  ./tools/create-stand.sh \
+    --base stands/linux-stand \
+    --count 30 \
+    --subnet-pool 10.20.0.0/16 \
+    --prefix stand-
+
 Параметры:
   --base     Базовый стенд (stands/linux-stand или stands/windows-stand)
   --name     Имя нового каталога стенда
@@ -21,6 +28,11 @@ usage() {
   --subnet   Подсеть в формате CIDR (например 192.168.103.0/24)
   --pve-user Пользователь Proxmox для ACL (по умолчанию student01@pve)
   --pve-role Роль Proxmox для ACL (по умолчанию StudentVM)
+
+  --count       Количество стендов (каталоги и ID: <prefix>01, <prefix>02, ...)
+  --subnet-pool Пул подсетей CIDR для --count
+  --prefix      Префикс ID стендов (по умолчанию stand-)
+  --manifest    Путь к manifest JSON (по умолчанию <out-dir>/<prefix>manifest.json)
 USAGE
 }
 
@@ -30,6 +42,10 @@ STAND_ID=""
 SUBNET=""
 PVE_USER=""
 PVE_ROLE=""
+COUNT=""
+SUBNET_POOL=""
+PREFIX=""
+MANIFEST=""
 
 while [[ $# -gt 0 ]]; do
   case "$1" in
@@ -39,11 +55,31 @@ while [[ $# -gt 0 ]]; do
     --subnet) SUBNET="$2"; shift 2 ;;
     --pve-user) PVE_USER="$2"; shift 2 ;;
     --pve-role) PVE_ROLE="$2"; shift 2 ;;
+    --count) COUNT="$2"; shift 2 ;;
+    --subnet-pool) SUBNET_POOL="$2"; shift 2 ;;
+    --prefix) PREFIX="$2"; shift 2 ;;
+    --manifest) MANIFEST="$2"; shift 2 ;;
     -h|--help) usage; exit 0 ;;
     *) echo "Unknown arg: $1" >&2; usage; exit 2 ;;
   esac
 done
 
+if [[ -n "$COUNT" ]]; then
+  if [[ -z "$BASE" || -z "$SUBNET_POOL" ]]; then
+    usage
+    exit 2
+  fi
+  python3 "tools/create_stand.py" \
+    --base "$BASE" \
+    --count "$COUNT" \
+    --subnet-pool "$SUBNET_POOL" \
+    ${PREFIX:+--prefix "$PREFIX"} \
+    ${MANIFEST:+--manifest "$MANIFEST"} \
+    ${PVE_USER:+--pve-user "$PVE_USER"} \
+    ${PVE_ROLE:+--pve-role "$PVE_ROLE"}
+  exit $?
+fi
+
 if [[ -z "$BASE" || -z "$NAME" || -z "$SUBNET" ]]; then
   usage
   exit 2
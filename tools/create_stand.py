@@ -1,121 +1,412 @@
 #!/usr/bin/env python3
 import argparse
+import errno
+import fnmatch
+import functools
 import ipaddress
+import json
 import os
 import re
 import shutil
+import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+from stand_registry import REGISTRY_NAME, VMID_BASE, VMID_BLOCK, StandRegistry, scan_stand
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+GATEWAY_OFFSET = 1
+# Per stand type: host offsets inside the stand subnet and the keys to set in each file.
+# Templates are formatted with stand_params(); the current value in the file decides
+# whether the result is written quoted or bare (e.g. cidr_prefix), lists become YAML lists.
+STAND_SPECS = {
+    "linux": {
+        "hosts": {"linux-ws": 10, "linux-server": 20},
+        "files": {
+            "infrastructure/terraform/linux-ws/terraform.tfvars.example": {
+                "vmid": "{vmids[linux-ws]}",
+                "linux_ws_name": "{stand_id}-linux-ws",
+                "linux_ws_ip": "{hosts[linux-ws]}",
+                "gateway": "{gateway}",
+                "cidr_prefix": "{prefixlen}",
+            },
+            "infrastructure/terraform/linux-server/terraform.tfvars.example": {
+                "vmid": "{vmids[linux-server]}",
+                "linux_server_name": "{stand_id}-linux-srv",
+                "linux_server_ip": "{hosts[linux-server]}",
+                "gateway": "{gateway}",
+                "cidr_prefix": "{prefixlen}",
+            },
+        },
+        "optional": (),
+    },
+    "windows": {
+        "hosts": {"windows-10": 10, "windows-server": 20, "domain-controller": 30},
+        "files": {
+            "infrastructure/terraform/windows-10/terraform.tfvars.example": {
+                "vmid": "{vmids[windows-10]}",
+                "windows_ws_name": "{stand_id}-windows-10",
+                "windows_ws_ip": "{hosts[windows-10]}",
+            },
+            "infrastructure/terraform/windows-server/terraform.tfvars.example": {
+                "vmid": "{vmids[windows-server]}",
+                "windows_server_name": "{stand_id}-windows-server",
+                "windows_server_ip": "{hosts[windows-server]}",
+            },
+            "infrastructure/terraform/domain-controller/terraform.tfvars.example": {
+                "vmid": "{vmids[domain-controller]}",
+                "dc_name": "{stand_id}-dc",
+                "dc_ip": "{hosts[domain-controller]}",
+            },
+            "infrastructure/ansible/group_vars/all/ad.yml.example": {
+                "ad_stand_id": "{stand_id}",
+                "ad_stand_ou": "{stand_ou}",
+                "ad_dc_ip": "{hosts[domain-controller]}",
+                "ad_stand_computers": ["{stand_id}-windows-10", "{stand_id}-windows-server"],
+            },
+        },
+        "optional": ("infrastructure/ansible/group_vars/all/ad.yml.example",),
+    },
+}
+
+# Keys that may be absent: stands created before VMID blocks were reserved have no vmid.
+OPTIONAL_KEYS = ("vmid",)
+
+# Never cloned into a new stand: provider caches, state, logs, downloaded ISOs.
+IGNORED_DIRS = {
+    ".terraform",
+    "terraform.tfstate.d",
+    ".inventory-cache",
+    ".deploy-logs",
+    ".fleet",
+    "__pycache__",
+    "packer_cache",
+}
+IGNORED_FILES = (
+    "terraform.tfstate",
+    "terraform.tfstate.*",
+    ".terraform.tfstate.lock.info",
+    "*.log",
+    "*.iso",
+    "*.py[cod]",
+    "known_hosts",
+    "inventory.routes.json",
+    "inventory.*.yml",
+    ".deploy-state.json",
+)
+# Files that are rewritten per stand (by this script, terraform init, the inventory generator
+# or by hand) get a real copy; everything else may share blocks or inodes with the base.
+REWRITTEN_FILES = (
+    "infrastructure/terraform/*/terraform.tfvars",
+    "infrastructure/terraform/*/terraform.tfvars.example",
+    "infrastructure/terraform/*/.terraform.lock.hcl",
+    "infrastructure/ansible/inventory.yml",
+    "infrastructure/ansible/group_vars/*/*",
+    "infrastructure/scripts/proxmox_pool_acl.sh",
+    "infrastructure/terraform/terraform.rc",
+)
+LINK_MODES = ("auto", "reflink", "hardlink", "copy")
+OVERLAY_MARKER = ".overlay-base"
+DEFAULT_PVE_USER = "student01@pve"
+DEFAULT_PVE_ROLE = "StudentVM"
+ACL_SCRIPT = "infrastructure/scripts/proxmox_pool_acl.sh"
+ACL_VALUE = re.compile(r'^(POOL_ID|ROLE|USER)="([^"]*)"', re.MULTILINE)
+VAULT_HEADER = "$ANSIBLE_VAULT;"
+FICLONE = 0x40049409
+
+LOCKED_PROVIDER = re.compile(r'^provider\s+"([^"]+)"\s*\{\s*\n\s*version\s*=\s*"([^"]+)"', re.MULTILINE)
+REQUIRED_PROVIDER = re.compile(r'source\s*=\s*"([^"]+)"\s*\n\s*version\s*=\s*"([^"]+)"')
+DEFAULT_REGISTRY = "registry.terraform.io"
+MIRROR_TIMEOUT = 600
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Create a new stand by copying a base stand and updating examples.")
-    parser.add_argument("--base", required=True, help="Base stand directory, e.g. stands/linux-stand")
-    parser.add_argument("--name", required=True, help="New stand directory name, e.g. linux-stand-02")
+    parser.add_argument("--base", default=None, help="Base stand directory, e.g. stands/linux-stand")
+    parser.add_argument("--name", default=None, help="New stand directory name, e.g. linux-stand-02")
     parser.add_argument("--stand-id", default=None, help="Stand ID/prefix, e.g. stand-02 (defaults to --name)")
-    parser.add_argument("--subnet", required=True, help="Subnet CIDR, e.g. 192.168.103.0/24")
-    parser.add_argument("--pve-user", default="student01@pve", help="Proxmox user for pool ACL script")
-    parser.add_argument("--pve-role", default="StudentVM", help="Proxmox role for pool ACL script")
+    parser.add_argument("--subnet", default=None, help="Subnet CIDR, e.g. 192.168.103.0/24")
+    parser.add_argument("--pve-user", default=None, help=f"Proxmox user for pool ACL script (default: {DEFAULT_PVE_USER})")
+    parser.add_argument("--pve-role", default=None, help=f"Proxmox role for pool ACL script (default: {DEFAULT_PVE_ROLE})")
     parser.add_argument("--out-dir", default="stands", help="Target parent directory (default: stands)")
-    return parser.parse_args()
+    parser.add_argument(
+        "--link-mode",
+        choices=LINK_MODES,
+        default="auto",
+        help="How to clone unchanged files: auto = reflink, then hardlink, then copy (default: auto)",
+    )
+    parser.add_argument(
+        "--overlay",
+        action="store_true",
+        help=(
+            "Thin stand: copy only per-stand files, symlink everything else to the base stand file by file "
+            "(files added to the base later are linked by --update)"
+        ),
+    )
+    parser.add_argument(
+        "--registry",
+        default=None,
+        help=f"Subnet/host registry (default: <out-dir>/{REGISTRY_NAME})",
+    )
+    parser.add_argument(
+        "--provider-cache",
+        default=None,
+        help="Shared terraform plugin cache and provider mirror (default: <out-dir>/.terraform-cache)",
+    )
+    parser.add_argument(
+        "--no-provider-cache",
+        action="store_true",
+        help="Do not write infrastructure/terraform/terraform.rc for the new stand(s)",
+    )
+    parser.add_argument(
+        "--vmid-block",
+        type=int,
+        default=VMID_BLOCK,
+        help=f"VMIDs reserved per stand in the registry, 0 = let Proxmox pick nextid (default: {VMID_BLOCK})",
+    )
+    parser.add_argument("--vmid-base", type=int, default=VMID_BASE, help=f"Lowest VMID to reserve (default: {VMID_BASE})")
+    parser.add_argument(
+        "--cluster-vmids",
+        action="store_true",
+        help="Skip VMIDs already used on the cluster (one GET /cluster/resources, PROXMOX_API_* env)",
+    )
+
+    update = parser.add_argument_group("updating an existing stand")
+    update.add_argument(
+        "--update",
+        action="store_true",
+        help="Re-parameterize stand --name with --stand-id/--subnet/--pve-*, rewriting only changed files",
+    )
+    update.add_argument("--dry-run", action="store_true", help="With --update: only report what would change")
+
+    bulk = parser.add_argument_group("bulk creation")
+    bulk.add_argument("--count", type=int, default=None, help="Create N stands named <prefix>NN")
+    bulk.add_argument("--subnet-pool", default=None, help="Pool to allocate stand subnets from, e.g. 10.20.0.0/16")
+    bulk.add_argument("--subnet-prefix", type=int, default=24, help="Prefix length of each stand subnet (default: 24)")
+    bulk.add_argument("--prefix", default="stand-", help="Stand ID/directory prefix (default: stand-)")
+    bulk.add_argument("--start", type=int, default=1, help="First stand number (default: 1)")
+    bulk.add_argument("--jobs", type=int, default=os.cpu_count() or 4, help="Parallel worker processes")
+    bulk.add_argument("--manifest", default=None, help="Manifest JSON path (default: <out-dir>/<prefix>manifest.json)")
+    args = parser.parse_args()
+
+    if args.update:
+        if not args.name:
+            parser.error("--update requires --name")
+        if args.count is not None or args.overlay:
+            parser.error("--update cannot be combined with --count/--overlay")
+        return args
+    if args.dry_run:
+        parser.error("--dry-run is only supported with --update")
+    if not args.base:
+        parser.error("--base is required")
+    args.pve_user = args.pve_user or DEFAULT_PVE_USER
+    args.pve_role = args.pve_role or DEFAULT_PVE_ROLE
+
+    if args.count is not None:
+        if args.count < 1:
+            parser.error("--count must be positive")
+        if not args.subnet_pool:
+            parser.error("--count requires --subnet-pool")
+        if args.name or args.subnet or args.stand_id:
+            parser.error("--count cannot be combined with --name/--stand-id/--subnet")
+    elif not args.name or not args.subnet:
+        parser.error("either --name and --subnet, or --count and --subnet-pool are required")
+    if args.overlay:
+        if args.link_mode != "auto":
+            parser.error("--overlay cannot be combined with --link-mode")
+        args.link_mode = "symlink"
+    return args
 
 
 def ip_at(subnet: ipaddress.IPv4Network, offset: int) -> str:
     return str(subnet.network_address + offset)
 
 
-def replace_tfvar(path: Path, key: str, value: str) -> None:
-    content = path.read_text(encoding="utf-8")
-    pattern = re.compile(rf'^({re.escape(key)}\s*=\s*)"[^"]*"\s*$', re.MULTILINE)
-    if not pattern.search(content):
-        raise RuntimeError(f"Key not found in {path}: {key}")
-    content = pattern.sub(rf'\1"{value}"', content)
-    path.write_text(content, encoding="utf-8")
+def stand_hosts(kind: str, subnet: ipaddress.IPv4Network) -> dict[str, str]:
+    offsets = STAND_SPECS[kind]["hosts"]
+    if max(offsets.values()) >= subnet.num_addresses - 1:
+        raise RuntimeError(f"Subnet {subnet} is too small for host offsets {sorted(offsets.values())}")
+    return {host: ip_at(subnet, offset) for host, offset in offsets.items()}
+
 
+def write_text(path: Path, content: str) -> None:
+    # Replace instead of rewriting in place: a hardlinked file must not change the base stand.
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(content, encoding="utf-8")
+    if path.exists():
+        shutil.copymode(path, tmp_path)
+    os.replace(tmp_path, path)
 
-def replace_tfvar_int(path: Path, key: str, value: str) -> None:
-    content = path.read_text(encoding="utf-8")
-    pattern = re.compile(rf'^({re.escape(key)}\s*=\s*)\d+\s*$', re.MULTILINE)
-    if not pattern.search(content):
-        raise RuntimeError(f"Key not found in {path}: {key}")
-    content = pattern.sub(rf'\1{value}', content)
-    path.write_text(content, encoding="utf-8")
 
+class TreeCloner:
+    """copy_function for shutil.copytree that reflinks, hardlinks or symlinks files which are never rewritten."""
 
-def replace_yaml_value(lines: list[str], key: str, value: str) -> list[str]:
-    out = []
-    replaced = False
-    for line in lines:
-        if line.strip().startswith(f"{key}:"):
-            out.append(f"{key}: \"{value}\"\n")
-            replaced = True
+    def __init__(self, base_dir: Path, mode: str = "auto"):
+        self.base_dir = base_dir
+        if mode == "auto":
+            self.methods = ["reflink", "hardlink"]
+        elif mode == "copy":
+            self.methods = []
         else:
-            out.append(line)
-    if not replaced:
-        raise RuntimeError(f"Key not found in YAML: {key}")
-    return out
-
-
-def replace_yaml_list(lines: list[str], key: str, items: list[str]) -> list[str]:
-    out = []
-    i = 0
-    found = False
-    while i < len(lines):
-        line = lines[i]
-        if line.strip().startswith(f"{key}:"):
-            out.append(f"{key}:\n")
-            for item in items:
-                out.append(f"  - \"{item}\"\n")
-            found = True
-            i += 1
-            while i < len(lines) and lines[i].lstrip().startswith("- "):
-                i += 1
+            self.methods = [mode]
+        self.strict = mode in ("reflink", "hardlink", "symlink")
+        self.stats = {"reflink": 0, "hardlink": 0, "symlink": 0, "copy": 0, "copied_bytes": 0}
+
+    def ignore(self, directory: str, names: list[str]) -> set[str]:
+        ignored = set()
+        for name in names:
+            if os.path.isdir(os.path.join(directory, name)):
+                if name in IGNORED_DIRS:
+                    ignored.add(name)
+            elif any(fnmatch.fnmatch(name, pattern) for pattern in IGNORED_FILES):
+                ignored.add(name)
+        return ignored
+
+    def rewritten(self, src: str) -> bool:
+        rel = Path(os.path.relpath(src, self.base_dir)).as_posix()
+        return any(fnmatch.fnmatch(rel, pattern) for pattern in REWRITTEN_FILES)
+
+    def __call__(self, src: str, dst: str) -> str:
+        if not self.rewritten(src):
+            for method in list(self.methods):
+                try:
+                    if method == "reflink":
+                        self.reflink(src, dst)
+                    elif method == "symlink":
+                        # relative, so the stand keeps working when stands/ is moved as a whole
+                        os.symlink(os.path.relpath(src, os.path.dirname(dst)), dst)
+                    else:
+                        os.link(src, dst)
+                except OSError as exc:
+                    if self.strict:
+                        raise RuntimeError(f"cannot {method} {src}: {exc}")
+                    if exc.errno in (errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM, errno.ENOSYS):
+                        # the filesystem does not support it at all: stop trying for this run
+                        self.methods.remove(method)
+                    continue
+                self.stats[method] += 1
+                return dst
+        shutil.copy2(src, dst)
+        self.stats["copy"] += 1
+        self.stats["copied_bytes"] += os.path.getsize(dst)
+        return dst
+
+    @staticmethod
+    def reflink(src: str, dst: str) -> None:
+        if fcntl is None:
+            raise OSError(errno.EOPNOTSUPP, "reflink is not supported on this platform")
+        with open(src, "rb") as src_fh, open(dst, "wb") as dst_fh:
+            try:
+                fcntl.ioctl(dst_fh.fileno(), FICLONE, src_fh.fileno())
+            except OSError:
+                dst_fh.close()
+                os.unlink(dst)
+                raise
+        shutil.copystat(src, dst)
+
+
+def stand_vmids(kind: str, vmid_start: int = 0) -> dict[str, int]:
+    """VMID of every host: consecutive IDs from the stand block, or 0 (Proxmox nextid) without one."""
+    return {host: vmid_start + index if vmid_start else 0 for index, host in enumerate(STAND_SPECS[kind]["hosts"])}
+
+
+def stand_params(kind: str, stand_id: str, subnet: ipaddress.IPv4Network, vmid_start: int = 0) -> dict:
+    return {
+        "stand_id": stand_id,
+        "stand_ou": stand_id.title(),
+        "subnet": str(subnet),
+        "prefixlen": subnet.prefixlen,
+        "gateway": ip_at(subnet, GATEWAY_OFFSET),
+        "hosts": stand_hosts(kind, subnet),
+        "vmids": stand_vmids(kind, vmid_start),
+    }
+
+
+def render_spec(kind: str, params: dict) -> dict[str, dict]:
+    def render(template):
+        if isinstance(template, list):
+            return [render(item) for item in template]
+        return template.format(**params)
+
+    return {
+        rel_path: {key: render(template) for key, template in values.items()}
+        for rel_path, values in STAND_SPECS[kind]["files"].items()
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def rewrite_pattern(file_format: str, keys: tuple[str, ...]) -> re.Pattern:
+    alternation = "|".join(re.escape(key) for key in sorted(keys, key=len, reverse=True))
+    if file_format == "yaml":
+        # top-level "key: value" plus the "- item" lines of a block list that follows it
+        return re.compile(
+            rf"^(?P<lead>(?P<key>{alternation})[ \t]*:)(?P<value>[^\n]*)(?P<items>(?:\n[ \t]*-[ \t][^\n]*)*)",
+            re.MULTILINE,
+        )
+    return re.compile(
+        rf'^(?P<lead>[ \t]*(?P<key>{alternation})[ \t]*=[ \t]*)(?P<value>"(?:[^"\\\n]|\\.)*"|-?\d+)',
+        re.MULTILINE,
+    )
+
+
+def file_format(path: str) -> str:
+    return "yaml" if path.endswith((".yml", ".yml.example", ".yaml", ".yaml.example")) else "tfvars"
+
+
+def rewrite_content(content: str, fmt: str, values: dict) -> tuple[str, list[str]]:
+    """Set all keys in one pass; return the new content and the keys that were not found."""
+    found = set()
+
+    def substitute(match: re.Match) -> str:
+        key = match.group("key")
+        value = values[key]
+        found.add(key)
+        if fmt == "yaml":
+            if isinstance(value, list):
+                return match.group("lead") + "".join(f"\n  - {json.dumps(item)}" for item in value)
+            return f"{match.group('lead')} {json.dumps(str(value))}"
+        if not match.group("value").startswith('"') and str(value).lstrip("-").isdigit():
+            return f"{match.group('lead')}{value}"
+        return f"{match.group('lead')}{json.dumps(str(value))}"
+
+    content = rewrite_pattern(fmt, tuple(values)).sub(substitute, content)
+    return content, [key for key in values if key not in found]
+
+
+def plan_rewrites(stand_dir: Path, files: dict[str, dict], optional: tuple[str, ...] = ()) -> dict[Path, str]:
+    """New content of every file whose keys change; all missing keys are reported at once."""
+    changes: dict[Path, str] = {}
+    missing: list[str] = []
+    for rel_path, values in files.items():
+        path = stand_dir / rel_path
+        try:
+            content = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            if rel_path not in optional:
+                missing.append(f"{path}: file not found")
             continue
-        out.append(line)
-        i += 1
-    if not found:
-        raise RuntimeError(f"List key not found in YAML: {key}")
-    return out
-
-
-def update_linux_examples(stand_dir: Path, stand_id: str, subnet: ipaddress.IPv4Network) -> None:
-    tf_ws = stand_dir / "infrastructure/terraform/linux-ws/terraform.tfvars.example"
-    tf_srv = stand_dir / "infrastructure/terraform/linux-server/terraform.tfvars.example"
-
-    replace_tfvar(tf_ws, "linux_ws_name", f"{stand_id}-linux-ws")
-    replace_tfvar(tf_ws, "linux_ws_ip", ip_at(subnet, 10))
-    replace_tfvar(tf_ws, "gateway", ip_at(subnet, 1))
-
-    replace_tfvar(tf_srv, "linux_server_name", f"{stand_id}-linux-srv")
-    replace_tfvar(tf_srv, "linux_server_ip", ip_at(subnet, 20))
-    replace_tfvar(tf_srv, "gateway", ip_at(subnet, 1))
-
-    replace_tfvar_int(tf_ws, "cidr_prefix", str(subnet.prefixlen))
-    replace_tfvar_int(tf_srv, "cidr_prefix", str(subnet.prefixlen))
+        new_content, missing_keys = rewrite_content(content, file_format(rel_path), values)
+        missing += [f"{path}: {key}" for key in missing_keys if key not in OPTIONAL_KEYS]
+        if new_content != content:
+            changes[path] = new_content
+    if missing:
+        raise RuntimeError("Keys not found:\n  " + "\n  ".join(missing))
+    return changes
 
 
-def update_windows_examples(stand_dir: Path, stand_id: str, subnet: ipaddress.IPv4Network) -> None:
-    tf_ws = stand_dir / "infrastructure/terraform/windows-10/terraform.tfvars.example"
-    tf_srv = stand_dir / "infrastructure/terraform/windows-server/terraform.tfvars.example"
-    tf_dc = stand_dir / "infrastructure/terraform/domain-controller/terraform.tfvars.example"
-
-    replace_tfvar(tf_ws, "windows_ws_name", f"{stand_id}-windows-10")
-    replace_tfvar(tf_ws, "windows_ws_ip", ip_at(subnet, 10))
-
-    replace_tfvar(tf_srv, "windows_server_name", f"{stand_id}-windows-server")
-    replace_tfvar(tf_srv, "windows_server_ip", ip_at(subnet, 20))
-
-    replace_tfvar(tf_dc, "dc_name", f"{stand_id}-dc")
-    replace_tfvar(tf_dc, "dc_ip", ip_at(subnet, 30))
-
-    ad_example = stand_dir / "infrastructure/ansible/group_vars/all/ad.yml.example"
-    if ad_example.exists():
-        lines = ad_example.read_text(encoding="utf-8").splitlines(keepends=True)
-        lines = replace_yaml_value(lines, "ad_stand_id", stand_id)
-        lines = replace_yaml_value(lines, "ad_stand_ou", stand_id.title())
-        lines = replace_yaml_value(lines, "ad_dc_ip", ip_at(subnet, 30))
-        lines = replace_yaml_list(lines, "ad_stand_computers", [f"{stand_id}-windows-10", f"{stand_id}-windows-server"])
-        ad_example.write_text("".join(lines), encoding="utf-8")
+def apply_stand_spec(
+    stand_dir: Path, kind: str, stand_id: str, subnet: ipaddress.IPv4Network, vmid_start: int = 0
+) -> dict:
+    params = stand_params(kind, stand_id, subnet, vmid_start)
+    changes = plan_rewrites(stand_dir, render_spec(kind, params), STAND_SPECS[kind]["optional"])
+    for path, content in changes.items():
+        write_text(path, content)
+    return params
 
 
 def ensure_ansible_vars(stand_dir: Path) -> None:
@@ -139,11 +430,8 @@ def ensure_ansible_vars(stand_dir: Path) -> None:
         shutil.copyfile(network_example, network_target)
 
 
-def write_proxmox_acl_script(stand_dir: Path, stand_id: str, pve_user: str, pve_role: str) -> None:
-    scripts_dir = stand_dir / "infrastructure/scripts"
-    scripts_dir.mkdir(parents=True, exist_ok=True)
-    script_path = scripts_dir / "proxmox_pool_acl.sh"
-    content = f"""#!/usr/bin/env bash
+def proxmox_acl_script(stand_id: str, pve_user: str, pve_role: str) -> str:
+    return f"""#!/usr/bin/env bash
 set -euo pipefail
 
 # Proxmox pool/ACL setup for stand: {stand_id}
@@ -168,40 +456,490 @@ pveum aclmod "/pool/$POOL_ID" -user "$USER" -role "$ROLE"
 
 echo "Done. Add your VMIDs to pool: $POOL_ID"
 """
-    script_path.write_text(content, encoding="utf-8")
+
+
+def write_proxmox_acl_script(stand_dir: Path, stand_id: str, pve_user: str, pve_role: str) -> None:
+    script_path = stand_dir / ACL_SCRIPT
+    script_path.parent.mkdir(parents=True, exist_ok=True)
+    write_text(script_path, proxmox_acl_script(stand_id, pve_user, pve_role))
+
+
+def stand_providers(base_dir: Path) -> dict[Path, dict[str, str]]:
+    """Provider address -> version per terraform root, from .terraform.lock.hcl or pinned required_providers."""
+    roots = {}
+    tf_dir = base_dir / "infrastructure/terraform"
+    for root in sorted(tf_dir.iterdir()) if tf_dir.is_dir() else []:
+        lock = root / ".terraform.lock.hcl"
+        main_tf = root / "main.tf"
+        if lock.is_file():
+            providers = dict(LOCKED_PROVIDER.findall(lock.read_text(encoding="utf-8")))
+        elif main_tf.is_file():
+            providers = {}
+            for source, version in REQUIRED_PROVIDER.findall(main_tf.read_text(encoding="utf-8")):
+                if source.count("/") == 1:
+                    source = f"{DEFAULT_REGISTRY}/{source}"
+                providers[source.lower()] = version
+        else:
+            continue
+        if providers:
+            roots[root] = providers
+    return roots
+
+
+def mirror_has(mirror_dir: Path, address: str, version: str) -> bool:
+    provider_type = address.rsplit("/", 1)[-1]
+    return any((mirror_dir / address).glob(f"terraform-provider-{provider_type}_{version}_*.zip"))
+
+
+def populate_provider_mirror(base_dir: Path, mirror_dir: Path) -> list[str]:
+    """Fill the local mirror once for every provider version pinned in the base stand; return mirrored addresses."""
+    roots = stand_providers(base_dir)
+    mirror_dir.mkdir(parents=True, exist_ok=True)
+    for root, providers in roots.items():
+        if all(mirror_has(mirror_dir, address, version) for address, version in providers.items()):
+            continue
+        try:
+            subprocess.run(
+                ["terraform", "providers", "mirror", str(mirror_dir)],
+                cwd=root,
+                check=True,
+                capture_output=True,
+                text=True,
+                timeout=MIRROR_TIMEOUT,
+            )
+        except FileNotFoundError:
+            raise RuntimeError("terraform not found in PATH")
+        except subprocess.TimeoutExpired:
+            raise RuntimeError(f"terraform providers mirror timed out after {MIRROR_TIMEOUT}s in {root}")
+        except subprocess.CalledProcessError as exc:
+            raise RuntimeError(f"terraform providers mirror failed in {root}: {(exc.stderr or '').strip()}")
+
+    mirrored = set()
+    for providers in roots.values():
+        for address, version in providers.items():
+            if not mirror_has(mirror_dir, address, version):
+                raise RuntimeError(f"provider {address} {version} is missing in mirror {mirror_dir}")
+            mirrored.add(address)
+    return sorted(mirrored)
+
+
+def terraform_rc(cache_dir: Path, mirrored: list[str]) -> str:
+    plugin_dir = cache_dir / "plugins"
+    plugin_dir.mkdir(parents=True, exist_ok=True)
+    lines = [
+        "# Generated by tools/create_stand.py: provider cache shared by all stands.",
+        "# deploy.sh exports TF_CLI_CONFIG_FILE pointing to this file.",
+        f"plugin_cache_dir = {json.dumps(plugin_dir.as_posix())}",
+    ]
+    if mirrored:
+        providers = ", ".join(json.dumps(address) for address in mirrored)
+        lines += [
+            "",
+            "provider_installation {",
+            "  filesystem_mirror {",
+            f"    path    = {json.dumps((cache_dir / 'mirror').as_posix())}",
+            f"    include = [{providers}]",
+            "  }",
+            "  direct {",
+            f"    exclude = [{providers}]",
+            "  }",
+            "}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def prepare_provider_cache(base_dir: Path, cache_dir: Path) -> str:
+    try:
+        mirrored = populate_provider_mirror(base_dir, cache_dir / "mirror")
+    except RuntimeError as exc:
+        print(f"WARN: provider mirror not populated, using plugin cache only: {exc}", file=sys.stderr)
+        mirrored = []
+    return terraform_rc(cache_dir, mirrored)
+
+
+def cluster_vmids() -> set[int]:
+    """VMIDs already used on the Proxmox cluster, read with a single API call."""
+    # imported here: proxmox_provision imports this module
+    from proxmox_provision import api_from_env, used_vmids
+
+    api = api_from_env()
+    try:
+        return used_vmids(api)
+    finally:
+        api.close()
+
+
+def reserve_vmids(args: argparse.Namespace, registry: StandRegistry, kind: str, names: list[str]) -> dict[str, int]:
+    """First VMID of every new stand (0 when blocks are disabled), reserved in the registry in one pass."""
+    if not args.vmid_block:
+        return {name: 0 for name in names}
+    host_count = len(STAND_SPECS[kind]["hosts"])
+    if host_count > args.vmid_block:
+        raise RuntimeError(f"--vmid-block {args.vmid_block} is smaller than the {host_count} hosts of a stand")
+    taken = cluster_vmids() if args.cluster_vmids else set()
+    return registry.reserve_vmids(names, args.vmid_block, args.vmid_base, taken)
+
+
+def stand_kind(base_dir: Path) -> str:
+    if "linux-stand" in base_dir.name:
+        return "linux"
+    if "windows-stand" in base_dir.name:
+        return "windows"
+    raise RuntimeError("Base stand name must contain 'linux-stand' or 'windows-stand'")
+
+
+def create_stand(
+    base_dir: Path,
+    target_dir: Path,
+    stand_id: str,
+    subnet: ipaddress.IPv4Network,
+    pve_user: str,
+    pve_role: str,
+    link_mode: str = "auto",
+    tf_cli_config: str | None = None,
+    vmid_start: int = 0,
+) -> dict:
+    cloner = TreeCloner(base_dir, link_mode)
+    shutil.copytree(base_dir, target_dir, ignore=cloner.ignore, copy_function=cloner)
+    if link_mode == "symlink":
+        write_text(target_dir / OVERLAY_MARKER, os.path.relpath(base_dir, target_dir) + "\n")
+
+    params = apply_stand_spec(target_dir, stand_kind(base_dir), stand_id, subnet, vmid_start)
+
+    ensure_ansible_vars(target_dir)
+    write_proxmox_acl_script(target_dir, stand_id, pve_user, pve_role)
+    if tf_cli_config is not None:
+        write_text(target_dir / "infrastructure/terraform/terraform.rc", tf_cli_config)
+    return {
+        "id": stand_id,
+        "name": target_dir.name,
+        "subnet": str(subnet),
+        "gateway": ip_at(subnet, GATEWAY_OFFSET),
+        "hosts": params["hosts"],
+        "vmids": params["vmids"],
+        "files": cloner.stats,
+    }
+
+
+def write_manifest(path: Path, payload: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def create_bulk(
+    args: argparse.Namespace,
+    base_dir: Path,
+    out_dir: Path,
+    registry: StandRegistry,
+    tf_cli_config: str | None,
+) -> int:
+    pool = ipaddress.ip_network(args.subnet_pool, strict=False)
+    kind = stand_kind(base_dir)
+    stand_ids = [f"{args.prefix}{number:02d}" for number in range(args.start, args.start + args.count)]
+    clashes = [stand_id for stand_id in stand_ids if (out_dir / stand_id).exists()]
+    if clashes:
+        raise RuntimeError(f"Target already exists: {', '.join(str(out_dir / name) for name in clashes)}")
+    if not pool.prefixlen <= args.subnet_prefix <= 32:
+        # checked here so that the error below only ever means an exhausted pool
+        raise RuntimeError(f"Subnet prefix /{args.subnet_prefix} does not fit pool {pool}")
+    subnets = []
+    for stand_id in stand_ids:
+        try:
+            subnet = registry.allocate(pool, args.subnet_prefix)
+        except RuntimeError:
+            raise RuntimeError(
+                f"Subnet pool {pool} has only {len(subnets)} free /{args.subnet_prefix} subnet(s), {args.count} requested"
+            )
+        registry.register(stand_id, stand_id, subnet, stand_hosts(kind, subnet), kind, str(out_dir / stand_id))
+        subnets.append(subnet)
+    vmid_starts = reserve_vmids(args, registry, kind, stand_ids)
+
+    # Stands are built in staging directories next to the targets (same depth, so relative
+    # overlay symlinks stay valid) and moved in only when every one of them succeeded,
+    # so a failed run leaves out_dir untouched.
+    staging = {stand_id: out_dir / f".{stand_id}.create-{os.getpid()}" for stand_id in stand_ids}
+    moved: list[Path] = []
+    try:
+        results: dict[str, dict] = {}
+        errors: list[str] = []
+        with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, args.count))) as executor:
+            futures = {
+                executor.submit(
+                    create_stand,
+                    base_dir,
+                    staging[stand_id],
+                    stand_id,
+                    subnet,
+                    args.pve_user,
+                    args.pve_role,
+                    args.link_mode,
+                    tf_cli_config,
+                    vmid_starts[stand_id],
+                ): stand_id
+                for stand_id, subnet in zip(stand_ids, subnets)
+            }
+            for future in as_completed(futures):
+                stand_id = futures[future]
+                try:
+                    results[stand_id] = future.result()
+                except Exception as exc:
+                    errors.append(f"{stand_id}: {exc}")
+        if errors:
+            raise RuntimeError("failed to create stands:\n  " + "\n  ".join(sorted(errors)))
+
+        for stand_id in stand_ids:
+            target_dir = out_dir / stand_id
+            os.rename(staging[stand_id], target_dir)
+            moved.append(target_dir)
+    except BaseException:
+        for target_dir in moved:
+            shutil.rmtree(target_dir, ignore_errors=True)
+        raise
+    finally:
+        for staging_dir in staging.values():
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    stands = []
+    for stand_id in stand_ids:
+        entry = results[stand_id]
+        # create_stand() saw the staging directory, not the final one
+        entry["name"] = stand_id
+        entry["path"] = str(out_dir / stand_id)
+        stands.append(entry)
+    manifest = Path(args.manifest) if args.manifest else out_dir / f"{args.prefix}manifest.json"
+    write_manifest(
+        manifest,
+        {
+            "base": str(base_dir),
+            "subnet_pool": str(pool),
+            "pve_user": args.pve_user,
+            "pve_role": args.pve_role,
+            "stands": stands,
+        },
+    )
+
+    print(f"OK: created {len(stands)} stand(s) in {out_dir}, manifest: {manifest}")
+    return 0
+
+
+class DryRun(Exception):
+    """Raised inside the registry transaction to roll back a --dry-run update."""
+
+
+def plan_twin_rewrites(stand_dir: Path, files: dict[str, dict]) -> tuple[dict[Path, str], list[str]]:
+    """Apply the spec of every *.example file to its local twin (terraform.tfvars, ad.yml) if it exists."""
+    changes: dict[Path, str] = {}
+    warnings: list[str] = []
+    for rel_path, values in files.items():
+        if not rel_path.endswith(".example"):
+            continue
+        path = stand_dir / rel_path[: -len(".example")]
+        try:
+            content = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            continue
+        if content.startswith(VAULT_HEADER):
+            warnings.append(f"{path}: encrypted with ansible-vault, update it by hand")
+            continue
+        new_content, missing = rewrite_content(content, file_format(rel_path), values)
+        warnings += [f"{path}: key not set, left as is: {key}" for key in missing]
+        if new_content != content:
+            changes[path] = new_content
+    return changes, warnings
+
+
+def overlay_base(stand_dir: Path) -> Path | None:
+    """Base stand of an overlay stand (from its marker file), None for a full copy."""
+    marker = stand_dir / OVERLAY_MARKER
+    if not marker.is_file():
+        return None
+    base_dir = Path(os.path.normpath(stand_dir / marker.read_text(encoding="utf-8").strip()))
+    if not base_dir.is_dir():
+        raise RuntimeError(f"Overlay base not found: {base_dir} (from {marker})")
+    return base_dir
+
+
+def plan_overlay_links(stand_dir: Path, base_dir: Path) -> list[tuple[Path, Path]]:
+    """(base file, overlay path) pairs for files added to the base stand after the overlay was created."""
+    cloner = TreeCloner(base_dir, "symlink")
+    missing = []
+    for directory, dirs, names in os.walk(base_dir):
+        ignored = cloner.ignore(directory, dirs + names)
+        dirs[:] = sorted(name for name in dirs if name not in ignored)
+        target = stand_dir / os.path.relpath(directory, base_dir)
+        for name in sorted(names):
+            if name not in ignored and not os.path.lexists(target / name):
+                missing.append((Path(directory) / name, target / name))
+    return missing
+
+
+def affected_targets(stand_dir: Path, changed: list[Path]) -> tuple[list[str], list[str]]:
+    """Terraform roots and playbooks that have to be re-applied after the given files changed."""
+    tf_dir = stand_dir / "infrastructure/terraform"
+    ansible_dir = stand_dir / "infrastructure/ansible"
+    roots = set()
+    all_playbooks = False
+    for path in changed:
+        if path.name == "terraform.tfvars" and path.parent.parent == tf_dir:
+            roots.add(path.parent.name)
+        elif path.parent.parent == ansible_dir / "group_vars" and not path.name.endswith(".example"):
+            all_playbooks = True
+    playbooks = sorted(
+        playbook.relative_to(ansible_dir).as_posix()
+        for playbook in ansible_dir.glob("*/playbook.yml")
+        if all_playbooks or playbook.parent.name in roots
+    )
+    return sorted(roots), playbooks
+
+
+def update_stand(args: argparse.Namespace, out_dir: Path, registry: StandRegistry) -> int:
+    stand_dir = out_dir / args.name
+    if not stand_dir.is_dir():
+        raise RuntimeError(f"Stand not found: {stand_dir}")
+
+    acl_path = stand_dir / ACL_SCRIPT
+    if not acl_path.exists():
+        raise RuntimeError(f"{stand_dir} was not created by create_stand.py (no {ACL_SCRIPT}); refusing to update it")
+    acl_values = dict(ACL_VALUE.findall(acl_path.read_text(encoding="utf-8")))
+
+    current = registry.get(args.name)
+    if current is None or not current["kind"]:
+        found = scan_stand(stand_dir)
+        if found is None:
+            raise RuntimeError(f"Cannot determine subnet and type of {stand_dir} from its tfvars")
+        current = {"stand_id": args.name, "subnet": str(found[0]), **(current or {}), "kind": found[2]}
+    kind = current["kind"]
+    stand_id = args.stand_id or acl_values.get("POOL_ID") or current["stand_id"]
+    subnet = ipaddress.ip_network(args.subnet or current["subnet"], strict=False)
+
+    # the stand keeps its VMID block (stands created without one stay on nextid)
+    block = registry.vmids(args.name)
+    params = stand_params(kind, stand_id, subnet, block[0] if block else 0)
+    files = render_spec(kind, params)
+    changes = plan_rewrites(stand_dir, files, STAND_SPECS[kind]["optional"])
+    twin_changes, warnings = plan_twin_rewrites(stand_dir, files)
+    changes.update(twin_changes)
+
+    acl_content = proxmox_acl_script(
+        stand_id,
+        args.pve_user or acl_values.get("USER") or DEFAULT_PVE_USER,
+        args.pve_role or acl_values.get("ROLE") or DEFAULT_PVE_ROLE,
+    )
+    if acl_path.read_text(encoding="utf-8") != acl_content:
+        changes[acl_path] = acl_content
+
+    # overlay stands link files one by one: files added to the base since need links of their own
+    base_dir = overlay_base(stand_dir)
+    links = plan_overlay_links(stand_dir, base_dir) if base_dir else []
+
+    registered = registry.get(args.name)
+    try:
+        with registry.transaction():
+            if registered is None or registered["subnet"] != str(subnet) or registered["stand_id"] != stand_id:
+                if registered is not None:
+                    registry.release(args.name)
+                registry.register(args.name, stand_id, subnet, params["hosts"], kind, str(stand_dir))
+                if block is not None:
+                    registry.assign_vmids(args.name, *block)
+            if args.dry_run:
+                raise DryRun()
+            for path, content in sorted(changes.items()):
+                write_text(path, content)
+            if links:
+                cloner = TreeCloner(base_dir, "symlink")
+                for src, dst in links:
+                    dst.parent.mkdir(parents=True, exist_ok=True)
+                    cloner(str(src), str(dst))
+    except DryRun:
+        pass
+
+    for warning in warnings:
+        print(f"WARN: {warning}", file=sys.stderr)
+    verb = "would rewrite" if args.dry_run else "rewritten"
+    for path in sorted(changes):
+        print(f"{verb}: {path.relative_to(stand_dir).as_posix()}")
+    verb = "would add" if args.dry_run else "added"
+    for _, path in links:
+        print(f"{verb}: {path.relative_to(stand_dir).as_posix()}")
+    roots, playbooks = affected_targets(stand_dir, list(changes) + [path for _, path in links])
+    print(f"terraform roots to apply: {' '.join(roots) or '-'}")
+    print(f"playbooks to run: {' '.join(playbooks) or '-'}")
+    if acl_path in changes:
+        print(f"re-run on the Proxmox node: {ACL_SCRIPT}")
+    print(f"OK: {stand_dir} {'unchanged' if not changes and not links else f'{len(changes) + len(links)} file(s) changed'}")
+    return 0
 
 
 def main() -> int:
     args = parse_args()
-    base_dir = Path(args.base).resolve()
     out_dir = Path(args.out_dir).resolve()
-    new_name = args.name
-    stand_id = args.stand_id or args.name
 
-    if not base_dir.exists() or not base_dir.is_dir():
-        raise RuntimeError(f"Base stand not found: {base_dir}")
     if not out_dir.exists() or not out_dir.is_dir():
         raise RuntimeError(f"Output parent not found: {out_dir}")
+    if args.update:
+        registry = StandRegistry(Path(args.registry) if args.registry else out_dir / REGISTRY_NAME)
+        try:
+            for warning in registry.seed(out_dir):
+                print(f"WARN: registry: {warning}", file=sys.stderr)
+            return update_stand(args, out_dir, registry)
+        finally:
+            registry.close()
 
-    target_dir = out_dir / new_name
-    if target_dir.exists():
-        raise RuntimeError(f"Target already exists: {target_dir}")
-
-    subnet = ipaddress.ip_network(args.subnet, strict=False)
+    base_dir = Path(args.base).resolve()
+    if not base_dir.exists() or not base_dir.is_dir():
+        raise RuntimeError(f"Base stand not found: {base_dir}")
+    kind = stand_kind(base_dir)
 
-    shutil.copytree(base_dir, target_dir)
+    if args.count is None:
+        target_dir = out_dir / args.name
+        if target_dir.exists():
+            raise RuntimeError(f"Target already exists: {target_dir}")
 
-    if "linux-stand" in base_dir.name:
-        update_linux_examples(target_dir, stand_id, subnet)
-    elif "windows-stand" in base_dir.name:
-        update_windows_examples(target_dir, stand_id, subnet)
-    else:
-        raise RuntimeError("Base stand name must contain 'linux-stand' or 'windows-stand'")
+    tf_cli_config = None
+    if not args.no_provider_cache:
+        cache_dir = Path(args.provider_cache).resolve() if args.provider_cache else out_dir / ".terraform-cache"
+        tf_cli_config = prepare_provider_cache(base_dir, cache_dir)
 
-    ensure_ansible_vars(target_dir)
-    write_proxmox_acl_script(target_dir, stand_id, args.pve_user, args.pve_role)
-
-    print(f"OK: created {target_dir}")
+    registry = StandRegistry(Path(args.registry) if args.registry else out_dir / REGISTRY_NAME)
+    try:
+        for warning in registry.seed(out_dir):
+            print(f"WARN: registry: {warning}", file=sys.stderr)
+        # the registry transaction spans stand creation: a failed run releases its subnets
+        with registry.transaction():
+            if args.count is not None:
+                return create_bulk(args, base_dir, out_dir, registry, tf_cli_config)
+
+            stand_id = args.stand_id or args.name
+            subnet = ipaddress.ip_network(args.subnet, strict=False)
+            registry.register(args.name, stand_id, subnet, stand_hosts(kind, subnet), kind, str(target_dir))
+            vmid_start = reserve_vmids(args, registry, kind, [args.name])[args.name]
+            try:
+                result = create_stand(
+                    base_dir,
+                    target_dir,
+                    stand_id,
+                    subnet,
+                    args.pve_user,
+                    args.pve_role,
+                    args.link_mode,
+                    tf_cli_config,
+                    vmid_start,
+                )
+            except BaseException:
+                shutil.rmtree(target_dir, ignore_errors=True)
+                raise
+    finally:
+        registry.close()
+
+    files = result["files"]
+    linked = ", ".join(f"{files[method]} {method}ed" for method in ("reflink", "hardlink", "symlink") if files[method])
+    vmids = f", VMIDs {vmid_start}-{vmid_start + args.vmid_block - 1}" if vmid_start else ""
+    print(
+        f"OK: created {target_dir} ({linked + ', ' if linked else ''}{files['copy']} copied / "
+        f"{files['copied_bytes']} bytes{vmids})"
+    )
     return 0
 
 
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+import argparse
+import fnmatch
+import importlib.util
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+ENGINE = Path("infrastructure/scripts/deploy_engine.py")
+GRAPH = Path("infrastructure/deploy-graph.json")
+PIPELINED_GRAPH = Path("infrastructure/deploy-graph.pipelined.json")
+TFVARS_STRING = re.compile(r'^\s*(\w+)\s*=\s*"([^"]*)"', re.MULTILINE)
+DEFAULT_PROXMOX_NODE = "pve"
+DEFAULT_STORAGE = "local-lvm"
+DEFAULT_STATUS_INTERVAL = 15.0
+DONE = ("ok", "failed")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Deploy many stands through one queue with limits on clones per storage, applies per "
+        "Proxmox node and Ansible forks."
+    )
+    parser.add_argument("--stands-dir", default="stands", help="Directory with stands (default: stands)")
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Only stands whose directory name matches the glob (repeatable); stands are queued in name order",
+    )
+    parser.add_argument("--pipelined", action="store_true", help="Use the per-component graph of every stand")
+    parser.add_argument("--jobs", type=int, default=16, help="Graph nodes running at once across all stands")
+    parser.add_argument("--clones-per-storage", type=int, default=2, help="Concurrent terraform applies per storage")
+    parser.add_argument("--applies-per-node", type=int, default=4, help="Concurrent terraform applies per Proxmox node")
+    parser.add_argument("--ansible-forks", type=int, default=20, help="Ansible forks shared by all running playbooks")
+    parser.add_argument("--forks-per-playbook", type=int, default=1, help="ANSIBLE_FORKS of every playbook (default: 1)")
+    parser.add_argument("--active-stands", type=int, default=0, help="Stands deployed at once (default: 0 = no limit)")
+    parser.add_argument(
+        "--with-templates",
+        action="store_true",
+        help="Also run the template build of every stand (by default templates are expected to exist)",
+    )
+    parser.add_argument("--skip-terraform", action="store_true")
+    parser.add_argument("--skip-ansible", action="store_true")
+    parser.add_argument("--strict-host-keys", action="store_true", help="Collect and verify SSH host keys")
+    parser.add_argument("--force-init", action="store_true", help="terraform init even for unchanged roots")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the deploy checkpoints of every stand")
+    parser.add_argument("--fail-fast", action="store_true", help="Start no new stands after the first failure")
+    parser.add_argument(
+        "--status-interval",
+        type=float,
+        default=DEFAULT_STATUS_INTERVAL,
+        help=f"Seconds between queue status lines (default: {DEFAULT_STATUS_INTERVAL:g}, 0 = off)",
+    )
+    parser.add_argument("--metrics-json", default=None, help="Keep queue depth, throughput and results in this file")
+
+    sim = parser.add_argument_group("simulation (fake Proxmox: nothing is run, node durations are modelled)")
+    sim.add_argument("--simulate", action="store_true", help="Model the deploy instead of running it")
+    sim.add_argument("--sim-clone-seconds", type=float, default=3.0, help="Full clone of one VM on an idle storage")
+    sim.add_argument(
+        "--sim-storage-streams",
+        type=int,
+        default=2,
+        help="Clones a storage serves at full speed; more clones share its bandwidth",
+    )
+    sim.add_argument(
+        "--sim-contention",
+        type=float,
+        default=0.15,
+        help="Extra slowdown per clone beyond --sim-storage-streams (seek thrashing)",
+    )
+    sim.add_argument("--sim-boot-seconds", type=float, default=1.0, help="Duration of a wait node")
+    sim.add_argument("--sim-playbook-seconds", type=float, default=2.0, help="Duration of a playbook node")
+    sim.add_argument("--sim-step-seconds", type=float, default=0.2, help="Duration of any other node")
+    sim.add_argument(
+        "--sim-fail",
+        action="append",
+        default=[],
+        metavar="STAND/NODE",
+        help="Glob of simulated nodes that fail, e.g. 'stand-03/terraform-*' (repeatable)",
+    )
+    args = parser.parse_args()
+    for name in ("jobs", "clones_per_storage", "applies_per_node", "ansible_forks", "forks_per_playbook"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be positive")
+    if args.forks_per_playbook > args.ansible_forks:
+        parser.error("--forks-per-playbook cannot exceed --ansible-forks")
+    if args.active_stands < 0 or args.status_interval < 0 or args.sim_storage_streams < 1:
+        parser.error("--active-stands and --status-interval must not be negative, --sim-storage-streams positive")
+    return args
+
+
+def module_name(stand_dir: Path) -> str:
+    return "deploy_engine_" + re.sub(r"\W", "_", stand_dir.name)
+
+
+def load_engine(stand_dir: Path):
+    path = stand_dir / ENGINE
+    spec = importlib.util.spec_from_file_location(module_name(stand_dir), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def discover_stands(stands_dir: Path, patterns: list[str]) -> list[Path]:
+    stands = []
+    for entry in sorted(stands_dir.iterdir()):
+        if not entry.is_dir() or not (entry / ENGINE).is_file() or not (entry / GRAPH).is_file():
+            continue
+        if patterns and not any(fnmatch.fnmatch(entry.name, pattern) for pattern in patterns):
+            continue
+        stands.append(entry)
+    return stands
+
+
+def tfvars_values(tf_dir: Path) -> dict[str, str]:
+    """String values of terraform.tfvars, or of the example when the stand has not been configured yet."""
+    for name in ("terraform.tfvars", "terraform.tfvars.example"):
+        try:
+            return dict(TFVARS_STRING.findall((tf_dir / name).read_text(encoding="utf-8")))
+        except OSError:
+            continue
+    return {}
+
+
+def write_json(path: str, payload: dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, indent=2)
+        fh.write("\n")
+    os.replace(tmp_path, path)
+
+
+class FleetStand:
+    """A queued stand: its deploy graph, the resources every node claims and the node results."""
+
+    def __init__(self, stand_dir: Path, args: argparse.Namespace, init_lock: threading.Lock):
+        self.name = stand_dir.name
+        self.engine = load_engine(stand_dir)
+        graph_path = stand_dir / (PIPELINED_GRAPH if args.pipelined else GRAPH)
+        self.graph = self.engine.load_graph(str(graph_path))
+        self.nodes = self.graph["nodes"]
+        skip = {"templates"} if not args.with_templates else set()
+        if args.skip_terraform:
+            skip.add("terraform")
+        if args.skip_ansible:
+            skip.add("ansible")
+        engine_args = argparse.Namespace(
+            stand_root=str(stand_dir),
+            jobs=1,
+            skip=skip,
+            dynamic_inventory=False,
+            strict_host_keys=args.strict_host_keys,
+            force_init=args.force_init,
+            fresh=args.fresh,
+            log_dir=str(stand_dir / self.engine.LOG_DIR_NAME),
+            quiet=True,
+        )
+        self.deploy = self.engine.Deploy(self.graph, engine_args)
+        # one init at a time across the fleet: all stands share the provider cache of tools/create_stand.py
+        self.deploy.init_lock = init_lock
+        self.deploy.env["ANSIBLE_FORKS"] = str(args.forks_per_playbook)
+        if args.fresh and not args.simulate:
+            self.deploy.forget_state()
+        # shared with the engine: Deploy.run_node reads the results of the needs to decide on resuming
+        self.results = self.deploy.results
+        for node_id in self.graph["order"]:
+            if node_id not in self.deploy.selected():
+                self.results[node_id] = {"status": "skipped", "seconds": 0.0}
+        self.claims = {node_id: self.node_claims(node_id, args) for node_id in self.graph["order"]}
+        self.running: set[str] = set()
+        self.status = "queued"
+        self.failed = False
+        self.started = 0.0
+        self.finished = 0.0
+
+    def node_claims(self, node_id: str, args: argparse.Namespace) -> dict[str, int]:
+        node = self.nodes[node_id]
+        if node["kind"] == "terraform":
+            tf_dir = Path(self.deploy.stand_root) / self.engine.expand(node["dir"], self.deploy.env)
+            values = tfvars_values(tf_dir)
+            return {
+                f"clone:{values.get('storage') or DEFAULT_STORAGE}": 1,
+                f"apply:{values.get('proxmox_node') or DEFAULT_PROXMOX_NODE}": 1,
+            }
+        if node["kind"] == "playbook":
+            return {"forks": args.forks_per_playbook}
+        return {}
+
+    def ready(self) -> list[str]:
+        """Nodes whose dependencies succeeded and that have not been started yet."""
+        if self.failed:
+            return []
+        return [
+            node_id
+            for node_id in self.graph["order"]
+            if node_id not in self.results
+            and node_id not in self.running
+            and all(
+                self.results.get(need, {}).get("status") in self.engine.SATISFIED
+                for need in self.nodes[node_id].get("needs", [])
+            )
+        ]
+
+    def seconds(self) -> float:
+        return round((self.finished or time.monotonic()) - self.started, 3) if self.started else 0.0
+
+
+class Fleet:
+    """Starts graph nodes of queued stands in queue order while their resource claims fit the limits."""
+
+    def __init__(self, stands: list[FleetStand], args: argparse.Namespace):
+        self.stands = stands
+        self.args = args
+        self.limits = {"clone": args.clones_per_storage, "apply": args.applies_per_node, "forks": args.ansible_forks}
+        self.in_use: dict[str, int] = {}
+        self.busy: dict[str, float] = {}
+        self.running_total = 0
+        self.peak_blocked = 0
+        self.admitting = True
+        self.started = time.monotonic()
+
+    def limit(self, resource: str) -> int:
+        return self.limits[resource.split(":", 1)[0]]
+
+    def fits(self, claims: dict[str, int]) -> bool:
+        return all(self.in_use.get(resource, 0) + count <= self.limit(resource) for resource, count in claims.items())
+
+    def say(self, line: str) -> None:
+        print(line, flush=True)
+
+    # -- one node --------------------------------------------------------------
+
+    def run_node(self, stand: FleetStand, node_id: str, sharing: int) -> dict:
+        if self.args.simulate:
+            return self.simulate_node(stand, node_id, sharing)
+        return stand.deploy.run_node(node_id)
+
+    def simulate_node(self, stand: FleetStand, node_id: str, sharing: int) -> dict:
+        node = stand.nodes[node_id]
+        if stand.deploy.skip_reason(node, stand.deploy.env) is not None:
+            return {"status": "skipped", "seconds": 0.0}
+        args = self.args
+        if node["kind"] == "terraform":
+            # the storage serves a few clone streams at full speed; beyond that they share its bandwidth and thrash
+            streams = args.sim_storage_streams
+            seconds = args.sim_clone_seconds * max(1.0, sharing / streams) * (1 + args.sim_contention * max(0, sharing - streams))
+        elif node["kind"] == "wait":
+            seconds = args.sim_boot_seconds
+        elif node["kind"] == "playbook":
+            seconds = args.sim_playbook_seconds
+        else:
+            seconds = args.sim_step_seconds
+        time.sleep(seconds)
+        failed = any(fnmatch.fnmatch(f"{stand.name}/{node_id}", pattern) for pattern in args.sim_fail)
+        return {"status": "failed" if failed else "ok", "seconds": round(seconds, 3)}
+
+    # -- scheduling ------------------------------------------------------------
+
+    def dispatch(self, executor: ThreadPoolExecutor, running: dict) -> None:
+        active = sum(1 for stand in self.stands if stand.status == "running")
+        for stand in self.stands:
+            if len(running) >= self.args.jobs:
+                return
+            if stand.status == "queued":
+                if not self.admitting or (self.args.active_stands and active >= self.args.active_stands):
+                    continue
+                stand.status = "running"
+                stand.started = time.monotonic()
+                active += 1
+                self.say(f"[{stand.name}] started")
+            if stand.status != "running":
+                continue
+            for node_id in stand.ready():
+                if len(running) >= self.args.jobs:
+                    return
+                claims = stand.claims[node_id]
+                if not self.fits(claims):
+                    continue
+                for resource, count in claims.items():
+                    self.in_use[resource] = self.in_use.get(resource, 0) + count
+                sharing = max((self.in_use[resource] for resource in claims if resource.startswith("clone:")), default=0)
+                stand.running.add(node_id)
+                running[executor.submit(self.run_node, stand, node_id, sharing)] = (stand, node_id)
+            self.finish_stand(stand)
+
+    def complete(self, stand: FleetStand, node_id: str, result: dict) -> None:
+        stand.running.discard(node_id)
+        stand.results[node_id] = result
+        for resource, count in stand.claims[node_id].items():
+            self.in_use[resource] -= count
+            self.busy[resource] = self.busy.get(resource, 0.0) + count * result["seconds"]
+        if result["status"] == "failed":
+            detail = result.get("error") or f"log: {os.path.join(stand.deploy.log_dir, node_id + '.log')}"
+            self.say(f"[{stand.name}] {node_id} failed after {result['seconds']:.1f}s ({detail})")
+            stand.failed = True
+            if self.args.fail_fast and self.admitting:
+                self.admitting = False
+                self.say("[fleet] stopping: no new stands are started, running stands finish")
+        self.finish_stand(stand)
+
+    def finish_stand(self, stand: FleetStand) -> None:
+        if stand.status != "running" or stand.running or stand.ready():
+            return
+        stand.status = "failed" if stand.failed else "ok"
+        stand.finished = time.monotonic()
+        self.say(f"[{stand.name}] {stand.status} in {stand.seconds():.1f}s")
+
+    def run(self) -> int:
+        interval = self.args.status_interval
+        next_status = self.started + interval
+        running: dict = {}
+        with ThreadPoolExecutor(max_workers=self.args.jobs) as executor:
+            try:
+                while True:
+                    self.dispatch(executor, running)
+                    blocked = sum(len(stand.ready()) for stand in self.stands if stand.status == "running")
+                    self.peak_blocked = max(self.peak_blocked, blocked)
+                    if not running:
+                        break
+                    timeout = max(0.0, next_status - time.monotonic()) if interval else None
+                    done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stand, node_id = running.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as exc:
+                            result = {"status": "failed", "seconds": 0.0, "error": str(exc)}
+                        self.complete(stand, node_id, result)
+                    if interval and time.monotonic() >= next_status:
+                        self.report()
+                        next_status = time.monotonic() + interval
+            except KeyboardInterrupt:
+                # children got the same SIGINT from the terminal; let them stop gracefully
+                self.admitting = False
+                for stand in self.stands:
+                    stand.failed = True
+                wait(running)
+                for future, (stand, node_id) in running.items():
+                    self.complete(stand, node_id, {"status": "failed", "seconds": 0.0, "error": "interrupted"})
+        self.summary()
+        return 1 if any(stand.status != "ok" for stand in self.stands) else 0
+
+    # -- reporting -------------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        done = [stand for stand in self.stands if stand.status in DONE]
+        running = [stand for stand in self.stands if stand.status == "running"]
+        # deployed stands only: a stand that failed early says nothing about the pace of the fleet
+        deployed = sum(1 for stand in done if stand.status == "ok")
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "stands": len(self.stands),
+            "queued": sum(1 for stand in self.stands if stand.status == "queued"),
+            "active": len(running),
+            "done": len(done),
+            "failed": sum(1 for stand in done if stand.status == "failed"),
+            "running_nodes": sum(len(stand.running) for stand in running),
+            "blocked_nodes": sum(len(stand.ready()) for stand in running),
+            "peak_blocked_nodes": self.peak_blocked,
+            "throughput_stands_per_hour": round(deployed * 3600 / elapsed, 2) if elapsed > 0 else 0.0,
+            "in_use": {resource: f"{count}/{self.limit(resource)}" for resource, count in sorted(self.in_use.items())},
+            "utilization": {
+                resource: round(busy / (self.limit(resource) * elapsed), 3) if elapsed > 0 else 0.0
+                for resource, busy in sorted(self.busy.items())
+            },
+        }
+
+    def report(self) -> None:
+        snap = self.snapshot()
+        in_use = " ".join(f"{resource}={value}" for resource, value in snap["in_use"].items())
+        self.say(
+            f"[fleet] {snap['elapsed_seconds']:.0f}s: queued {snap['queued']} stand(s), "
+            f"{snap['running_nodes']} node(s) running, {snap['blocked_nodes']} waiting for a limit, "
+            f"done {snap['done']}/{snap['stands']} ({snap['failed']} failed), "
+            f"{snap['throughput_stands_per_hour']:.1f} stands/h {in_use}".rstrip()
+        )
+        self.write_metrics(snap)
+
+    def write_metrics(self, snap: dict) -> None:
+        if not self.args.metrics_json:
+            return
+        write_json(
+            self.args.metrics_json,
+            {
+                "simulate": self.args.simulate,
+                "limits": self.limits,
+                "status": snap,
+                "stands": {
+                    stand.name: {"status": stand.status, "seconds": stand.seconds(), "nodes": stand.results}
+                    for stand in self.stands
+                },
+            },
+        )
+
+    def summary(self) -> None:
+        snap = self.snapshot()
+        width = max(len(stand.name) for stand in self.stands)
+        print("", flush=True)
+        print("== Fleet summary ==")
+        for stand in self.stands:
+            status = stand.status if stand.status in DONE else "not started"
+            print(f"  {stand.name:<{width}}  {status:<11}  {stand.seconds():8.1f}s")
+        print(
+            f"  {snap['done']}/{snap['stands']} stand(s) done, {snap['failed']} failed, wall time "
+            f"{snap['elapsed_seconds']:.1f}s, {snap['throughput_stands_per_hour']:.1f} stands/h, "
+            f"at most {snap['peak_blocked_nodes']} node(s) waiting for a limit"
+        )
+        for resource, share in snap["utilization"].items():
+            print(f"  {resource}: {share * 100:.0f}% of {self.limit(resource)} slot(s) busy")
+        self.write_metrics(snap)
+
+
+def main() -> int:
+    args = parse_args()
+    stands_dir = Path(args.stands_dir).resolve()
+    if not stands_dir.is_dir():
+        raise RuntimeError(f"Stands directory not found: {stands_dir}")
+    stand_dirs = discover_stands(stands_dir, args.include)
+    if not stand_dirs:
+        raise RuntimeError(f"No stands with {GRAPH} found in {stands_dir}")
+
+    init_lock = threading.Lock()
+    stands = [FleetStand(stand_dir, args, init_lock) for stand_dir in stand_dirs]
+    if not args.simulate:
+        tools = stands[0].engine.TOOLS
+        needed = {
+            tools[stand.nodes[node_id]["kind"]]
+            for stand in stands
+            for node_id in stand.graph["order"]
+            if node_id not in stand.results and stand.nodes[node_id]["kind"] in tools
+        }
+        missing = sorted(tool for tool in needed if not shutil.which(tool))
+        if missing:
+            raise RuntimeError(f"Missing dependency: {', '.join(missing)}")
+
+    mode = "simulating" if args.simulate else "deploying"
+    print(
+        f"{mode} {len(stands)} stand(s): {args.jobs} job(s), {args.clones_per_storage} clone(s) per storage, "
+        f"{args.applies_per_node} applies per Proxmox node, {args.ansible_forks} Ansible fork(s)",
+        flush=True,
+    )
+    return Fleet(stands, args).run()
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(2)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+import argparse
+import fnmatch
+import importlib.util
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from create_stand import ACL_SCRIPT, ACL_VALUE
+from stand_registry import StandRegistry, default_registry_path
+
+GENERATOR = Path("infrastructure/scripts/generate_inventory.py")
+GROUP_VARS = Path("infrastructure/ansible/group_vars/all")
+VARS_SUFFIXES = (".yml", ".yaml", ".json")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Generate inventories for every stand in one process plus a merged fleet inventory."
+    )
+    parser.add_argument("--stands-dir", default="stands", help="Directory with stands (default: stands)")
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Only stands whose directory name matches the glob (repeatable)",
+    )
+    parser.add_argument("--fleet-dir", default=None, help="Fleet inventory directory (default: <stands-dir>/.fleet)")
+    parser.add_argument("--jobs", type=int, default=16, help="Max parallel terraform output calls across all stands")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-component timeout in seconds (0 = none)")
+    parser.add_argument("--source", choices=("auto", "state", "terraform"), default="auto")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or update per-stand outputs caches")
+    parser.add_argument(
+        "--no-stand-inventories",
+        action="store_true",
+        help="Only write the fleet inventory, keep per-stand inventory.yml untouched",
+    )
+    parser.add_argument("--skip-failed", action="store_true", help="Leave out stands whose outputs cannot be read")
+    return parser.parse_args()
+
+
+def group_name(stand_id: str) -> str:
+    name = re.sub(r"[^A-Za-z0-9_]", "_", stand_id)
+    return f"stand_{name}" if name[:1].isdigit() else name
+
+
+def read_stand_ids(stands_dir: Path, stand_dirs: list[Path]) -> dict[Path, str]:
+    """Stand ID per stand: POOL_ID of its ACL script, else the registry, else the directory name."""
+    registry_path = default_registry_path(stands_dir)
+    registry = StandRegistry(registry_path) if registry_path.is_file() else None
+    stand_ids = {}
+    try:
+        for stand_dir in stand_dirs:
+            try:
+                values = dict(ACL_VALUE.findall((stand_dir / ACL_SCRIPT).read_text(encoding="utf-8")))
+            except OSError:
+                values = {}
+            if values.get("POOL_ID"):
+                stand_ids[stand_dir] = values["POOL_ID"]
+                continue
+            stand = registry.get(stand_dir.name) if registry is not None else None
+            stand_ids[stand_dir] = stand["stand_id"] if stand is not None else stand_dir.name
+    finally:
+        if registry is not None:
+            registry.close()
+    return stand_ids
+
+
+def load_generator(stand_dir: Path):
+    path = stand_dir / GENERATOR
+    spec = importlib.util.spec_from_file_location(f"generate_inventory_{group_name(stand_dir.name)}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def discover_stands(stands_dir: Path, patterns: list[str]) -> list[Path]:
+    stands = []
+    for entry in sorted(stands_dir.iterdir()):
+        if not entry.is_dir() or not (entry / GENERATOR).is_file():
+            continue
+        if patterns and not any(fnmatch.fnmatch(entry.name, pattern) for pattern in patterns):
+            continue
+        stands.append(entry)
+    return stands
+
+
+def collect_fleet_outputs(stands: list[dict], jobs: int, timeout: float | None, source: str) -> dict[str, list[str]]:
+    errors: dict[str, list[str]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {}
+        for stand in stands:
+            module = stand["module"]
+            for component, tf_dir in module.default_tf_dirs(str(stand["root"])).items():
+                future = pool.submit(module.load_outputs, tf_dir, source, timeout, stand["cache"])
+                futures[future] = (stand, component)
+        for future in as_completed(futures):
+            stand, component = futures[future]
+            try:
+                stand["outputs"][component] = future.result()
+            except RuntimeError as exc:
+                errors.setdefault(stand["id"], []).append(f"{component}: {exc}")
+    for stand in stands:
+        if stand["cache"] is not None:
+            stand["cache"].save()
+    return errors
+
+
+def render_fleet_inventory(stands: list[dict]) -> str:
+    # One group per stand holding its hosts with their vars, then the role groups listing
+    # the same hosts across stands; rendered by the stand generator so both stay in one format.
+    groups: dict[str, dict[str, dict]] = {}
+    role_groups: dict[str, dict[str, dict]] = {}
+    for stand in stands:
+        stand_hosts = groups.setdefault(stand["group"], {})
+        for role_group, hosts in stand["groups"].items():
+            for host, host_vars in hosts.items():
+                fleet_host = f"{stand['id']}-{host}"
+                stand_hosts[fleet_host] = host_vars
+                role_groups.setdefault(role_group, {})[fleet_host] = {}
+    clashes = sorted(set(groups) & set(role_groups))
+    if clashes:
+        raise RuntimeError(f"stand group(s) clash with host group names: {', '.join(clashes)}")
+    return stands[0]["module"].render_inventory({**groups, **role_groups})
+
+
+def link_group_vars(fleet_dir: Path, stands: list[dict]) -> None:
+    group_vars_root = fleet_dir / "group_vars"
+    if group_vars_root.exists():
+        shutil.rmtree(group_vars_root)
+    for stand in stands:
+        source_dir = stand["root"] / GROUP_VARS
+        if not source_dir.is_dir():
+            continue
+        target_dir = group_vars_root / stand["group"]
+        target_dir.mkdir(parents=True, exist_ok=True)
+        for source in sorted(source_dir.iterdir()):
+            if source.is_file() and source.suffix in VARS_SUFFIXES:
+                (target_dir / source.name).symlink_to(os.path.relpath(source, target_dir))
+
+
+def main() -> int:
+    args = parse_args()
+    stands_dir = Path(args.stands_dir).resolve()
+    fleet_dir = Path(args.fleet_dir).resolve() if args.fleet_dir else stands_dir / ".fleet"
+
+    if not stands_dir.is_dir():
+        raise RuntimeError(f"Stands directory not found: {stands_dir}")
+
+    stand_dirs = discover_stands(stands_dir, args.include)
+    stand_ids = read_stand_ids(stands_dir, stand_dirs)
+    seen: dict[str, Path] = {}
+    for stand_dir in stand_dirs:
+        other = seen.setdefault(group_name(stand_ids[stand_dir]), stand_dir)
+        if other != stand_dir:
+            raise RuntimeError(f"{stand_dir.name} and {other.name} share stand ID {stand_ids[stand_dir]}")
+
+    stands = []
+    for stand_dir in stand_dirs:
+        module = load_generator(stand_dir)
+        stands.append(
+            {
+                "id": stand_ids[stand_dir],
+                "group": group_name(stand_ids[stand_dir]),
+                "root": stand_dir,
+                "module": module,
+                "cache": None if args.no_cache else module.OutputsCache(module.DEFAULT_CACHE_PATH),
+                "outputs": {},
+                "groups": {},
+            }
+        )
+    if not stands:
+        raise RuntimeError(f"No stands found in {stands_dir}")
+
+    errors = collect_fleet_outputs(stands, args.jobs, args.timeout or None, args.source)
+    for stand in stands:
+        if stand["id"] in errors:
+            continue
+        try:
+            stand["groups"], _ = stand["module"].build_inventory(stand["outputs"])
+        except RuntimeError as exc:
+            errors[stand["id"]] = [str(exc)]
+
+    if errors:
+        details = "\n  ".join(f"{stand_id}: {msg}" for stand_id in sorted(errors) for msg in sorted(errors[stand_id]))
+        if not args.skip_failed:
+            raise RuntimeError(f"failed to collect terraform outputs:\n  {details}")
+        print(f"WARN: skipped stands:\n  {details}", file=sys.stderr)
+
+    ready = [stand for stand in stands if stand["id"] not in errors]
+    if not ready:
+        raise RuntimeError("No stand produced an inventory")
+
+    if not args.no_stand_inventories:
+        for stand in ready:
+            module = stand["module"]
+            module.write_inventory(
+                module.default_inventory_path(str(stand["root"])),
+                module.render_inventory(stand["groups"]),
+            )
+
+    fleet_dir.mkdir(parents=True, exist_ok=True)
+    fleet_inventory = fleet_dir / "inventory.yml"
+    fleet_inventory.write_text(render_fleet_inventory(ready), encoding="utf-8")
+    link_group_vars(fleet_dir, ready)
+
+    print(f"OK: {len(ready)} stand(s) -> {fleet_inventory}")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(2)
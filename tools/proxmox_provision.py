@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+import argparse
+import fnmatch
+import http.client
+import json
+import os
+import re
+import ssl
+import sys
+import urllib.parse
+from pathlib import Path
+
+from create_stand import ACL_SCRIPT, ACL_VALUE
+
+ACL_PRIVS = re.compile(r'-privs\s+"([^"]+)"')
+DEFAULT_PRIVS = ("VM.Audit", "VM.Console", "VM.PowerMgmt")
+DEFAULT_TIMEOUT = 30.0
+# safe to send again when the connection dropped before the response arrived
+IDEMPOTENT_METHODS = ("GET", "PUT", "DELETE")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Create Proxmox roles, users, pools and pool ACLs for many stands over one API session."
+    )
+    parser.add_argument("--stands-dir", default="stands", help="Directory with stands (default: stands)")
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Only stands whose directory name matches the glob (repeatable)",
+    )
+    parser.add_argument("--manifest", default=None, help="Use a create_stand.py manifest instead of scanning stands")
+    parser.add_argument(
+        "--api-url",
+        default=os.getenv("PROXMOX_API_URL") or os.getenv("PM_API_URL"),
+        help="https://<node>:8006/api2/json (env PROXMOX_API_URL / PM_API_URL)",
+    )
+    parser.add_argument(
+        "--token-id",
+        default=os.getenv("PROXMOX_API_TOKEN_ID") or os.getenv("PM_API_TOKEN_ID"),
+        help="API token ID, e.g. root@pam!provision (env PROXMOX_API_TOKEN_ID)",
+    )
+    parser.add_argument(
+        "--token-secret",
+        default=os.getenv("PROXMOX_API_TOKEN_SECRET") or os.getenv("PM_API_TOKEN_SECRET"),
+        help="API token secret (env PROXMOX_API_TOKEN_SECRET)",
+    )
+    parser.add_argument("--insecure", action="store_true", help="Do not verify the TLS certificate")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-request timeout in seconds")
+    parser.add_argument("--dry-run", action="store_true", help="Read the current state and print the plan only")
+    args = parser.parse_args()
+    if not args.api_url:
+        parser.error("--api-url (or PROXMOX_API_URL) is required")
+    if not args.token_id or not args.token_secret:
+        parser.error("--token-id/--token-secret (or PROXMOX_API_TOKEN_ID/PROXMOX_API_TOKEN_SECRET) are required")
+    return args
+
+
+class ProxmoxAPI:
+    """Minimal Proxmox VE API client that keeps one HTTP(S) connection alive for all requests."""
+
+    def __init__(self, api_url: str, token_id: str, token_secret: str, verify: bool = True, timeout: float = DEFAULT_TIMEOUT):
+        url = urllib.parse.urlsplit(api_url.rstrip("/"))
+        if url.scheme not in ("http", "https"):
+            raise RuntimeError(f"Unsupported API URL: {api_url}")
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port
+        self.base_path = url.path or "/api2/json"
+        self.timeout = timeout
+        self.context = None
+        if self.scheme == "https":
+            self.context = ssl.create_default_context()
+            if not verify:
+                self.context.check_hostname = False
+                self.context.verify_mode = ssl.CERT_NONE
+        self.headers = {
+            "Authorization": f"PVEAPIToken={token_id}={token_secret}",
+            "Accept": "application/json",
+        }
+        self.conn = None
+        self.requests = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.conn is None:
+            if self.scheme == "https":
+                self.conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self.context)
+            else:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self.conn
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def request(self, method: str, path: str, params: dict | None = None):
+        body = urllib.parse.urlencode(params or {}) if method != "GET" else None
+        url = self.base_path + path
+        if method == "GET" and params:
+            url += "?" + urllib.parse.urlencode(params)
+        headers = dict(self.headers)
+        if body is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        for attempt in (1, 2):
+            conn = self._connect()
+            try:
+                conn.request(method, url, body=body, headers=headers)
+                response = conn.getresponse()
+                payload = response.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as exc:
+                # the server closed the idle keep-alive connection: reconnect once, but only
+                # for methods that are safe to send twice (the POST may have been applied)
+                self.close()
+                if attempt == 2 or method not in IDEMPOTENT_METHODS:
+                    raise RuntimeError(f"{method} {path} failed: {exc!r}")
+            except OSError as exc:
+                self.close()
+                raise RuntimeError(f"{method} {path} failed: {exc}")
+        self.requests += 1
+
+        if response.status >= 400:
+            detail = payload.decode("utf-8", "replace").strip()
+            raise RuntimeError(f"{method} {path} failed: HTTP {response.status} {response.reason} {detail}".rstrip())
+        try:
+            return json.loads(payload or b"{}").get("data")
+        except json.JSONDecodeError as exc:
+            raise RuntimeError(f"{method} {path} returned invalid JSON: {exc}")
+
+
+def api_from_env() -> ProxmoxAPI:
+    """Client configured from the same environment variables as the command line defaults."""
+    api_url = os.getenv("PROXMOX_API_URL") or os.getenv("PM_API_URL")
+    token_id = os.getenv("PROXMOX_API_TOKEN_ID") or os.getenv("PM_API_TOKEN_ID")
+    token_secret = os.getenv("PROXMOX_API_TOKEN_SECRET") or os.getenv("PM_API_TOKEN_SECRET")
+    if not api_url or not token_id or not token_secret:
+        raise RuntimeError("PROXMOX_API_URL, PROXMOX_API_TOKEN_ID and PROXMOX_API_TOKEN_SECRET must be set")
+    verify = os.getenv("PROXMOX_TLS_INSECURE", "").lower() not in ("1", "true", "yes")
+    return ProxmoxAPI(api_url, token_id, token_secret, verify=verify)
+
+
+def used_vmids(api: ProxmoxAPI) -> set[int]:
+    """VMIDs of all VMs and containers (templates included) on the cluster."""
+    resources = api.request("GET", "/cluster/resources", {"type": "vm"}) or []
+    return {int(resource["vmid"]) for resource in resources if "vmid" in resource}
+
+
+def read_acl_script(path: Path) -> dict | None:
+    try:
+        content = path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    values = dict(ACL_VALUE.findall(content))
+    if not {"POOL_ID", "ROLE", "USER"} <= set(values):
+        return None
+    privs = ACL_PRIVS.search(content)
+    return {
+        "pool": values["POOL_ID"],
+        "role": values["ROLE"],
+        "user": values["USER"],
+        "privs": tuple(privs.group(1).split()) if privs else DEFAULT_PRIVS,
+    }
+
+
+def stands_from_dir(stands_dir: Path, patterns: list[str]) -> list[dict]:
+    stands = []
+    for entry in sorted(stands_dir.iterdir()):
+        if not entry.is_dir():
+            continue
+        if patterns and not any(fnmatch.fnmatch(entry.name, pattern) for pattern in patterns):
+            continue
+        stand = read_acl_script(entry / ACL_SCRIPT)
+        if stand is not None:
+            stands.append(stand)
+    return stands
+
+
+def stands_from_manifest(path: Path) -> list[dict]:
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        raise RuntimeError(f"failed to read manifest {path}: {exc}")
+    stands = []
+    for entry in manifest.get("stands", []):
+        # the ACL script of the stand is authoritative (it is updated by create_stand.py --update)
+        stand = read_acl_script(Path(entry["path"]) / ACL_SCRIPT) if entry.get("path") else None
+        stands.append(
+            stand
+            or {
+                "pool": entry["id"],
+                "role": manifest["pve_role"],
+                "user": manifest["pve_user"],
+                "privs": DEFAULT_PRIVS,
+            }
+        )
+    return stands
+
+
+def plan_changes(stands: list[dict], roles: list, users: list, pools: list, acl: list) -> list[tuple[str, str, dict]]:
+    """Requests that bring the server to the desired state, given the bulk-read current state."""
+    existing_roles = {role["roleid"]: set(filter(None, re.split(r"[,\s]+", role.get("privs") or ""))) for role in roles}
+    existing_users = {user["userid"] for user in users}
+    existing_pools = {pool["poolid"] for pool in pools}
+    existing_acl = {
+        (entry["path"], entry["ugid"], entry["roleid"]) for entry in acl if entry.get("type", "user") == "user"
+    }
+
+    wanted_privs: dict[str, set[str]] = {}
+    for stand in stands:
+        wanted_privs.setdefault(stand["role"], set()).update(stand["privs"])
+
+    changes = []
+    for role, privs in sorted(wanted_privs.items()):
+        if role not in existing_roles:
+            changes.append(("POST", "/access/roles", {"roleid": role, "privs": ",".join(sorted(privs))}))
+        elif privs - existing_roles[role]:
+            missing = ",".join(sorted(privs - existing_roles[role]))
+            changes.append(("PUT", f"/access/roles/{urllib.parse.quote(role)}", {"privs": missing, "append": 1}))
+    for user in sorted({stand["user"] for stand in stands} - existing_users):
+        changes.append(("POST", "/access/users", {"userid": user}))
+    for pool in sorted({stand["pool"] for stand in stands} - existing_pools):
+        changes.append(("POST", "/pools", {"poolid": pool}))
+
+    # one PUT per (pool path, role) with every user that still lacks it
+    grants: dict[tuple[str, str], set[str]] = {}
+    for stand in stands:
+        path = f"/pool/{stand['pool']}"
+        if (path, stand["user"], stand["role"]) not in existing_acl:
+            grants.setdefault((path, stand["role"]), set()).add(stand["user"])
+    for (path, role), grant_users in sorted(grants.items()):
+        changes.append(("PUT", "/access/acl", {"path": path, "roles": role, "users": ",".join(sorted(grant_users))}))
+    return changes
+
+
+def main() -> int:
+    args = parse_args()
+    if args.manifest:
+        stands = stands_from_manifest(Path(args.manifest))
+    else:
+        stands_dir = Path(args.stands_dir).resolve()
+        if not stands_dir.is_dir():
+            raise RuntimeError(f"Stands directory not found: {stands_dir}")
+        stands = stands_from_dir(stands_dir, args.include)
+    if not stands:
+        raise RuntimeError("No stands with a Proxmox pool/ACL definition found")
+
+    api = ProxmoxAPI(args.api_url, args.token_id, args.token_secret, verify=not args.insecure, timeout=args.timeout)
+    try:
+        changes = plan_changes(
+            stands,
+            api.request("GET", "/access/roles") or [],
+            api.request("GET", "/access/users") or [],
+            api.request("GET", "/pools") or [],
+            api.request("GET", "/access/acl") or [],
+        )
+        for method, path, params in changes:
+            print(f"{'PLAN' if args.dry_run else 'APPLY'}: {method} {path} {json.dumps(params, sort_keys=True)}")
+            if not args.dry_run:
+                api.request(method, path, params)
+    finally:
+        api.close()
+
+    state = "planned" if args.dry_run else "applied"
+    print(f"OK: {len(stands)} stand(s), {len(changes)} change(s) {state}, {api.requests} API request(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(2)
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import ipaddress
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+REGISTRY_NAME = ".stand-registry.sqlite3"
+SCHEMA_VERSION = 1
+TFVARS_IP = re.compile(r'^\s*(\w+_ip)\s*=\s*"(\d+\.\d+\.\d+\.\d+)"', re.MULTILINE)
+TFVARS_PREFIX = re.compile(r"^\s*cidr_prefix\s*=\s*(\d+)", re.MULTILINE)
+WINDOWS_COMPONENTS = {"windows-10", "windows-server", "domain-controller"}
+VMID_BASE = 10000
+VMID_BLOCK = 10
+VMID_MAX = 999999999
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stands (
+    name       TEXT PRIMARY KEY,
+    stand_id   TEXT NOT NULL,
+    kind       TEXT,
+    path       TEXT,
+    subnet     TEXT NOT NULL,
+    net_start  INTEGER NOT NULL,
+    net_end    INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS stands_net_start ON stands (net_start);
+CREATE TABLE IF NOT EXISTS hosts (
+    stand   TEXT NOT NULL REFERENCES stands (name) ON DELETE CASCADE,
+    host    TEXT NOT NULL,
+    address TEXT NOT NULL UNIQUE,
+    offset  INTEGER NOT NULL,
+    PRIMARY KEY (stand, host)
+);
+CREATE TABLE IF NOT EXISTS pools (
+    cidr      TEXT PRIMARY KEY,
+    net_start INTEGER NOT NULL,
+    net_end   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS free_blocks (
+    pool      TEXT NOT NULL REFERENCES pools (cidr) ON DELETE CASCADE,
+    start     INTEGER NOT NULL,
+    prefixlen INTEGER NOT NULL,
+    PRIMARY KEY (pool, start)
+);
+CREATE INDEX IF NOT EXISTS free_blocks_size ON free_blocks (pool, prefixlen, start);
+CREATE TABLE IF NOT EXISTS vmid_blocks (
+    stand TEXT PRIMARY KEY REFERENCES stands (name) ON DELETE CASCADE,
+    start INTEGER NOT NULL,
+    size  INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS vmid_blocks_start ON vmid_blocks (start);
+"""
+
+
+def block_end(start: int, prefixlen: int) -> int:
+    return start + (1 << (32 - prefixlen)) - 1
+
+
+def network(start: int, prefixlen: int) -> ipaddress.IPv4Network:
+    return ipaddress.IPv4Network((start, prefixlen))
+
+
+class StandRegistry:
+    """Allocated stand subnets and host addresses, kept in SQLite.
+
+    Stand subnets never overlap, so ordering by net_start turns the overlap check into
+    a single indexed predecessor lookup. Every pool keeps a buddy-style free list: the
+    smallest free block that fits is split in halves until it has the requested size,
+    and released blocks are merged back with their free buddy.
+
+    Every stand may also own a contiguous block of Proxmox VMIDs, so stands cloned in
+    parallel never race on the cluster's nextid.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path), timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(SCHEMA)
+        self.db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema', ?)", (str(SCHEMA_VERSION),))
+
+    def close(self) -> None:
+        self.db.close()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        if self.db.in_transaction:
+            # nested call: a savepoint lets a failed step roll back without aborting the caller
+            self.db.execute("SAVEPOINT nested")
+            try:
+                yield
+            except BaseException:
+                self.db.execute("ROLLBACK TO nested")
+                self.db.execute("RELEASE nested")
+                raise
+            self.db.execute("RELEASE nested")
+            return
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def overlapping(self, subnet: ipaddress.IPv4Network) -> str | None:
+        start, end = int(subnet.network_address), int(subnet.broadcast_address)
+        row = self.db.execute(
+            "SELECT name, net_end FROM stands WHERE net_start <= ? ORDER BY net_start DESC LIMIT 1", (end,)
+        ).fetchone()
+        if row is not None and row["net_end"] >= start:
+            return row["name"]
+        return None
+
+    def get(self, name: str) -> dict | None:
+        row = self.db.execute("SELECT * FROM stands WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        stand = dict(row)
+        stand["hosts"] = {
+            host["host"]: host["address"]
+            for host in self.db.execute("SELECT host, address FROM hosts WHERE stand = ? ORDER BY offset", (name,))
+        }
+        stand["vmids"] = self.vmids(name)
+        return stand
+
+    def stands(self) -> list[dict]:
+        return [dict(row) for row in self.db.execute("SELECT * FROM stands ORDER BY net_start")]
+
+    def register(
+        self,
+        name: str,
+        stand_id: str,
+        subnet: ipaddress.IPv4Network,
+        hosts: dict[str, str],
+        kind: str | None = None,
+        path: str | None = None,
+    ) -> None:
+        with self.transaction():
+            if self.get(name) is not None:
+                raise RuntimeError(f"Stand already registered: {name}")
+            other = self.overlapping(subnet)
+            if other is not None:
+                raise RuntimeError(f"Subnet {subnet} overlaps stand {other}")
+            start, end = int(subnet.network_address), int(subnet.broadcast_address)
+            self.db.execute(
+                "INSERT INTO stands (name, stand_id, kind, path, subnet, net_start, net_end, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, stand_id, kind, path, str(subnet), start, end, time.strftime("%Y-%m-%dT%H:%M:%S%z")),
+            )
+            for host, address in hosts.items():
+                offset = int(ipaddress.IPv4Address(address)) - start
+                if not 0 < offset < end - start:
+                    raise RuntimeError(f"Host {host} address {address} is outside {subnet}")
+                try:
+                    self.db.execute(
+                        "INSERT INTO hosts (stand, host, address, offset) VALUES (?, ?, ?, ?)",
+                        (name, host, address, offset),
+                    )
+                except sqlite3.IntegrityError:
+                    raise RuntimeError(f"Host address {address} is already registered")
+            for pool in self._pools_overlapping(start, end):
+                self._carve(pool, start, subnet.prefixlen)
+
+    def release(self, name: str) -> dict:
+        with self.transaction():
+            stand = self.get(name)
+            if stand is None:
+                raise RuntimeError(f"Stand not registered: {name}")
+            self.db.execute("DELETE FROM stands WHERE name = ?", (name,))
+            subnet = ipaddress.IPv4Network(stand["subnet"])
+            for pool in self._pools_overlapping(stand["net_start"], stand["net_end"]):
+                pool_net = ipaddress.IPv4Network(pool)
+                if subnet.supernet_of(pool_net):
+                    self._free(pool, int(pool_net.network_address), pool_net.prefixlen)
+                else:
+                    self._free(pool, stand["net_start"], subnet.prefixlen)
+        return stand
+
+    def allocate(self, pool: ipaddress.IPv4Network, prefixlen: int) -> ipaddress.IPv4Network:
+        """Smallest free block of the pool that fits /prefixlen; register() marks it used."""
+        if prefixlen < pool.prefixlen or prefixlen > 32:
+            raise RuntimeError(f"Subnet prefix /{prefixlen} does not fit pool {pool}")
+        with self.transaction():
+            self._ensure_pool(pool)
+            row = self.db.execute(
+                "SELECT start FROM free_blocks WHERE pool = ? AND prefixlen <= ? ORDER BY prefixlen DESC, start LIMIT 1",
+                (str(pool), prefixlen),
+            ).fetchone()
+        if row is None:
+            raise RuntimeError(f"Subnet pool {pool} has no free /{prefixlen} block")
+        return network(row["start"], prefixlen)
+
+    def vmids(self, name: str) -> tuple[int, int] | None:
+        """(first VMID, block size) reserved for the stand, if any."""
+        row = self.db.execute("SELECT start, size FROM vmid_blocks WHERE stand = ?", (name,)).fetchone()
+        return (row["start"], row["size"]) if row is not None else None
+
+    def reserve_vmids(
+        self,
+        names: list[str],
+        size: int = VMID_BLOCK,
+        base: int = VMID_BASE,
+        taken: set[int] | frozenset[int] = frozenset(),
+    ) -> dict[str, int]:
+        """First VMID of a contiguous block of `size` for every stand, allocated in one ordered pass.
+
+        Stands that already own a large enough block keep it. New blocks are aligned to
+        `size`, start at `base` and skip the reserved blocks and the `taken` VMIDs (e.g. the
+        ones already used on the cluster).
+        """
+        if size < 1 or base < 100:
+            raise RuntimeError(f"Invalid VMID block: size {size}, base {base}")
+        result: dict[str, int] = {}
+        with self.transaction():
+            pending = []
+            for name in names:
+                if self.db.execute("SELECT 1 FROM stands WHERE name = ?", (name,)).fetchone() is None:
+                    raise RuntimeError(f"Stand not registered: {name}")
+                current = self.vmids(name)
+                if current is not None and current[1] >= size:
+                    result[name] = current[0]
+                    continue
+                if current is not None:
+                    self.db.execute("DELETE FROM vmid_blocks WHERE stand = ?", (name,))
+                pending.append(name)
+            if not pending:
+                return result
+
+            busy = [
+                (row["start"], row["start"] + row["size"])
+                for row in self.db.execute(
+                    "SELECT start, size FROM vmid_blocks WHERE start + size > ? ORDER BY start", (base,)
+                )
+            ]
+            busy = sorted(busy + [(vmid, vmid + 1) for vmid in taken if vmid >= base])
+            index = 0
+            candidate = -(-base // size) * size
+            for name in pending:
+                while True:
+                    while index < len(busy) and busy[index][1] <= candidate:
+                        index += 1
+                    if index < len(busy) and busy[index][0] < candidate + size:
+                        candidate = -(-busy[index][1] // size) * size
+                        continue
+                    break
+                if candidate + size - 1 > VMID_MAX:
+                    raise RuntimeError(f"No free block of {size} VMIDs left above {base}")
+                self.db.execute("INSERT INTO vmid_blocks (stand, start, size) VALUES (?, ?, ?)", (name, candidate, size))
+                result[name] = candidate
+                candidate += size
+        return result
+
+    def assign_vmids(self, name: str, start: int, size: int) -> None:
+        """Give the stand exactly this VMID block (e.g. restore it after re-registering)."""
+        with self.transaction():
+            row = self.db.execute(
+                "SELECT stand, start, size FROM vmid_blocks WHERE start < ? AND stand != ? ORDER BY start DESC LIMIT 1",
+                (start + size, name),
+            ).fetchone()
+            if row is not None and row["start"] + row["size"] > start:
+                raise RuntimeError(f"VMIDs {start}-{start + size - 1} overlap the block of stand {row['stand']}")
+            self.db.execute("INSERT OR REPLACE INTO vmid_blocks (stand, start, size) VALUES (?, ?, ?)", (name, start, size))
+
+    def seed(self, stands_dir: Path, force: bool = False) -> list[str]:
+        """Register existing stands found in stands_dir once (or again with force); return warnings."""
+        warnings = []
+        with self.transaction():
+            seeded = self.db.execute("SELECT value FROM meta WHERE key = 'seeded'").fetchone()
+            if seeded is not None and not force:
+                return warnings
+            for stand_dir in sorted(path for path in stands_dir.iterdir() if path.is_dir()):
+                if self.get(stand_dir.name) is not None:
+                    continue
+                found = scan_stand(stand_dir)
+                if found is None:
+                    continue
+                subnet, hosts, kind = found
+                try:
+                    self.register(stand_dir.name, stand_dir.name, subnet, hosts, kind, str(stand_dir))
+                except RuntimeError as exc:
+                    warnings.append(f"{stand_dir.name}: {exc}")
+            self.db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('seeded', ?)", (time.strftime("%Y-%m-%dT%H:%M:%S%z"),)
+            )
+        return warnings
+
+    def _pools_overlapping(self, start: int, end: int) -> list[str]:
+        rows = self.db.execute("SELECT cidr FROM pools WHERE net_start <= ? AND net_end >= ?", (end, start))
+        return [row["cidr"] for row in rows]
+
+    def _ensure_pool(self, pool: ipaddress.IPv4Network) -> None:
+        if self.db.execute("SELECT 1 FROM pools WHERE cidr = ?", (str(pool),)).fetchone() is not None:
+            return
+        start, end = int(pool.network_address), int(pool.broadcast_address)
+        self.db.execute("INSERT INTO pools (cidr, net_start, net_end) VALUES (?, ?, ?)", (str(pool), start, end))
+        self.db.execute(
+            "INSERT INTO free_blocks (pool, start, prefixlen) VALUES (?, ?, ?)", (str(pool), start, pool.prefixlen)
+        )
+        # one-off range scan when a pool is first used; later allocations only touch the free list
+        rows = self.db.execute(
+            "SELECT net_start, subnet FROM stands WHERE net_start <= ? AND net_end >= ?", (end, start)
+        ).fetchall()
+        for row in rows:
+            self._carve(str(pool), row["net_start"], ipaddress.IPv4Network(row["subnet"]).prefixlen)
+
+    def _carve(self, pool: str, start: int, prefixlen: int) -> None:
+        end = block_end(start, prefixlen)
+        row = self.db.execute(
+            "SELECT start, prefixlen FROM free_blocks WHERE pool = ? AND start <= ? ORDER BY start DESC LIMIT 1",
+            (pool, start),
+        ).fetchone()
+        if row is not None and row["prefixlen"] <= prefixlen and block_end(row["start"], row["prefixlen"]) >= end:
+            # a free block contains the subnet: split it, keeping the halves that stay free
+            self.db.execute("DELETE FROM free_blocks WHERE pool = ? AND start = ?", (pool, row["start"]))
+            block_start, block_len = row["start"], row["prefixlen"]
+            while block_len < prefixlen:
+                block_len += 1
+                half = 1 << (32 - block_len)
+                if start >= block_start + half:
+                    self._insert_free(pool, block_start, block_len)
+                    block_start += half
+                else:
+                    self._insert_free(pool, block_start + half, block_len)
+            return
+        # the subnet spans several smaller free blocks (or the whole pool): drop them all
+        self.db.execute("DELETE FROM free_blocks WHERE pool = ? AND start BETWEEN ? AND ?", (pool, start, end))
+
+    def _free(self, pool: str, start: int, prefixlen: int) -> None:
+        pool_len = ipaddress.IPv4Network(pool).prefixlen
+        while prefixlen > pool_len:
+            buddy = start ^ (1 << (32 - prefixlen))
+            row = self.db.execute(
+                "SELECT 1 FROM free_blocks WHERE pool = ? AND start = ? AND prefixlen = ?", (pool, buddy, prefixlen)
+            ).fetchone()
+            if row is None:
+                break
+            self.db.execute("DELETE FROM free_blocks WHERE pool = ? AND start = ?", (pool, buddy))
+            start = min(start, buddy)
+            prefixlen -= 1
+        self._insert_free(pool, start, prefixlen)
+
+    def _insert_free(self, pool: str, start: int, prefixlen: int) -> None:
+        self.db.execute("INSERT INTO free_blocks (pool, start, prefixlen) VALUES (?, ?, ?)", (pool, start, prefixlen))
+
+
+def scan_stand(stand_dir: Path) -> tuple[ipaddress.IPv4Network, dict[str, str], str] | None:
+    """Subnet, host addresses and kind of an existing stand, read from its tfvars files."""
+    hosts: dict[str, str] = {}
+    subnet = None
+    tf_dir = stand_dir / "infrastructure/terraform"
+    for root in sorted(path for path in tf_dir.iterdir() if path.is_dir()) if tf_dir.is_dir() else []:
+        for name in ("terraform.tfvars", "terraform.tfvars.example"):
+            tfvars = root / name
+            try:
+                content = tfvars.read_text(encoding="utf-8")
+            except OSError:
+                continue
+            prefix = TFVARS_PREFIX.search(content)
+            addresses = [address for key, address in TFVARS_IP.findall(content) if "mgmt" not in key]
+            if addresses:
+                hosts[root.name] = addresses[0]
+                if subnet is None:
+                    subnet = ipaddress.ip_network(f"{addresses[0]}/{prefix.group(1) if prefix else 24}", strict=False)
+                break
+    if subnet is None:
+        return None
+    hosts = {host: address for host, address in hosts.items() if ipaddress.IPv4Address(address) in subnet}
+    kind = "windows" if WINDOWS_COMPONENTS & set(hosts) else "linux"
+    return subnet, hosts, kind
+
+
+def default_registry_path(stands_dir: str | Path) -> Path:
+    return Path(stands_dir).resolve() / REGISTRY_NAME
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Inspect and maintain the stand subnet registry.")
+    parser.add_argument("--stands-dir", default="stands", help="Directory with stands (default: stands)")
+    parser.add_argument("--registry", default=None, help=f"Registry file (default: <stands-dir>/{REGISTRY_NAME})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show registered stands and host addresses")
+    check = commands.add_parser("check", help="Report whether a subnet is free")
+    check.add_argument("subnet")
+    release = commands.add_parser("release", help="Forget a stand and return its subnet to the pools")
+    release.add_argument("name")
+    commands.add_parser("prune", help="Release stands whose directory no longer exists")
+    commands.add_parser("seed", help="Register stands found in --stands-dir that are not registered yet")
+    vmids = commands.add_parser("reserve-vmids", help="Reserve a contiguous VMID block for registered stands")
+    vmids.add_argument("names", nargs="+", metavar="name")
+    vmids.add_argument("--size", type=int, default=VMID_BLOCK, help=f"VMIDs per stand (default: {VMID_BLOCK})")
+    vmids.add_argument("--base", type=int, default=VMID_BASE, help=f"Lowest VMID to use (default: {VMID_BASE})")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    registry = StandRegistry(Path(args.registry) if args.registry else default_registry_path(args.stands_dir))
+    try:
+        if args.command == "list":
+            for stand in registry.stands():
+                details = registry.get(stand["name"])
+                block = details["vmids"]
+                vmids = f"{block[0]}-{block[0] + block[1] - 1}" if block else "-"
+                print(
+                    f"{stand['subnet']:<18} {stand['name']:<24} {vmids:<12} "
+                    + " ".join(f"{h}={a}" for h, a in details["hosts"].items())
+                )
+        elif args.command == "check":
+            other = registry.overlapping(ipaddress.ip_network(args.subnet, strict=False))
+            if other is not None:
+                print(f"BUSY: {args.subnet} overlaps {other}")
+                return 1
+            print(f"FREE: {args.subnet}")
+        elif args.command == "release":
+            stand = registry.release(args.name)
+            print(f"OK: released {stand['name']} ({stand['subnet']})")
+        elif args.command == "prune":
+            for stand in registry.stands():
+                if stand["path"] and not Path(stand["path"]).is_dir():
+                    registry.release(stand["name"])
+                    print(f"released {stand['name']} ({stand['subnet']})")
+        elif args.command == "seed":
+            for warning in registry.seed(Path(args.stands_dir).resolve(), force=True):
+                print(f"WARN: {warning}", file=sys.stderr)
+            print(f"OK: {len(registry.stands())} stand(s) registered")
+        elif args.command == "reserve-vmids":
+            for name, start in registry.reserve_vmids(args.names, args.size, args.base).items():
+                print(f"{name} {start}-{start + registry.vmids(name)[1] - 1}")
+    finally:
+        registry.close()
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(2)